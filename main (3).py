@@ -1,1752 +1,6862 @@
-# Стандартні бібліотеки Python
-import json
-import logging
-import os
-from datetime import datetime, timedelta
-from threading import Thread
-from typing import Dict, Any
-from collections import defaultdict
-
-# Сторонні бібліотеки
-import nest_asyncio
-import asyncio
-from flask import Flask
-from pytz import timezone
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.events import EVENT_JOB_ERROR
-
-# Telegram-специфічні імпорти
-from telegram import (
-    Update,
-    ReplyKeyboardMarkup,
-    KeyboardButton,
-    WebAppInfo,
-    constants,
-    Bot,
-)
-from telegram.ext import (
-    ApplicationHandlerStop,
-    Application,
-    CommandHandler,
-    MessageHandler,
-    filters,
-    ConversationHandler,
-    ContextTypes,
-)
-
-# Налаштування та константи
-BLACKLIST_FILE = "blacklist.json"
-
-# Ініціалізація
-nest_asyncio.apply()
-
-
-def load_config(file_path):
-    # Дозволений каталог
-    allowed_directory = os.path.realpath("config")
-    # Абсолютний шлях до файлу
-    absolute_file_path = os.path.realpath(file_path)
-
-    # Перевірка розширення файлу
-    if not file_path.endswith(".json"):
-        raise ValueError("Дозволено лише файли з розширенням .json.")
-
-    # Перевіряємо, чи знаходиться файл у дозволеному каталозі
-    if not absolute_file_path.startswith(allowed_directory):
-        raise ValueError("Доступ до файлу за межами дозволеного каталогу заборонено.")
-
-    # Якщо все добре, відкриваємо файл
-    with open(absolute_file_path, "r") as file:
-        return json.load(file)
-
-
-# Завантаження конфігурації
-config = load_config("config.json")
-
-
-def check_time():
-    kyiv_tz = timezone("Europe/Kyiv")
-    current_time = datetime.now(kyiv_tz)
-    logging.info("Поточний час в Україні: %s", current_time)
-
-
-# Налаштування логування
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("bot.log"),  # Вказуємо файл для збереження логів
-        logging.StreamHandler(),  # Додатково виводимо в консоль
-    ],
-)
-
-# Пробний запис у лог
-logging.info("Бот запущено!")
-
-# Стани для ConversationHandler //Тут
-CHOOSING_ACTION, AWAITING_REPORT, AWAITING_PHOTOS = range(3)
-
-
-app = Flask("__name__")
-
-# Додаємо словник для відстеження щоденної статистики
-daily_stats = {
-    "buying": 0,  # Купівля
-    "selling": 0,  # Продаж
-    "announcement": 0,  # Оголошення
-    "advertising": 0,  # Реклама
-}
-
-# Використовуємо конфігураційні параметри
-TOKEN = config["TOKEN"]
-ADMIN_IDS = config["ADMIN_IDS"]
-MODERATOR_IDS = config["MODERATOR_IDS"]
-PAYMENT_CARD = config["PAYMENT_CARD"]
-RULES_LINK = config["RULES_LINK"]
-
-
-@app.route("/")
-def home():
-    return "Бот працює!"
-
-
-def run_flask():
-  app.run(host="127.0.0.1", port=1488)
-
-
-# //Тут
-
-
-# Лічильники користувачів
-user_post_counts = defaultdict(lambda: {"count": 0, "reset_time": datetime.now()})
-user_report_counts = defaultdict(lambda: {"count": 0, "reset_time": datetime.now()})
-
-
-# Використовуємо посилання на форми
-BASE_URL = config["BASE_URL"]
-
-FORMS_URL = {
-    "Купівля": f"{BASE_URL}?type=buying",
-    "Продаж": f"{BASE_URL}?type=selling",
-    "Оголошення": f"{BASE_URL}?type=announcement",
-    "Реклама": f"{BASE_URL}?type=advertising",
-}
-
-
-def get_main_keyboard():
-    buttons = [
-        [
-            KeyboardButton(
-                text="Купівля", web_app=WebAppInfo(url=FORMS_URL["Купівля"])
-            ),
-            KeyboardButton(text="Продаж", web_app=WebAppInfo(url=FORMS_URL["Продаж"])),
-        ],
-        [
-            KeyboardButton(
-                text="Оголошення", web_app=WebAppInfo(url=FORMS_URL["Оголошення"])
-            ),
-            KeyboardButton(
-                text="Реклама", web_app=WebAppInfo(url=FORMS_URL["Реклама"])
-            ),
-        ],
-    ]
-    return ReplyKeyboardMarkup(buttons, resize_keyboard=True)
-
-
-def handle_scheduler_error(event):
-    logging.error("Помилка планувальника: %s", event.exception)
-
-
-def check_and_update_limits(user_id, limit_type="post"):
-    current_time = datetime.now()
-    if limit_type == "post":
-        user_data = user_post_counts[user_id]
-        max_limit = 5
-    else:
-        user_data = user_report_counts[user_id]
-        max_limit = 10
-
-    if current_time - user_data["reset_time"] > timedelta(days=1):
-        user_data["count"] = 0
-        user_data["reset_time"] = current_time
-
-    if user_data["count"] >= max_limit:
-        return False
-
-    user_data["count"] += 1
-    return True
-
-
-class BlacklistEntry:
-    def __init__(self, user_id: int, end_date: datetime, reason: str):
-        self.user_id = user_id
-        self.end_date = end_date
-        self.reason = reason
-
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "user_id": self.user_id,
-            "end_date": self.end_date.isoformat(),
-            "reason": self.reason,
-        }
-
-    @staticmethod
-    def from_dict(data: Dict[str, Any]) -> "BlacklistEntry":
-        return BlacklistEntry(
-            user_id=data["user_id"],
-            end_date=datetime.fromisoformat(data["end_date"]),
-            reason=data["reason"],
-        )
-
-
-def load_blacklist() -> Dict[int, BlacklistEntry]:
-    try:
-        with open(BLACKLIST_FILE, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            return {
-                int(user_id): BlacklistEntry.from_dict(entry_data)
-                for user_id, entry_data in data.items()
-            }
-    except FileNotFoundError:
-        return {}
-
-
-def save_blacklist(blacklist: Dict[int, BlacklistEntry]):
-    with open(BLACKLIST_FILE, "w", encoding="utf-8") as file:
-        json.dump(
-            {str(user_id): entry.to_dict() for user_id, entry in blacklist.items()},
-            file,
-            indent=2,
-            ensure_ascii=False,
-        )
-
-
-BLACKLIST: Dict[int, BlacklistEntry] = load_blacklist()
-
-
-async def notify_user(bot: Bot, user_id: int, text: str):
-    try:
-        await bot.send_message(chat_id=user_id, text=text)
-    except Exception as e:
-        logging.error(
-            "Помилка при відправці повідомлення користувачу %d: %s", user_id, e
-        )
-
-
-async def blacklist_middleware(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not update.effective_user:
-        return
-
-    user_id = update.effective_user.id
-    if user_id in BLACKLIST:
-        entry = BLACKLIST[user_id]
-        if entry.end_date > datetime.now():
-            remaining_time = entry.end_date - datetime.now()
-            days = remaining_time.days
-            hours = remaining_time.seconds // 3600
-            await update.message.reply_text(
-                f"❌ Ви не можете використовувати цього бота.\n"
-                f"⏳ Термін блокування: {days}д {hours}г\n"
-                f"📝 Причина: {entry.reason}",
-            )
-            raise ApplicationHandlerStop()
-
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Очищаємо всі дані стану
-    context.user_data.clear()
-
-    await update.message.reply_text(
-        "Оберіть категорію:", reply_markup=get_main_keyboard()
-    )
-    return CHOOSING_ACTION
-
-
-async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Очищаємо всі попередні дані
-    context.user_data.clear()
-
-    keyboard = ReplyKeyboardMarkup([["Надіслати", "Повернутися"]], resize_keyboard=True)
-    await update.message.reply_text(
-        "Сформулюйте своє звернення одним повідомленням, "
-        "та адміністратор зв'яжеться з вами найближчим часом.",
-        reply_markup=keyboard,
-    )
-    return AWAITING_REPORT
-
-
-async def handle_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    message_text = update.message.text
-
-    if message_text == "Повернутися":
-        context.user_data.clear()
-        return await start(update, context)
-
-    if message_text == "Надіслати":
-        if not context.user_data.get("report_message"):
-            await update.message.reply_text(
-                "Будь ласка, спочатку напишіть ваше звернення."
-            )
-            return AWAITING_REPORT
-
-        if not check_and_update_limits(update.effective_user.id, "report"):
-            await update.message.reply_text(
-                "На сьогодні ліміт запитів адміністраторам вичерпано, "
-                "зверніться будь ласка завтра.",
-                reply_markup=get_main_keyboard(),
-            )
-            context.user_data.clear()
-            return CHOOSING_ACTION
-
-        report_message = context.user_data["report_message"]
-        user = update.effective_user
-        admin_message = f"""
-Нове звернення!
-ID: {user.id}
-Ім'я: {user.first_name} {user.last_name if user.last_name else ''}
-Username: @{user.username if user.username else 'немає'}
-Звернення: {report_message}
-"""
-        for admin_id in ADMIN_IDS:
-            try:
-                await context.bot.send_message(chat_id=admin_id, text=admin_message)
-            except Exception as e:
-                logging.error(
-                    "Помилка відправки повідомлення адміну %d: %s", admin_id, e
-                )
-
-        await update.message.reply_text(
-            "Дякуємо за Ваше звернення, адміністратори вже опрацьовують його",
-            reply_markup=get_main_keyboard(),
-        )
-        context.user_data.clear()
-        return CHOOSING_ACTION
-    else:
-        context.user_data["report_message"] = message_text
-        await update.message.reply_text(
-            "Повідомлення збережено. Натисніть 'Надіслати' для відправки або 'Повернутися' для скасування."
-        )
-        return AWAITING_REPORT
-
-
-async def handle_webapp_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        context.user_data.clear()
-        user = update.effective_user
-
-        if not check_and_update_limits(user.id, "post"):
-            await update.message.reply_text(
-                "Ви досягли ліміту оголошень на сьогодні. "
-                "Для розміщення додаткових оголошень зверніться до адміністрації через команду /report",
-                reply_markup=get_main_keyboard(),
-            )
-            return CHOOSING_ACTION
-
-        data = json.loads(update.effective_message.web_app_data.data)
-        form_type = data.get("formType", "невідомий тип")
-
-        # Оновлюємо статистику
-        if form_type in daily_stats:
-            daily_stats[form_type] += 1
-            logging.info("Додано новий запит типу %s", form_type)
-
-        context.user_data["form_data"] = data
-        context.user_data["form_type"] = form_type
-        context.user_data["user"] = user
-        context.user_data["formatted_message"] = format_message(data, form_type, user)
-
-        await update.message.reply_text(
-            "Тепер ви можете додати фотографії до вашого оголошення (максимум 10 фото).\n"
-            "Надішліть фотографії одну за одною.\n"
-            "Коли закінчите, натисніть 'Завершити' ⬇️",
-            reply_markup=ReplyKeyboardMarkup([["Завершити"]], resize_keyboard=True),
-        )
-
-        return AWAITING_PHOTOS
-
-    except Exception as e:
-        logging.error("Помилка обробки даних форми: %s", e)
-        context.user_data.clear()
-        await update.message.reply_text(
-            "Вибачте, сталася помилка при обробці форми. Спробуйте ще раз пізніше.",
-            reply_markup=get_main_keyboard(),
-        )
-        return CHOOSING_ACTION
-
-
-def can_add_photo(user_data):
-    """Перевіряє, чи можна додати ще одну фотографію."""
-    if "photos" not in user_data:
-        user_data["photos"] = []
-    return len(user_data["photos"]) < 10
-
-
-async def add_photo(user_data, photo_file_id):
-    """Додає фото до списку, якщо це можливо."""
-    if can_add_photo(user_data):
-        user_data["photos"].append(photo_file_id)
-        return True
-    return False
-
-
-async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if "photos" not in context.user_data:
-        context.user_data["photos"] = []
-
-    if update.message.text == "Завершити":
-        return await finish_with_photos(update, context)
-
-    if not can_add_photo(context.user_data):
-        await update.message.reply_text(
-            "Ви вже додали максимальну кількість фотографій (10).\n"
-            "Натисніть 'Завершити', щоб опублікувати оголошення."
-        )
-        return AWAITING_PHOTOS
-
-    try:
-        photo_file_id = update.message.photo[-1].file_id
-        if await add_photo(context.user_data, photo_file_id):
-            await update.message.reply_text(
-                f"Фото додано! ({len(context.user_data['photos'])}/10)\n"
-                "Ви можете додати ще фото або натиснути 'Завершити'."
-            )
-        else:
-            await update.message.reply_text(
-                "Не вдалося додати фото. Перевірте кількість фото."
-            )
-    except Exception as e:
-        logging.error("Помилка додавання фото: %s", e)
-        await update.message.reply_text(
-            "Сталася помилка при додаванні фото. Спробуйте ще раз."
-        )
-
-    return AWAITING_PHOTOS
-
-
-async def finish_with_photos(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        if not context.user_data.get("formatted_message"):
-            await update.message.reply_text(
-                "Виникла помилка. Будь ласка, почніть спочатку з команди /start",
-                reply_markup=get_main_keyboard(),
-            )
-            context.user_data.clear()
-            return CHOOSING_ACTION
-
-        formatted_message = context.user_data["formatted_message"]
-        photos = context.user_data.get("photos", [])
-        user = context.user_data["user"]
-
-        for moderator_id in MODERATOR_IDS:
-            try:
-                await context.bot.send_message(
-                    chat_id=moderator_id, text=formatted_message, parse_mode="HTML"
-                )
-
-                for photo_id in photos:
-                    caption = f"Фото від: {user.first_name} {user.last_name if user.last_name else ''} (@{user.username if user.username else 'немає'})"
-                    await context.bot.send_photo(
-                        chat_id=moderator_id, photo=photo_id, caption=caption
-                    )
-            except Exception as e:
-                logging.error(
-                    "Помилка надсилання повідомлення модератору %d: %s", moderator_id, e
-                )
-
-        await update.message.reply_text(
-            "Дякуємо! Ваше оголошення прийнято та буде опубліковано після модерації.",
-            reply_markup=get_main_keyboard(),
-        )
-
-        context.user_data.clear()
-        return CHOOSING_ACTION
-
-    except Exception as e:
-        logging.error("Помилка при завершенні обробки форми: %s", e)
-        context.user_data.clear()
-        await update.message.reply_text(
-            "Вибачте, сталася помилка при обробці даних. Спробуйте ще раз пізніше.",
-            reply_markup=get_main_keyboard(),
-        )
-        return CHOOSING_ACTION
-
-
-# Шаблони повідомлень в окремих константах
-MESSAGE_TEMPLATES = {
-    "user_info": {
-        "default": """👤 Користувач: {first_name} {last_name}
-🔗 Username: @{username}
-🆔 User ID: {user_id}""",
-        "with_paid": """👤 Користувач: {first_name} {last_name}
-🔗 Username: @{username}
-🆔 User ID: {user_id}
-💳 Paid: {is_pinned}""",
-        "advertising": """👤 Користувач: {first_name} {last_name}
-🔗 Username: @{username}
-🆔 User ID: {user_id}
-📝 Type: {ad_type}
-💰 Price: {price} грн
-⏱ Period: {duration}""",
-    },
-    "content": {
-        "advertising": """<pre>📢 Реклама
-
-🏷️ Назва: {company_name}
-📝 Опис: {description}
-📞 Контакти: {contact}
-
-✏️️ Подати оголошення:
-@slavuta_ads_bot</pre>
-""",
-        "buying": """<pre>🛒 Купівля
-
-🏷️ Назва: {product_name}
-📝 Опис: {description}
-💰 Вартість до: {max_price} {currency}
-📞 Контакти: {contact}
-
-🔍Схожі запити:
-#{category}
-
-✏️ Подати оголошення:
-@slavuta_ads_bot</pre>
-""",
-        "selling": """<pre>🛒 Продаж
-
-🏷️ Назва: {item_name}
-💰 Вартість: {price_info} {negotiable}
-📦 Стан: {condition}
-📝 Опис: {description}
-📞 Контакти: {contact}
-
-🔍 Схожі товари:
-#{category}
-
-✏️ Подати оголошення:
-@slavuta_ads_bot</pre>
-""",
-        "announcement": """<pre>📰 Оголошення
-
-📝 Опис: {description}
-📞 Контакти: {contact}
-
-🔍 Схожі оголошення:
-#{category}
-
-✏️ Подати оголошення:
-@slavuta_ads_bot</pre>
-""",
-    },
-}
-
-
-def get_price_info(data):
-    """Допоміжна функція для формування інформації про ціну"""
-    if data.get("isFree"):
-        return "Віддам даром"
-    if data.get("priceType") == "negotiablePrice":
-        return "Договірна"
-    return f"{data.get('price', 'Не вказано')} {data.get('priceCurrency', 'грн')}"
-
-
-def format_user_info(user, form_type, data):
-    """Форматує інформацію про користувача"""
-    user_data = {
-        "first_name": user.first_name,
-        "last_name": user.last_name if user.last_name else "",
-        "username": user.username if user.username else "немає",
-        "user_id": user.id,
-    }
-
-    if form_type == "advertising":
-        return MESSAGE_TEMPLATES["user_info"]["advertising"].format(
-            **user_data,
-            ad_type=data.get("adType", "Не вказано"),
-            price=data.get("finalPrice", "0"),
-            duration=data.get("duration", "Не вказано"),
-        )
-    elif form_type in ["buying", "selling", "announcement"]:
-        return MESSAGE_TEMPLATES["user_info"]["with_paid"].format(
-            **user_data, is_pinned="Так" if data.get("isPinned") else "Ні"
-        )
-    else:
-        return MESSAGE_TEMPLATES["user_info"]["default"].format(**user_data)
-
-
-def format_message(data, form_type, user):
-    """Форматує повне повідомлення залежно від типу форми"""
-    user_info = format_user_info(user, form_type, data)
-
-    if form_type == "advertising":
-        content = MESSAGE_TEMPLATES["content"]["advertising"].format(
-            company_name=data.get("companyName", "Не вказано"),
-            description=data.get("adDescription", "Не вказано"),
-            contact=data.get("adContact", "Не вказано"),
-        )
-    elif form_type == "buying":
-        content = MESSAGE_TEMPLATES["content"]["buying"].format(
-            product_name=data.get("productName", "Не вказано"),
-            description=data.get("buyerDescription", "Не вказано"),
-            max_price=data.get("maxPrice", "Не вказано"),
-            currency=data.get("maxPriceCurrency", "грн"),
-            contact=data.get("buyerContact", "Не вказано"),
-            category=data.get("buyingCategory", "").lower(),
-        )
-    elif form_type == "selling":
-        content = MESSAGE_TEMPLATES["content"]["selling"].format(
-            item_name=data.get("itemName", "Не вказано"),
-            price_info=get_price_info(data),
-            negotiable="(Торг)" if data.get("isNegotiable") else "",
-            condition=data.get("condition", "Не вказано"),
-            description=data.get("sellerDescription", "Не вказано"),
-            contact=data.get("sellerContact", "Не вказано"),
-            category=data.get("sellingCategory", "").lower(),
-        )
-    else:  # announcement
-        content = MESSAGE_TEMPLATES["content"]["announcement"].format(
-            description=data.get("description", "Не вказано"),
-            contact=data.get("contact", "Не вказано"),
-            category=data.get("category", "").lower(),
-        )
-
-    return f"{user_info}\n{content}"
-
-
-def check_bot_status():
-    logging.info("Бот працює. Перевірка статусу.")
-
-
-# Список команд адміністратора
-
-
-async def adm_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для перегляду списку команд адміністратора."""
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /adm_help, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    response = (
-        "📉 /reset_counters <user_id> - Скинути лічильник оголошень та звернень\n"
-        "📊 /view_counters <user_id> - Переглянути лічильник користувача\n"
-        "👥 /list_users - Переглянути всіх користувачів з лічильником\n"
-        "📈 /check_stats - Переглянути статистику оголошень\n"
-        "🗨️ /ans <user_id> <text> - Відповісти користувачу\n"
-        "🚫 /ban <user_id> <days> <reason> - Заблокувати користувача\n"
-        "🔓 /unban <user_id> - Розблокувати користувача\n"
-        "🗑️ /blacklist - Переглянути чорний список"
-    )
-
-    await update.message.reply_text(response)
-    logging.info("Адміністратор %d переглянув список команд.", update.effective_user.id)
-
-
-async def ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для додавання користувача до чорного списку з вказанням терміну та причини."""
-    if not update.effective_user:
-        return
-
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /ban, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    # Перевіряємо наявність аргументів
-    if not context.args:
-        await update.message.reply_text(
-            "❗Використовуйте: /ban <user_id> <days> <reason>"
-        )
-        return
-
-    if len(context.args) < 3:
-        await update.message.reply_text(
-            "❗Використовуйте: /ban <user_id> <days> <reason>"
-        )
-        return
-
-    try:
-        user_id = int(context.args[0])
-        days = int(context.args[1])
-        reason = " ".join(context.args[2:])
-
-        if days <= 0:
-            await update.message.reply_text("❗Кількість днів має бути більше 0.")
-            return
-
-        end_date = datetime.now() + timedelta(days=days)
-
-        BLACKLIST[user_id] = BlacklistEntry(user_id, end_date, reason)
-        save_blacklist(BLACKLIST)
-
-        ban_message = (
-            f"⛔️ Адміністратор заблокував доступ до бота на {days} днів.\n"
-            f"📝 Причина: {reason}"
-        )
-
-        try:
-            # Повідомлення забаненому користувачу
-            await notify_user(context.bot, user_id, ban_message)
-        except Exception as e:
-            logging.error(
-                "Помилка при відправці повідомлення користувачу %d: %s", user_id, str(e)
-            )
-            await update.message.reply_text(
-                "⚠️ Користувача додано до чорного списку, але не вдалося надіслати йому повідомлення."
-            )
-
-        # Повідомлення адміністратору
-        await update.message.reply_text(
-            f"✅ Користувач {user_id} доданий до чорного списку\n"
-            f"⏳ До: {end_date.strftime('%d.%m.%Y %H:%M')}\n"
-            f"📝 Причина: {reason}"
-        )
-
-        logging.info(
-            "Адміністратор %d забанив користувача %d на %d днів. Причина: %s",
-            update.effective_user.id,
-            user_id,
-            days,
-            reason,
-        )
-
-    except ValueError as e:
-        await update.message.reply_text(
-            "❗Будь ласка, введіть коректні дані:\n"
-            "- user_id має бути числом\n"
-            "- кількість днів має бути цілим числом"
-        )
-        logging.error("Помилка при обробці команди ban: %s", str(e))
-    except Exception as e:
-        await update.message.reply_text(
-            "❗Сталася непередбачена помилка. Спробуйте ще раз."
-        )
-        logging.error("Непередбачена помилка в команді ban: %s", str(e))
-
-
-async def unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для видалення користувача з чорного списку."""
-    if not update.effective_user:
-        return
-
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /unban, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    if len(context.args) != 1:
-        await update.message.reply_text("❗Використовуйте: /unban <user_id>")
-        return
-
-    try:
-        user_id = int(context.args[0])
-        if user_id in BLACKLIST:
-            # Зберігаємо причину бану для логу
-            ban_reason = BLACKLIST[user_id].reason
-
-            # Видаляємо з чорного списку
-            del BLACKLIST[user_id]
-            save_blacklist(BLACKLIST)
-
-            # Відправляємо повідомлення користувачу про розблокування
-            unban_message = (
-                "✅ Ваші обмеження були зняті адміністратором, можете далі користуватися ботом.\n"
-                "⚠️ Будь ласка, не порушуйте правила користування ботом.\n"
-                f"📋 Ознайомитись з правилами можна тут: {RULES_LINK}"
-            )
-            await notify_user(context.bot, user_id, unban_message)
-
-            # Повідомлення адміністратору
-            await update.message.reply_text(
-                f"✅ Користувач {user_id} видалений з чорного списку.",
-            )
-
-            logging.info(
-                "Адміністратор %d розблокував користувача %d (був заблокований за: %s)",
-                update.effective_user.id,
-                user_id,
-                ban_reason,
-            )
-        else:
-            await update.message.reply_text(
-                f"❗Користувач {user_id} не знаходиться в чорному списку.",
-            )
-    except ValueError:
-        await update.message.reply_text(
-            "❗Будь ласка, введіть коректний user_id (число)."
-        )
-
-
-async def check_bans(bot: Bot):
-    """Перевірка банів кожну годину."""
-    try:
-        current_time = datetime.now()
-        users_to_unban = [
-            user_id
-            for user_id, entry in BLACKLIST.items()
-            if entry.end_date <= current_time
-        ]
-
-        for user_id in users_to_unban:
-            unban_message = (
-                "✅ Ваші обмеження зняті, можете далі користуватися ботом.\n"
-                "⚠️ Будь ласка, не порушуйте правила користування ботом.\n"
-                f"📋 Ознайомитись з правилами можна тут: {RULES_LINK}"
-            )
-
-            await notify_user(bot, user_id, unban_message)
-
-            del BLACKLIST[user_id]
-            save_blacklist(BLACKLIST)
-
-            logging.info("Користувача %d було автоматично розблоковано.", user_id)
-
-    except Exception as e:
-        logging.error("Помилка при перевірці банів: %s", e)
-
-
-async def view_blacklist(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для перегляду чорного списку."""
-    if not update.effective_user:
-        return
-
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /blacklist, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    if not BLACKLIST:
-        await update.message.reply_text("📋 Чорний список порожній.")
-    else:
-        blacklist_text = "📋 Чорний список користувачів:\n\n"
-        for user_id, entry in BLACKLIST.items():
-            remaining_time = entry.end_date - datetime.now()
-            days = remaining_time.days
-            hours = remaining_time.seconds // 3600
-            blacklist_text += (
-                f"🆔 ID: {user_id}\n"
-                f"⏳ Закінчення бану: {entry.end_date.strftime('%d.%m.%Y %H:%M')}\n"
-                f"⌛️ Залишилось: {days}д {hours}г\n"
-                f"📝 Причина: {entry.reason}\n\n"
-            )
-        await update.message.reply_text(blacklist_text)
-
-
-async def answer_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для відповіді на репорт користувача."""
-    if update.effective_user.id not in ADMIN_IDS:
-        # Перевіряємо, чи користувач є адміністратором
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /ans, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    args = context.args
-    if len(args) < 2:
-        await update.message.reply_text("❗Використовуйте: /ans <user_id> <text>")
-        return
-
-    try:
-        user_id = int(args[0])
-        answer_text = " ".join(args[1:])
-    except ValueError:
-        await update.message.reply_text(
-            "❗Будь ласка, введіть коректний user_id та текст відповіді."
-        )
-        logging.warning(
-            "Адміністратор %d ввів некоректний user_id: %s",
-            update.effective_user.id,
-            args[0],
-        )
-        return
-
-    try:
-        # Надсилаємо відповідь користувачу
-        await context.bot.send_message(
-            chat_id=user_id, text=f"📬 Відповідь від адміністрації:\n\n{answer_text}"
-        )
-
-        # Підтверджуємо адміністратору, що відповідь надіслано
-        await update.message.reply_text(
-            f"✅ Відповідь успішно надіслано користувачу {user_id}."
-        )
-
-        logging.info(
-            "Адміністратор %d надіслав відповідь користувачу %d (%s).",
-            update.effective_user.id,
-            user_id,
-            answer_text,
-        )
-    except Exception as e:
-        await update.message.reply_text(f"❌ Помилка при надсиланні відповіді: {str(e)}")
-        logging.error(
-            "Помилка при надсиланні відповіді від адміністратора %d користувачу %d: %s",
-            update.effective_user.id,
-            user_id,
-            str(e),
-        )
-
-
-async def check_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для перегляду поточної статистики за день."""
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /check_stats, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    total_requests = sum(daily_stats.values())
-
-    stats_message = (
-        f"📊 Статистика за {datetime.now():%d/%m/%Y}:\n\n"
-        f"📢 Оголошення: {daily_stats['announcement']}\n"
-        f"🎯 Реклама: {daily_stats['advertising']}\n"
-        f"💰 Продажі: {daily_stats['selling']}\n"
-        f"🛒 Купівля: {daily_stats['buying']}\n"
-        f"📈 Всього запитів: {total_requests}"
-    )
-
-    await update.message.reply_text(stats_message)
-    logging.info("Адміністратор %d переглянув статистику.", update.effective_user.id)
-
-
-async def send_daily_stats(application):
-    logging.info("Початок відправки щоденної статистики.")
-
-    total_requests = sum(daily_stats.values())
-
-    stats_message = (
-        f"📊 Статистика за {datetime.now():%d/%m/%Y}:\n\n"
-        f"📢 Оголошення: {daily_stats['announcement']}\n"
-        f"🎯 Реклама: {daily_stats['advertising']}\n"
-        f"💰 Продажі: {daily_stats['selling']}\n"
-        f"🛒 Купівля: {daily_stats['buying']}\n"
-        f"📈 Всього запитів: {total_requests}"
-    )
-
-    for admin_id in ADMIN_IDS:
-        try:
-            await application.bot.send_message(chat_id=admin_id, text=stats_message)
-            logging.info("Статистику відправлено адміну %d", admin_id)
-        except Exception as e:
-            logging.error("Помилка відправки статистики адміну %d: %s", admin_id, e)
-
-    logging.info("Завершення відправки щоденної статистики.")
-
-
-def reset_daily_stats():
-    """Скидання щоденної статистики."""
-    daily_stats.update({key: 0 for key in daily_stats})
-    logging.info("Щоденна статистика скинута.")
-
-
-async def reset_counters(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для скидання лічильників оголошень та репортів для вказаного користувача."""
-    # Перевіряємо, чи користувач є адміністратором
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /reset_counters, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    args = context.args
-    if len(args) != 1:
-        await update.message.reply_text("❗Використовуйте: /reset_counters <user_id>")
-        return
-
-    try:
-        user_id = int(args[0])
-    except ValueError:
-        await update.message.reply_text(
-            "❗Будь ласка, введіть коректний user_id (число)."
-        )
-        logging.warning(
-            "Адміністратор %d ввів некоректний user_id: %s",
-            update.effective_user.id,
-            args[0],
-        )
-        return
-
-    if user_id not in user_post_counts and user_id not in user_report_counts:
-        await update.message.reply_text("❗Цей користувач не має лічильників.")
-        logging.info(
-            "Адміністратор %d спробував скинути лічильники для користувача %d, але лічильники відсутні.",
-            update.effective_user.id,
-            user_id,
-        )
-        return
-
-    user_post_counts.pop(user_id, None)
-    user_report_counts.pop(user_id, None)
-
-    await update.message.reply_text(
-        f"🔄 Лічильники для користувача з ID {user_id} були скинуті."
-    )
-    logging.info(
-        "Користувач %d скинув лічильники для користувача %d.",
-        update.effective_user.id,
-        user_id,
-    )
-
-
-async def view_counters(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для перегляду лічильників оголошень та репортів для вказаного користувача."""
-    # Перевіряємо, чи користувач є адміністратором
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /view_counters, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    args = context.args
-    if len(args) != 1:
-        await update.message.reply_text("❗Використовуйте: /view_counters <user_id>")
-        return
-
-    try:
-        user_id = int(args[0])
-    except ValueError:
-        await update.message.reply_text(
-            "❗Будь ласка, введіть коректний user_id (число)."
-        )
-        logging.warning(
-            "Адміністратор %d ввів некоректний user_id: %s",
-            update.effective_user.id,
-            args[0],
-        )
-        return
-
-    post_data = user_post_counts.get(
-        user_id, {"count": 0, "reset_time": datetime.now()}
-    )
-    report_data = user_report_counts.get(
-        user_id, {"count": 0, "reset_time": datetime.now()}
-    )
-
-    response = (
-        f"📊 Лічильники для користувача з ID {user_id}:\n"
-        f"📢 Оголошення: {post_data['count']}/{5} (скидається о {post_data['reset_time'] + timedelta(days=1):%Y-%m-%d %H:%M:%S})\n"
-        f"📝 Репорти: {report_data['count']}/{10} (скидається о {report_data['reset_time'] + timedelta(days=1):%Y-%m-%d %H:%M:%S})"
-    )
-
-    await update.message.reply_text(response)
-    logging.info(
-        "Користувач %d переглянув лічильники для користувача %d.",
-        update.effective_user.id,
-        user_id,
-    )
-
-
-async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для перегляду списку користувачів з активними лічильниками."""
-    if update.effective_user.id not in ADMIN_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише адміністраторам.")
-        logging.warning(
-            "Користувач %d намагався використати /list_users, але не є адміністратором.",
-            update.effective_user.id,
-        )
-        return
-
-    users_with_posts = [str(user_id) for user_id in user_post_counts.keys()]
-    users_with_reports = [str(user_id) for user_id in user_report_counts.keys()]
-
-    response = "📊 Користувачі з активними лічильниками:\n\n"
-    response += (
-        f"📢 Оголошення ({len(users_with_posts)} користувачів):\n"
-        + ", ".join(users_with_posts)
-        + "\n\n"
-    )
-    response += f"📝 Репорти ({len(users_with_reports)} користувачів):\n" + ", ".join(
-        users_with_reports
-    )
-
-    await update.message.reply_text(
-        response
-        if users_with_posts or users_with_reports
-        else "❗Немає користувачів з активними лічильниками."
-    )
-    logging.info(
-        "Адміністратор %d переглянув список користувачів з активними лічильниками.",
-        update.effective_user.id,
-    )
-
-
-def reset_all_counters():
-    """Функція для скидання всіх лічильників."""
-    current_time = datetime.now()
-    for user_id in list(user_post_counts.keys()):
-        user_post_counts[user_id]["count"] = 0
-        user_post_counts[user_id]["reset_time"] = current_time
-
-    for user_id in list(user_report_counts.keys()):
-        user_report_counts[user_id]["count"] = 0
-        user_report_counts[user_id]["reset_time"] = current_time
-
-    logging.info("Всі лічильники були скинуті.")
-
-
-# Список команд модератора
-
-
-async def mod_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для перегляду списку команд модератора."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /mod_help, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    response = (
-        "✅ /buy_accept <user_id> - Схвалити запит на купівлю\n"
-        "✅ /sell_accept <user_id> - Схвалити запит на продаж\n"
-        "✅ /ad_accept <user_id> - Схвалити оголошення\n"
-        "✅ /an_accept <user_id> - Схвалити запит на рекламу\n\n"
-        "❌ /buy_reject <user_id> <reason> - Відхилити запит на купівлю\n"
-        "❌ /sell_reject <user_id> <reason> - Відхилити запит на продаж\n"
-        "❌ /ad_reject <user_id> <reason> - Відхилити оголошення\n"
-        "❌ /an_reject <user_id> <reason> - Відхилити запит на рекламу\n\n"
-        "💳 /payment <user_id> <service_id> <sum> - Надіслати реквізити оплати\n\n"
-        "Service ID's:\n"
-        "1 - закріплення оголошення на 3 доби\n"
-        "2 - публікація\n"
-        "3 - публікація + розміщення реклами на 12 годин\n"
-        "4 - публікація + розміщення реклами на 1 добу\n"
-        "5 - публікація + розміщення реклами на 3 доби\n"
-        "6 - публікація + розміщення реклами на 7 діб\n"
-        "7 - публікація + закріплення + розміщення реклами на 12 годин\n"
-        "8 - публікація + закріплення + розміщення реклами на 1 добу\n"
-        "9 - публікація + закріплення + розміщення реклами на 3 доби\n"
-        "10 - публікація + закріплення + розміщення реклами на 7 діб"
-    )
-
-    await update.message.reply_text(response)
-    logging.info("Модератор %d переглянув список команд.", update.effective_user.id)
-
-
-# Команда надсилання реквізитів
-
-
-async def payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для надсилання реквізитів для оплати."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /payment, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if len(context.args) != 3:
-        if update.message:
-            await update.message.reply_text(
-                "❗Використовуйте: /payment <user_id> <service_id> <amount>"
-            )
-        return
-
-    try:
-        user_id = int(context.args[0])
-        id_prod = int(context.args[1])
-        amount = float(context.args[2])
-
-        # Визначення послугу на основі id_prod
-        services = {
-            1: "закріплення оголошення на 3 доби",
-            2: "публікація",
-            3: "публікація + розміщення реклами на 12 годин",
-            5: "публікація + розміщення реклами на 1 добу",
-            6: "публікація + розміщення реклами на 3 доби",
-            7: "публікація + розміщення реклами на 7 діб",
-            8: "публікація + закріплення + розміщення реклами на 12 годин",
-            9: "публікація + закріплення + розміщення реклами на 1 добу",
-            10: "публікація + закріплення + розміщення реклами на 3 доби",
-            11: "публікація + закріплення + розміщення реклами на 7 діб",
-        }
-
-        service_description = services.get(id_prod)
-        if not service_description:
-            await update.message.reply_text("❗Некоректний service_id.")
-            return
-
-        message = (
-            f"💼 Ви надіслали запит на платні послуги, а саме: {service_description}.\n"
-            f"💳 Для публікації - необхідно здійснити оплату на банківську картку: \n"
-            f"`{PAYMENT_CARD}`\n"
-            f"💰 Загальна вартість: `{amount}` грн.\n"
-            f"📝 У призначенні платежу обов'язково вкажіть:\n"
-            f"`Оплата за послуги №{user_id}`\n"
-            "⏳ Після оплати, публікація з'явиться протягом 24-х годин, а ви отримаєте сповіщення.\n"
-            "🙏 Дякуємо, що скористалися нашими послугами!"
-        )
-
-        await context.bot.send_message(
-            chat_id=user_id, text=message, parse_mode=constants.ParseMode.MARKDOWN
-        )
-
-        logging.info(
-            "Модератор %d надіслав реквізити оплати для користувача %d.",
-            update.effective_user.id,
-            user_id,
-        )
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення з реквізитами надіслано користувачу {user_id}."
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректні параметри введення.")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці реквізитів: %s", e)
-
-
-async def buy_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для прийняття запиту на купівлю."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /buy_accept, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if not context.args or len(context.args) != 1:
-        if update.message:
-            await update.message.reply_text("❗Використовуйте: /buy_accept <user_id>")
-        return
-
-    try:
-        user_id = int(context.args[0])
-
-        message = (
-            "✅ Ваш запит на купівлю успішно пройшов модерацію.\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d схвалив запит на купівлю для користувача %d.",
-            update.effective_user.id,
-            user_id,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
-
-
-async def sell_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для прийняття запиту на продаж."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /sell_accept, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if not context.args or len(context.args) != 1:
-        if update.message:
-            await update.message.reply_text("❗Використовуйте: /sell_accept <user_id>")
-        return
-
-    try:
-        user_id = int(context.args[0])
-        message = (
-            "✅ Ваш запит на продаж успішно пройшов модерацію.\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d схвалив запит на продаж для користувача %d.",
-            update.effective_user.id,
-            user_id,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
-
-
-async def ad_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для прийняття запиту на оголошення."""
-    # Тут
-
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /ad_accept, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if not context.args or len(context.args) != 1:
-        if update.message:
-            await update.message.reply_text("❗Використовуйте: /ad_accept <user_id>")
-        return
-
-    try:
-        user_id = int(context.args[0])
-        message = (
-            "✅ Ваш запит на оголошення успішно пройшов модерацію.\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d схвалив запит на оголошення для користувача %d.",
-            update.effective_user.id,
-            user_id,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
-
-
-async def an_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для прийняття запиту на рекламу."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /an_accept, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if not context.args or len(context.args) != 1:
-        if update.message:
-            await update.message.reply_text("❗Використовуйте: /an_accept <user_id>")
-        return
-
-    try:
-        user_id = int(context.args[0])
-        message = (
-            "✅ Ваш запит на рекламу успішно пройшов модерацію.\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d схвалив запит на рекламу для користувача %d.",
-            update.effective_user.id,
-            user_id,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
-
-
-# Функції для відхилення запитів
-async def buy_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для відхилення запиту на купівлю."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        return
-
-    if len(context.args) < 2:
-        await update.message.reply_text(
-            "❗Використовуйте: /buy_reject <user_id> <reason>"
-        )
-        return
-
-    try:
-        user_id = int(context.args[0])
-        reason = " ".join(context.args[1:])
-        message = (
-            "❌ Ваш запит на купівлю відхилено.\n"
-            f"📝 Причина: {reason}\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d відхилив запит на купівлю для користувача %d.\n"
-            "Причина: %s",
-            update.effective_user.id,
-            user_id,
-            reason,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про відхилення надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення відхилення: %s", e)
-
-
-async def sell_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для відхилення запиту на продаж."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /sell_reject, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if len(context.args) < 2:
-        await update.message.reply_text(
-            "❗Використовуйте: /sell_reject <user_id> <reason>"
-        )
-        return
-
-    try:
-        user_id = int(context.args[0])
-        reason = " ".join(context.args[1:])
-        message = (
-            "❌ Ваш запит на продаж відхилено.\n"
-            f"📝 Причина: {reason}\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d відхилив запит на продаж для користувача %d.\n" "Причина: %s",
-            update.effective_user.id,
-            user_id,
-            reason,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про відхилення надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення відхилення: %s", e)
-
-
-async def ad_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для відхилення запиту на оголошення."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /ad_reject, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if len(context.args) < 2:
-        if update.message:
-            await update.message.reply_text(
-                "❗Використовуйте: /ad_reject <user_id> <reason>"
-            )
-        return
-
-    try:
-        user_id = int(context.args[0])
-        reason = " ".join(context.args[1:])
-        message = (
-            "❌ Ваш запит на оголошення відхилено.\n"
-            f"📝 Причина: {reason}\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d відхилив запит на оголошення для користувача %d. Причина: %s",
-            update.effective_user.id,
-            user_id,
-            reason,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                f"✅ Повідомлення про відхилення надіслано користувачу {user_id}"
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення відхилення: %s", e)
-
-
-async def an_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Команда для відхилення запиту на рекламу."""
-    if update.effective_user.id not in MODERATOR_IDS:
-        if update.message:
-            await update.message.reply_text("⚠️ Ця команда доступна лише модераторам.")
-        logging.warning(
-            "Користувач %d намагався використати /an_reject, але не є модератором.",
-            update.effective_user.id,
-        )
-        return
-
-    if len(context.args) < 2:
-        if update.message:
-            await update.message.reply_text(
-                "❗Використовуйте: /an_reject <user_id> <reason>"
-            )
-        return
-
-    try:
-        user_id = int(context.args[0])
-        reason = " ".join(context.args[1:])
-        message = (
-            "❌ Ваш запит на рекламу відхилено.\n"
-            f"📝 Причина: {reason}\n"
-            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
-            "📢 @slavuta_ads"
-        )
-        await context.bot.send_message(chat_id=user_id, text=message)
-
-        logging.info(
-            "Модератор %d відхилив запит на рекламу для користувача %d.\n"
-            "Причина: %s",
-            update.effective_user.id,
-            user_id,
-            reason,
-        )
-
-        if update.message:
-            await update.message.reply_text(
-                "✅ Повідомлення про відхилення надіслано користувачу %d", user_id
-            )
-    except ValueError:
-        if update.message:
-            await update.message.reply_text("❗Некоректний user_id")
-    except Exception as e:
-        if update.message:
-            await update.message.reply_text(
-                f"❌ Помилка при відправці повідомлення: {str(e)}"
-            )
-        logging.error("Помилка при відправці повідомлення відхилення: %s", str(e))
-
-
-def main():
-    # Ініціалізація бота
-    application = Application.builder().token(TOKEN).build()
-    check_time()
-
-    # Головний ConversationHandler для основної логіки бота
-    conv_handler = ConversationHandler(
-        entry_points=[
-            CommandHandler("start", start),
-            CommandHandler("report", report_command),
-        ],
-        states={
-            CHOOSING_ACTION: [
-                MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handle_webapp_data),
-                CommandHandler("report", report_command),
-            ],
-            AWAITING_REPORT: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_report),
-                CommandHandler("start", start),
-            ],
-            AWAITING_PHOTOS: [
-                MessageHandler(
-                    filters.PHOTO | (filters.TEXT & ~filters.COMMAND), handle_photo
-                ),
-                CommandHandler("start", start),
-            ],
-        },
-        fallbacks=[
-            CommandHandler("start", start),
-            CommandHandler("report", report_command),
-        ],
-        per_message=False,
-    )
-
-    # 1. Middleware handlers
-    application.add_handler(MessageHandler(filters.ALL, blacklist_middleware), group=-1)
-    application.add_handler(conv_handler)
-
-    # 2. Адміністративні команди модерації
-    moderation_handlers = [
-        CommandHandler("ban", ban_user),
-        CommandHandler("unban", unban_user),
-        CommandHandler("blacklist", view_blacklist),
-        CommandHandler("ans", answer_report),
-    ]
-    for handler in moderation_handlers:
-        application.add_handler(handler)
-
-    # 3. Команди управління та статистики
-    management_handlers = [
-        CommandHandler("reset_counters", reset_counters),
-        CommandHandler("view_counters", view_counters),
-        CommandHandler("list_users", list_users),
-        CommandHandler("check_stats", check_stats),
-    ]
-    for handler in management_handlers:
-        application.add_handler(handler)
-
-    # 4. Довідкові команди
-    application.add_handler(CommandHandler("adm_help", adm_help))
-    application.add_handler(CommandHandler("mod_help", mod_help))
-
-    # 5. Команди для обробки платежів
-    application.add_handler(CommandHandler("payment", payment))
-
-    # 6. Команди прийняття заявок
-    acceptance_handlers = [
-        CommandHandler("buy_accept", buy_accept),
-        CommandHandler("sell_accept", sell_accept),
-        CommandHandler("ad_accept", ad_accept),
-        CommandHandler("an_accept", an_accept),
-    ]
-    for handler in acceptance_handlers:
-        application.add_handler(handler)
-
-    # 7. Команди відхилення заявок
-    rejection_handlers = [
-        CommandHandler("buy_reject", buy_reject),
-        CommandHandler("sell_reject", sell_reject),
-        CommandHandler("ad_reject", ad_reject),
-        CommandHandler("an_reject", an_reject),
-    ]
-    for handler in rejection_handlers:
-        application.add_handler(handler)
-
-    # 8. Налаштування періодичних завдань бота
-    application.job_queue.run_repeating(
-        callback=lambda context: check_bans(context.bot),
-        interval=3600,  # кожну годину
-        first=10,  # перший запуск через 10 секунд після старту
-    )
-
-    # 9. Налаштування планувальника
-    scheduler = BackgroundScheduler()
-
-    # Щоденні завдання
-    daily_jobs = [
-        # Відправка статистики о 23:59
-        {
-            "func": lambda: asyncio.run(send_daily_stats(application)),
-            "trigger": "cron",
-            "hour": 23,
-            "minute": 59,
-        },
-        # Скидання статистики о 00:00
-        {"func": reset_daily_stats, "trigger": "cron", "hour": 0, "minute": 0},
-        # Скидання лічильників користувачів
-        {"func": reset_all_counters, "trigger": "cron", "hour": 0, "minute": 0},
-    ]
-
-    for job in daily_jobs:
-        scheduler.add_job(
-            job["func"],
-            job["trigger"],
-            hour=job["hour"],
-            minute=job["minute"],
-            timezone="Europe/Kyiv",
-        )
-
-    # Періодична перевірка статусу
-    scheduler.add_job(check_bot_status, "interval", minutes=30)
-    scheduler.add_listener(handle_scheduler_error, EVENT_JOB_ERROR)
-
-    # 10. Запуск усіх компонентів
-    nest_asyncio.apply()
-    scheduler.start()
-    logging.info("Планувальник запущено успішно.")
-
-    # Запуск Flask сервера у окремому потоці
-    Thread(target=run_flask).start()
-
-    # Запуск бота
-    application.run_polling()
-
-
-if __name__ == "__main__":
-    main()
+# Стандартні бібліотеки Python
+import atexit
+import bisect
+import csv
+import gzip
+import hashlib
+import heapq
+import hmac
+import html
+import io
+import json
+import logging
+import math
+import mimetypes
+import multiprocessing
+import os
+import posixpath
+import random
+import re
+import secrets
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from threading import Lock, Thread, get_ident
+from typing import Dict, Any
+from collections import defaultdict, deque
+from itertools import islice
+
+# Сторонні бібліотеки
+try:
+    import brotli
+except ImportError:  # brotli необов'язковий: без нього форми роздаються з gzip
+    brotli = None
+import httpx
+import nest_asyncio
+import asyncio
+from flask import Flask, Response, request
+from pytz import timezone
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.events import EVENT_JOB_ERROR
+
+# Telegram-специфічні імпорти
+from telegram import (
+    Update,
+    ReplyKeyboardMarkup,
+    KeyboardButton,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    WebAppInfo,
+    InputMediaPhoto,
+    constants,
+    Bot,
+)
+from telegram.ext import (
+    ApplicationHandlerStop,
+    Application,
+    CommandHandler,
+    CallbackQueryHandler,
+    MessageHandler,
+    filters,
+    ConversationHandler,
+    ContextTypes,
+    TypeHandler,
+    BaseUpdateProcessor,
+)
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from telegram.request import BaseRequest, HTTPXRequest
+
+# Налаштування та константи
+BLACKLIST_FILE = "blacklist.json"
+
+# Ініціалізація
+nest_asyncio.apply()
+
+
+def load_config(file_path):
+    # Дозволений каталог
+    allowed_directory = os.path.realpath("config")
+    # Абсолютний шлях до файлу
+    absolute_file_path = os.path.realpath(file_path)
+
+    # Перевірка розширення файлу
+    if not file_path.endswith(".json"):
+        raise ValueError("Дозволено лише файли з розширенням .json.")
+
+    # Перевіряємо, чи знаходиться файл у дозволеному каталозі
+    if not absolute_file_path.startswith(allowed_directory):
+        raise ValueError("Доступ до файлу за межами дозволеного каталогу заборонено.")
+
+    # Якщо все добре, відкриваємо файл
+    with open(absolute_file_path, "r") as file:
+        return json.load(file)
+
+
+# Завантаження конфігурації
+CONFIG_FILE = "config.json"
+config = load_config(CONFIG_FILE)
+
+
+def check_time():
+    kyiv_tz = timezone("Europe/Kyiv")
+    current_time = datetime.now(kyiv_tz)
+    logging.info("Поточний час в Україні: %s", current_time)
+
+
+# Налаштування логування
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+    handlers=[
+        logging.FileHandler("bot.log"),  # Вказуємо файл для збереження логів
+        logging.StreamHandler(),  # Додатково виводимо в консоль
+    ],
+)
+
+# Пробний запис у лог
+logging.info("Бот запущено!")
+
+# Стани для ConversationHandler //Тут
+CHOOSING_ACTION, AWAITING_REPORT, AWAITING_PHOTOS = range(3)
+
+
+app = Flask("__name__")
+
+# Додаємо словник для відстеження щоденної статистики
+daily_stats = {
+    "buying": 0,  # Купівля
+    "selling": 0,  # Продаж
+    "announcement": 0,  # Оголошення
+    "advertising": 0,  # Реклама
+}
+
+# Використовуємо конфігураційні параметри
+TOKEN = config["TOKEN"]
+ADMIN_IDS = frozenset(config["ADMIN_IDS"])
+MODERATOR_IDS = frozenset(config["MODERATOR_IDS"])
+PAYMENT_CARD = config["PAYMENT_CARD"]
+RULES_LINK = config["RULES_LINK"]
+
+
+@app.route("/")
+def home():
+    return "Бот працює!"
+
+
+def run_flask():
+  app.run(host="127.0.0.1", port=1488)
+
+
+# Роздача форм веб-застосунку вбудованим HTTP-сервером
+WEBAPP_DIR = config.get("WEBAPP_DIR")  # каталог зібраних форм; None — форми на BASE_URL
+WEBAPP_PUBLIC_URL = config.get("WEBAPP_PUBLIC_URL")  # зовнішня адреса /forms/
+WEBAPP_COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".map"}
+WEBAPP_MIN_COMPRESS_BYTES = 512
+WEBAPP_IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+WEBAPP_ENTRY_CACHE = "no-cache"  # HTML щоразу перевіряється через ETag
+WEBAPP_URL_PREFIX = "/forms/"
+WEBAPP_TEXT_TYPES = {".html", ".css", ".js", ".mjs"}  # файли з посиланнями
+# Рядок у лапках, url(...) або значення атрибута без лапок
+WEBAPP_REFERENCE_RE = re.compile(
+    r"""(?P<open>["'(=]\s*)(?P<ref>[^"'()\s<>?#]+)(?P<suffix>[?#][^"'()\s<>]*)?"""
+    r"""(?=\s*["')\s>])"""
+)
+
+
+class StaticAsset:
+    """Файл форми в пам'яті разом зі стиснутими заздалегідь варіантами."""
+
+    def __init__(self, body: bytes, name: str, cache_control: str):
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {"identity": body}
+        if (
+            os.path.splitext(name)[1] in WEBAPP_COMPRESSIBLE
+            and len(body) >= WEBAPP_MIN_COMPRESS_BYTES
+        ):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants["gzip"] = compressed
+            if brotli:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = compressed
+
+    def etag(self, encoding: str) -> str:
+        # Різні кодування — різні байти, тому й ETag у кожного свій
+        if encoding == "identity":
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+    def choose_encoding(self, accept_encoding: str) -> str:
+        accepted = set()
+        for part in accept_encoding.split(","):
+            name, *params = part.split(";")
+            quality = 1.0
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            # q=0 (у будь-якому записі: 0.0, 0.000, " q=0") означає відмову
+            if quality > 0:
+                accepted.add(name.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.variants:
+                return encoding
+        return "identity"
+
+    def matches(self, if_none_match: str) -> bool:
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            tag = tag.removeprefix("W/").strip('"')
+            if tag.split("-")[0] == self.digest:
+                return True
+        return False
+
+
+def hashed_name(path: str, body: bytes) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+
+
+def resolve_reference(ref: str, base_dir: str, files) -> Any:
+    """Шлях файлу бандла, на який вказує посилання, або None для зовнішніх."""
+    if ref.startswith(WEBAPP_URL_PREFIX):
+        path = ref[len(WEBAPP_URL_PREFIX):]
+    elif ref.startswith(("/", "#", "data:", "mailto:")) or "://" in ref:
+        return None
+    else:
+        path = posixpath.normpath(posixpath.join(base_dir, ref))
+    if path in files:
+        return path
+    if ref.startswith(("./", "../", WEBAPP_URL_PREFIX)) and posixpath.splitext(ref)[1]:
+        # Явно локальне посилання на файл, якого немає: краще не зібрати бандл,
+        # ніж роздавати сторінку, що отримає 404
+        raise ValueError(f"{base_dir or '.'}: посилання на відсутній файл {ref}")
+    return None
+
+
+def bundle_references(text: str, relative: str, files):
+    base_dir = posixpath.dirname(relative)
+    return {
+        path
+        for match in WEBAPP_REFERENCE_RE.finditer(text)
+        if (path := resolve_reference(match.group("ref"), base_dir, files))
+    }
+
+
+def rewrite_references(text: str, relative: str, renames: Dict[str, str], files) -> str:
+    """Замінює посилання на файли бандла їхніми іменами з хешем."""
+    base_dir = posixpath.dirname(relative)
+
+    def replace(match):
+        ref = match.group("ref")
+        path = resolve_reference(ref, base_dir, files)
+        if path not in renames:
+            return match.group(0)
+        if ref.startswith(WEBAPP_URL_PREFIX):
+            target = WEBAPP_URL_PREFIX + renames[path]
+        else:
+            target = posixpath.relpath(renames[path], base_dir or ".")
+            if ref.startswith("./") and not target.startswith("."):
+                # import "./util.js" без "./" став би іменем пакета
+                target = "./" + target
+        return match.group("open") + target + (match.group("suffix") or "")
+
+    return WEBAPP_REFERENCE_RE.sub(replace, text)
+
+
+def bundle_order(files, dependencies):
+    """Порядок обробки, в якому файл іде після всіх, на які посилається."""
+    order, state = [], {}
+
+    def visit(name, chain):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(
+                "циклічні посилання між файлами форм: " + " -> ".join(chain + [name])
+            )
+        state[name] = "visiting"
+        for dependency in sorted(dependencies.get(name, ())):
+            visit(dependency, chain + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in sorted(files):
+        visit(name, [])
+    return order
+
+
+def build_webapp_bundle(directory: str) -> Dict[str, StaticAsset]:
+    """Готує каталог форм до роздачі.
+
+    Ресурси отримують імена з хешем вмісту і кешуються назавжди. HTML, CSS та
+    JS-модулі спершу переписуються (посилання на інші файли бандла, зокрема
+    import і абсолютні /forms/...), а вже потім хешуються, тому файли
+    обробляються в порядку залежностей. HTML лишається під своїм іменем.
+    Посилання на відсутній файл або цикл між модулями зупиняють збірку.
+    """
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            with open(path, "rb") as file:
+                files[relative] = file.read()
+
+    texts = {
+        relative: body.decode("utf-8")
+        for relative, body in files.items()
+        if posixpath.splitext(relative)[1] in WEBAPP_TEXT_TYPES
+    }
+    # HTML не перейменовується, тож посилання на сторінки не є залежностями
+    dependencies = {
+        relative: {
+            path
+            for path in bundle_references(text, relative, files)
+            if not path.endswith(".html")
+        }
+        for relative, text in texts.items()
+    }
+
+    assets, renames = {}, {}
+    for relative in bundle_order(files, dependencies):
+        body = files[relative]
+        if relative in texts:
+            body = rewrite_references(texts[relative], relative, renames, files).encode()
+        if relative.endswith(".html"):
+            assets[relative] = StaticAsset(body, relative, WEBAPP_ENTRY_CACHE)
+            continue
+        renamed = hashed_name(relative, body)
+        renames[relative] = renamed
+        assets[renamed] = StaticAsset(body, relative, WEBAPP_IMMUTABLE_CACHE)
+    return assets
+
+
+WEBAPP_ASSETS: Dict[str, StaticAsset] = (
+    build_webapp_bundle(WEBAPP_DIR) if WEBAPP_DIR else {}
+)
+if WEBAPP_ASSETS:
+    logging.info(
+        "Форми веб-застосунку: %d файлів з %s.", len(WEBAPP_ASSETS), WEBAPP_DIR
+    )
+
+
+@app.route("/forms/", defaults={"name": "index.html"})
+@app.route("/forms/<path:name>")
+def webapp_asset(name):
+    asset = WEBAPP_ASSETS.get(name)
+    if asset is None:
+        return "Не знайдено", 404
+
+    encoding = asset.choose_encoding(request.headers.get("Accept-Encoding", ""))
+    headers = {
+        "ETag": asset.etag(encoding),
+        "Cache-Control": asset.cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if asset.matches(request.headers.get("If-None-Match", "")):
+        return Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(asset.variants[encoding], mimetype=asset.mimetype, headers=headers)
+
+
+# //Тут
+
+
+# Лічильники користувачів
+user_post_counts = defaultdict(lambda: {"count": 0, "reset_time": datetime.now()})
+user_report_counts = defaultdict(lambda: {"count": 0, "reset_time": datetime.now()})
+
+
+# Режим шардів: фронтенд розподіляє оновлення між SHARDS процесами-воркерами
+SHARD_COUNT = config.get("SHARDS", 1)
+SHARD_ID = int(os.environ["BOT_SHARD"]) if "BOT_SHARD" in os.environ else None
+IS_PRIMARY = SHARD_ID in (None, 0)
+SHARED_STATE_FILE = "shared_state.sqlite3"
+# Скільки транзакція чекає на запис іншого шарду, перш ніж здатися
+SHARED_STORE_BUSY_TIMEOUT = config.get("SHARED_STORE_BUSY_TIMEOUT", 2)
+
+
+class SharedStore:
+    """Спільний для процесів-шардів стан у SQLite (режим WAL).
+
+    Зберігає лічильники лімітів, чорний список, щоденну статистику, заявки
+    на модерації та відбитки для пошуку дублікатів. Зміни виконуються в
+    транзакціях BEGIN IMMEDIATE, тому перевірка ліміту з інкрементом атомарна
+    між процесами. Обробники звертаються до сховища через run_store.
+    """
+
+    def __init__(self, file_path: str):
+        self.lock = Lock()
+        self.db = sqlite3.connect(
+            file_path,
+            timeout=SHARED_STORE_BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                user_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                reset_time REAL NOT NULL,
+                PRIMARY KEY (user_id, kind)
+            );
+            CREATE TABLE IF NOT EXISTS blacklist (
+                user_id INTEGER PRIMARY KEY,
+                entry TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stats (
+                form_type TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pending (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                form_type TEXT NOT NULL,
+                submission TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pending_user ON pending (user_id, form_type);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS contact_posts (
+                contact TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS contact_posts_contact
+                ON contact_posts (contact, at);
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                at REAL NOT NULL,
+                fingerprint TEXT NOT NULL,
+                user_id INTEGER NOT NULL
+            );
+            """
+        )
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    # Лічильники лімітів
+    def check_and_update_limit(self, user_id: int, kind: str, max_limit: int) -> bool:
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT count, reset_time FROM counters WHERE user_id = ? AND kind = ?",
+                (user_id, kind),
+            ).fetchone()
+            count, reset_time = row if row else (0, now)
+            if now - reset_time > 86400:
+                count, reset_time = 0, now
+            allowed = count < max_limit
+            db.execute(
+                "INSERT OR REPLACE INTO counters VALUES (?, ?, ?, ?)",
+                (user_id, kind, count + 1 if allowed else count, reset_time),
+            )
+            return allowed
+
+    def refund_limit(self, user_id: int, kind: str):
+        with self.transaction() as db:
+            db.execute(
+                "UPDATE counters SET count = count - 1 "
+                "WHERE user_id = ? AND kind = ? AND count > 0",
+                (user_id, kind),
+            )
+
+    def get_counter(self, user_id: int, kind: str) -> Dict[str, Any]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT count, reset_time FROM counters WHERE user_id = ? AND kind = ?",
+                (user_id, kind),
+            ).fetchone()
+        if not row:
+            return {"count": 0, "reset_time": datetime.now()}
+        return {"count": row[0], "reset_time": datetime.fromtimestamp(row[1])}
+
+    def delete_counters(self, user_id: int) -> bool:
+        with self.transaction() as db:
+            db.execute("DELETE FROM contact_posts WHERE user_id = ?", (user_id,))
+            return db.execute(
+                "DELETE FROM counters WHERE user_id = ?", (user_id,)
+            ).rowcount > 0
+
+    def reset_all_counters(self):
+        with self.transaction() as db:
+            db.execute("UPDATE counters SET count = 0, reset_time = ?", (time.time(),))
+            db.execute("DELETE FROM contact_posts")
+
+    def counter_user_ids(self, kind: str):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT user_id FROM counters WHERE kind = ?", (kind,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_counters(self, batch_size: int):
+        """Лічильники пачками за ключем, без довгого утримання блокування."""
+        last = (-(2**63), "")
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT user_id, kind, count, reset_time FROM counters "
+                    "WHERE (user_id, kind) > (?, ?) ORDER BY user_id, kind LIMIT ?",
+                    (*last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for user_id, kind, count, reset_time in rows:
+                yield user_id, kind, count, datetime.fromtimestamp(reset_time).isoformat()
+            last = rows[-1][:2]
+
+    # Ліміт на контакт
+    def check_and_add_contacts(self, contacts, user_id: int, limit: int, window: float):
+        now = time.time()
+        with self.transaction() as db:
+            for contact in contacts:
+                (count,) = db.execute(
+                    "SELECT COUNT(*) FROM contact_posts WHERE contact = ? AND at > ?",
+                    (contact, now - window),
+                ).fetchone()
+                if count >= limit:
+                    return contact
+            db.executemany(
+                "INSERT INTO contact_posts VALUES (?, ?, ?)",
+                [(contact, user_id, now) for contact in contacts],
+            )
+        return None
+
+    def refund_contacts(self, contacts, user_id: int):
+        with self.transaction() as db:
+            for contact in contacts:
+                db.execute(
+                    "DELETE FROM contact_posts WHERE rowid = (SELECT rowid FROM "
+                    "contact_posts WHERE contact = ? AND user_id = ? "
+                    "ORDER BY at DESC LIMIT 1)",
+                    (contact, user_id),
+                )
+
+    def recent_contact_posts(self, contact: str, window: float):
+        with self.lock:
+            return self.db.execute(
+                "SELECT at, user_id FROM contact_posts WHERE contact = ? AND at > ? "
+                "ORDER BY at",
+                (contact, time.time() - window),
+            ).fetchall()
+
+    def prune_contacts(self, window: float):
+        with self.transaction() as db:
+            db.execute(
+                "DELETE FROM contact_posts WHERE at <= ?", (time.time() - window,)
+            )
+
+    # Відбитки оголошень для пошуку дублікатів
+    def add_fingerprint(self, fingerprint: int, user_id: int):
+        # 64-бітний відбиток не вміщується в знаковий INTEGER SQLite
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO fingerprints (at, fingerprint, user_id) VALUES (?, ?, ?)",
+                (time.time(), format(fingerprint, "x"), user_id),
+            )
+
+    def fingerprints_since(self, seq: int):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT seq, at, fingerprint, user_id FROM fingerprints "
+                "WHERE seq > ? ORDER BY seq",
+                (seq,),
+            ).fetchall()
+        return [(seq, at, int(value, 16), user_id) for seq, at, value, user_id in rows]
+
+    def prune_fingerprints(self, window: float):
+        with self.transaction() as db:
+            db.execute("DELETE FROM fingerprints WHERE at <= ?", (time.time() - window,))
+
+    # Щоденна статистика
+    def increment_stat(self, form_type: str):
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO stats VALUES (?, 1) "
+                "ON CONFLICT (form_type) DO UPDATE SET count = count + 1",
+                (form_type,),
+            )
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.db.execute("SELECT form_type, count FROM stats"))
+
+    def reset_stats(self):
+        with self.transaction() as db:
+            db.execute("DELETE FROM stats")
+
+    # Чорний список
+    def blacklist_version(self) -> int:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value FROM meta WHERE key = 'blacklist_version'"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def load_blacklist(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            rows = self.db.execute("SELECT user_id, entry FROM blacklist").fetchall()
+        return {user_id: json.loads(entry) for user_id, entry in rows}
+
+    def update_blacklist(self, added: Dict[int, Dict[str, Any]], removed):
+        """Змінює лише вказані записи, не чіпаючи записів інших шардів."""
+        with self.transaction() as db:
+            db.executemany(
+                "INSERT INTO blacklist VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET entry = excluded.entry",
+                [
+                    (user_id, json.dumps(entry, ensure_ascii=False))
+                    for user_id, entry in added.items()
+                ],
+            )
+            db.executemany(
+                "DELETE FROM blacklist WHERE user_id = ?",
+                [(user_id,) for user_id in removed],
+            )
+            db.execute(
+                "INSERT INTO meta VALUES ('blacklist_version', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+
+    # Заявки на модерації
+    def add_pending(self, submission: Dict[str, Any]):
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO pending (user_id, form_type, submission) VALUES (?, ?, ?)",
+                (
+                    submission["user_id"],
+                    submission["form_type"],
+                    json.dumps(submission, ensure_ascii=False),
+                ),
+            )
+
+    def pop_pending(self, user_id: int, form_type: str):
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT seq, submission FROM pending "
+                "WHERE user_id = ? AND form_type = ? ORDER BY seq LIMIT 1",
+                (user_id, form_type),
+            ).fetchone()
+            if not row:
+                return None
+            db.execute("DELETE FROM pending WHERE seq = ?", (row[0],))
+            return json.loads(row[1])
+
+    def iter_pending(self, batch_size: int):
+        last_seq = 0
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT seq, submission FROM pending WHERE seq > ? "
+                    "ORDER BY seq LIMIT ?",
+                    (last_seq, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for _, submission in rows:
+                yield json.loads(submission)
+            last_seq = rows[-1][0]
+
+    def update_pending(self, submission_id: str, fields: Dict[str, Any]):
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT seq, submission FROM pending "
+                "WHERE json_extract(submission, '$.id') = ?",
+                (submission_id,),
+            ).fetchone()
+            if not row:
+                return None
+            submission = dict(json.loads(row[1]), **fields)
+            db.execute(
+                "UPDATE pending SET submission = ? WHERE seq = ?",
+                (json.dumps(submission, ensure_ascii=False), row[0]),
+            )
+            return submission
+
+    def mark_delivered(self, submission_id: str, delivered_at: str):
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT seq, submission FROM pending "
+                "WHERE json_extract(submission, '$.id') = ?",
+                (submission_id,),
+            ).fetchone()
+            if row:
+                submission = json.loads(row[1])
+                if "delivered_at" not in submission:
+                    submission["delivered_at"] = delivered_at
+                    db.execute(
+                        "UPDATE pending SET submission = ? WHERE seq = ?",
+                        (json.dumps(submission, ensure_ascii=False), row[0]),
+                    )
+
+    def attach_service(self, user_id: int, service_id: int):
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT seq, submission FROM pending WHERE user_id = ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (user_id,),
+            ).fetchone()
+            if row:
+                submission = dict(json.loads(row[1]), service_id=service_id)
+                db.execute(
+                    "UPDATE pending SET submission = ? WHERE seq = ?",
+                    (json.dumps(submission, ensure_ascii=False), row[0]),
+                )
+
+
+SHARED_STORE = SharedStore(SHARED_STATE_FILE) if SHARD_COUNT > 1 else None
+# Один потік на всі звернення до сховища: вони не перемежовуються між собою,
+# а чужа довга транзакція затримує лише обробник, що чекає, а не цикл подій
+SHARED_STORE_EXECUTOR = (
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-store")
+    if SHARED_STORE
+    else None
+)
+
+
+async def run_store(func, *args, **kwargs):
+    """Виконує функцію, що звертається до спільного сховища, поза циклом подій.
+
+    Без шардів стан лежить у пам'яті процесу, тож функція викликається одразу.
+    """
+    if not SHARED_STORE:
+        return func(*args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(
+        SHARED_STORE_EXECUTOR, partial(func, *args, **kwargs)
+    )
+
+
+def ensure_primary_shard(action: str):
+    """Черга публікації, індекс оголошень, платежі та розміщення живуть у файлах
+    основного шарду. Фронтенд направляє туди весь персонал, але якщо склад
+    персоналу щойно змінився, краще відмовити, ніж переписати файл своєю копією.
+    """
+    if not IS_PRIMARY:
+        raise RuntimeError(
+            f"{action} виконується лише на основному шарді, спробуйте ще раз"
+        )
+
+
+# Використовуємо посилання на форми
+BASE_URL = config["BASE_URL"]
+
+
+def build_forms_url(base_url):
+    return {
+        "Купівля": f"{base_url}?type=buying",
+        "Продаж": f"{base_url}?type=selling",
+        "Оголошення": f"{base_url}?type=announcement",
+        "Реклама": f"{base_url}?type=advertising",
+    }
+
+
+FORMS_URL = build_forms_url(WEBAPP_PUBLIC_URL or BASE_URL)
+
+
+# Перезавантаження конфігурації без перезапуску бота
+CONFIG_WATCH_SECONDS = 5
+CONFIG_RELOAD_STATS = {"reloads": 0, "failures": 0}
+config_file_state = None
+
+
+def get_config_file_state():
+    stat = os.stat(CONFIG_FILE)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def validate_config(data):
+    """Перевіряє нову конфігурацію; у разі помилки піднімає ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("конфігурація має бути JSON-об'єктом")
+    for key in ("ADMIN_IDS", "MODERATOR_IDS"):
+        ids = data.get(key)
+        if not isinstance(ids, list) or not all(
+            isinstance(item, int) and not isinstance(item, bool) for item in ids
+        ):
+            raise ValueError(f"{key} має бути списком цілих чисел")
+    if not data["ADMIN_IDS"]:
+        raise ValueError("ADMIN_IDS не може бути порожнім")
+    for key in ("TOKEN", "PAYMENT_CARD", "RULES_LINK", "BASE_URL"):
+        if not isinstance(data.get(key), str) or not data[key].strip():
+            raise ValueError(f"{key} має бути непорожнім рядком")
+    country_code = data.get("CONTACT_COUNTRY_CODE", "380")
+    if not (isinstance(country_code, str) and re.fullmatch(r"\d{1,3}", country_code)):
+        raise ValueError('CONTACT_COUNTRY_CODE має бути рядком з 1-3 цифр, напр. "380"')
+    peak_hours = data.get("PUBLISH_PEAK_HOURS", [18, 22])
+    if not (isinstance(peak_hours, list) and len(peak_hours) == 2):
+        raise ValueError("PUBLISH_PEAK_HOURS має бути парою [з, до]")
+    for key, default in (
+        ("DUPLICATE_WINDOW_HOURS", 72),
+        ("DUPLICATE_MAX_DISTANCE", 6),
+        ("CONTACT_POST_LIMIT", 5),
+        ("THROTTLE_RATE_PER_SECOND", 1),
+        ("THROTTLE_BURST", 15),
+        ("THROTTLE_BAN_DROPS", 0),
+        ("THROTTLE_BAN_MINUTES", 60),
+        ("ASSIGNMENT_CLAIM_MINUTES", 15),
+    ):
+        value = data.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"{key} має бути невід'ємним числом")
+    terms = data.get("BLOCKLIST_TERMS", [])
+    if not isinstance(terms, list) or not all(isinstance(term, str) for term in terms):
+        raise ValueError("BLOCKLIST_TERMS має бути списком рядків")
+    if data.get("BLOCKLIST_ACTION", "flag") not in BLOCKLIST_ACTIONS:
+        raise ValueError(
+            f"BLOCKLIST_ACTION має бути одним з: {', '.join(BLOCKLIST_ACTIONS)}"
+        )
+    if data.get("MODERATION_ASSIGNMENT", "broadcast") not in ASSIGNMENT_MODES:
+        raise ValueError(
+            f"MODERATION_ASSIGNMENT має бути одним з: {', '.join(ASSIGNMENT_MODES)}"
+        )
+    if data.get("MODERATION_ASSIGNMENT", "broadcast") != "broadcast" and not data[
+        "MODERATOR_IDS"
+    ]:
+        raise ValueError("Призначення заявок потребує непорожнього MODERATOR_IDS")
+
+
+# Ключі, які apply_config застосовує на льоту; зміна решти чекає перезапуску.
+# PUBLISH_CHANNEL серед них немає: розміщення зберігають id повідомлень у каналі
+RELOADABLE_CONFIG_KEYS = frozenset(
+    {
+        "ADMIN_IDS", "MODERATOR_IDS", "PAYMENT_CARD", "RULES_LINK", "BASE_URL",
+        "WEBAPP_PUBLIC_URL", "DUPLICATE_ACTION", "DUPLICATE_WINDOW_HOURS",
+        "DUPLICATE_MAX_DISTANCE", "PUBLISH_INTERVAL_SECONDS",
+        "PUBLISH_PEAK_INTERVAL_SECONDS", "PUBLISH_PEAK_HOURS",
+        "MODERATION_ASSIGNMENT", "ASSIGNMENT_CLAIM_MINUTES", "BLOCKLIST_TERMS",
+        "BLOCKLIST_ACTION", "CONTACT_COUNTRY_CODE", "CONTACT_POST_LIMIT",
+        "THROTTLE_RATE_PER_SECOND", "THROTTLE_BURST", "THROTTLE_BAN_DROPS",
+        "THROTTLE_BAN_MINUTES", "REPORTS_CHAT_ID",
+    }
+)  # fmt: skip
+
+
+def apply_config(new_config):
+    """Атомарно підміняє параметри, що можуть змінюватись без перезапуску."""
+    global config, ADMIN_IDS, MODERATOR_IDS, PAYMENT_CARD, RULES_LINK, BASE_URL
+    global WEBAPP_PUBLIC_URL, FORMS_URL
+    global DUPLICATE_ACTION, DUPLICATE_WINDOW_HOURS, DUPLICATE_MAX_DISTANCE
+    global PUBLISH_INTERVAL_SECONDS
+    global PUBLISH_PEAK_INTERVAL_SECONDS, PUBLISH_PEAK_HOURS, MODERATION_ASSIGNMENT
+    global ASSIGNMENT_CLAIM_MINUTES, BLOCKLIST, BLOCKLIST_ACTION, CONTACT_COUNTRY_CODE
+    global CONTACT_POST_LIMIT, THROTTLE_BAN_MINUTES, REPORTS_CHAT_ID
+
+    restart_keys = sorted(
+        key
+        for key in set(config) | set(new_config)
+        if key not in RELOADABLE_CONFIG_KEYS and config.get(key) != new_config.get(key)
+    )
+    if restart_keys:
+        logging.warning(
+            "Зміна %s потребує перезапуску бота і зараз ігнорується.",
+            ", ".join(restart_keys),
+        )
+
+    admin_ids = frozenset(new_config["ADMIN_IDS"])
+    moderator_ids = frozenset(new_config["MODERATOR_IDS"])
+    forms_url = build_forms_url(
+        new_config.get("WEBAPP_PUBLIC_URL") or new_config["BASE_URL"]
+    )
+    # Автомат будується заздалегідь, щоб підміна нижче лишалась атомарною
+    blocklist = build_blocklist(new_config)
+
+    # Між присвоєннями немає await, тому обробники бачать або стару, або нову версію
+    config = new_config
+    ADMIN_IDS, MODERATOR_IDS = admin_ids, moderator_ids
+    PAYMENT_CARD = new_config["PAYMENT_CARD"]
+    RULES_LINK = new_config["RULES_LINK"]
+    BASE_URL, FORMS_URL = new_config["BASE_URL"], forms_url
+    WEBAPP_PUBLIC_URL = new_config.get("WEBAPP_PUBLIC_URL")
+    DUPLICATE_ACTION = new_config.get("DUPLICATE_ACTION", "flag")
+    DUPLICATE_WINDOW_HOURS = new_config.get("DUPLICATE_WINDOW_HOURS", 72)
+    DUPLICATE_MAX_DISTANCE = new_config.get("DUPLICATE_MAX_DISTANCE", 6)
+    # Відбитки в індексі лишаються; нове вікно застосується при наступному find/add
+    DUPLICATE_DETECTOR.configure(
+        timedelta(hours=DUPLICATE_WINDOW_HOURS), DUPLICATE_MAX_DISTANCE
+    )
+    PUBLISH_INTERVAL_SECONDS = new_config.get("PUBLISH_INTERVAL_SECONDS", 300)
+    PUBLISH_PEAK_INTERVAL_SECONDS = new_config.get(
+        "PUBLISH_PEAK_INTERVAL_SECONDS", 600
+    )
+    PUBLISH_PEAK_HOURS = new_config.get("PUBLISH_PEAK_HOURS", [18, 22])
+    MODERATION_ASSIGNMENT = new_config.get("MODERATION_ASSIGNMENT", "broadcast")
+    ASSIGNMENT_CLAIM_MINUTES = new_config.get("ASSIGNMENT_CLAIM_MINUTES", 15)
+    BLOCKLIST = blocklist
+    BLOCKLIST_ACTION = new_config.get("BLOCKLIST_ACTION", "flag")
+    CONTACT_COUNTRY_CODE = new_config.get("CONTACT_COUNTRY_CODE", "380")
+    CONTACT_POST_LIMIT = new_config.get("CONTACT_POST_LIMIT", 5)
+    REPORTS_CHAT_ID = new_config.get("REPORTS_CHAT_ID")
+    # Бакети користувачів лишаються; нові межі діють з наступного оновлення
+    THROTTLE.rate = new_config.get("THROTTLE_RATE_PER_SECOND", 1)
+    THROTTLE.burst = new_config.get("THROTTLE_BURST", 15)
+    THROTTLE.ban_drops = new_config.get("THROTTLE_BAN_DROPS", 0)
+    THROTTLE_BAN_MINUTES = new_config.get("THROTTLE_BAN_MINUTES", 60)
+
+
+def read_config_if_changed():
+    """Читає config.json, якщо файл змінився; інакше повертає None."""
+    global config_file_state
+    state = get_config_file_state()
+    if state == config_file_state:
+        return None
+    config_file_state = state
+    new_config = load_config(CONFIG_FILE)
+    validate_config(new_config)
+    return new_config
+
+
+async def reload_config_if_changed():
+    """Перезавантажує config.json, якщо файл змінився; невалідну версію відкидає.
+
+    Файл читається в окремому потоці, а застосовується в циклі подій, щоб
+    обробники не бачили напівзастосовану конфігурацію.
+    """
+    try:
+        new_config = await asyncio.to_thread(read_config_if_changed)
+        if new_config is None:
+            return
+    except (OSError, ValueError, KeyError) as e:
+        # json.JSONDecodeError є підкласом ValueError
+        CONFIG_RELOAD_STATS["failures"] += 1
+        logging.error("Нову конфігурацію відхилено, залишаємо попередню: %s", e)
+        return
+
+    apply_config(new_config)
+    CONFIG_RELOAD_STATS["reloads"] += 1
+    logging.info(
+        "Конфігурацію перезавантажено (адміністраторів: %d, модераторів: %d).",
+        len(ADMIN_IDS),
+        len(MODERATOR_IDS),
+    )
+
+
+config_file_state = get_config_file_state()
+
+
+def get_main_keyboard():
+    buttons = [
+        [
+            KeyboardButton(
+                text="Купівля", web_app=WebAppInfo(url=FORMS_URL["Купівля"])
+            ),
+            KeyboardButton(text="Продаж", web_app=WebAppInfo(url=FORMS_URL["Продаж"])),
+        ],
+        [
+            KeyboardButton(
+                text="Оголошення", web_app=WebAppInfo(url=FORMS_URL["Оголошення"])
+            ),
+            KeyboardButton(
+                text="Реклама", web_app=WebAppInfo(url=FORMS_URL["Реклама"])
+            ),
+        ],
+    ]
+    return ReplyKeyboardMarkup(buttons, resize_keyboard=True)
+
+
+def handle_scheduler_error(event):
+    logging.error("Помилка планувальника: %s", event.exception)
+
+
+def check_and_update_limits(user_id, limit_type="post"):
+    if SHARED_STORE:
+        return SHARED_STORE.check_and_update_limit(
+            user_id, limit_type, 5 if limit_type == "post" else 10
+        )
+
+    current_time = datetime.now()
+    if limit_type == "post":
+        user_data = user_post_counts[user_id]
+        max_limit = 5
+    else:
+        user_data = user_report_counts[user_id]
+        max_limit = 10
+
+    if current_time - user_data["reset_time"] > timedelta(days=1):
+        user_data["count"] = 0
+        user_data["reset_time"] = current_time
+
+    if user_data["count"] >= max_limit:
+        return False
+
+    user_data["count"] += 1
+    return True
+
+
+def refund_limit(user_id, limit_type="post"):
+    """Повертає використаний ліміт, якщо заявку так і не було надіслано."""
+    if SHARED_STORE:
+        SHARED_STORE.refund_limit(user_id, limit_type)
+        return
+    counts = user_post_counts if limit_type == "post" else user_report_counts
+    if user_id in counts and counts[user_id]["count"] > 0:
+        counts[user_id]["count"] -= 1
+
+
+def get_user_counter(user_id, limit_type="post"):
+    if SHARED_STORE:
+        return SHARED_STORE.get_counter(user_id, limit_type)
+    counts = user_post_counts if limit_type == "post" else user_report_counts
+    return counts.get(user_id, {"count": 0, "reset_time": datetime.now()})
+
+
+def counter_user_ids(limit_type="post"):
+    if SHARED_STORE:
+        return SHARED_STORE.counter_user_ids(limit_type)
+    return user_post_counts if limit_type == "post" else user_report_counts
+
+
+def delete_user_counters(user_id) -> bool:
+    """Видаляє лічильники користувача; False, якщо їх не було."""
+    if SHARED_STORE:
+        return SHARED_STORE.delete_counters(user_id)
+    existed = user_id in user_post_counts or user_id in user_report_counts
+    CONTACT_INDEX.forget_user(user_id)
+    user_post_counts.pop(user_id, None)
+    user_report_counts.pop(user_id, None)
+    return existed
+
+
+# Ліміт оголошень на контакт: один номер з кількох акаунтів рахується разом
+CONTACT_POST_LIMIT = config.get("CONTACT_POST_LIMIT", 5)  # 0 — без обмеження
+CONTACT_COUNTRY_CODE = config.get("CONTACT_COUNTRY_CODE", "380")
+CONTACT_WINDOW_SECONDS = 86400  # те саме вікно, що й у ліміту на користувача
+CONTACT_PRUNE_SECONDS = 600
+CONTACT_PHONE_RE = re.compile(r"\+?\d(?:[ ()\-]{0,2}\d){6,14}")
+# Службові шляхи t.me (запрошення, стікери, проксі тощо) не є іменами користувачів;
+# посилання t.me/+... та t.me/c/... не підходять під формат імені і так
+CONTACT_RESERVED_PATHS = (
+    "joinchat", "addstickers", "addemoji", "addtheme", "addlist", "share",
+    "proxy", "socks", "setlanguage", "confirmphone", "login", "invoice", "boost",
+)
+CONTACT_LINK_RE = re.compile(r"\b(?:https?://)?t(?:elegram)?\.me/\S*")
+CONTACT_HANDLE_RE = re.compile(
+    r"(?:(?<![\w.])@|\b(?:https?://)?t(?:elegram)?\.me/"
+    r"(?!(?:" + "|".join(CONTACT_RESERVED_PATHS) + r")\b))([A-Za-z]\w{4,31})\b"
+)
+
+
+def normalize_phone(raw: str):
+    """Приводить номер до E.164; номери без коду країни вважаються місцевими."""
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        number = digits
+    elif digits.startswith(CONTACT_COUNTRY_CODE):
+        number = digits
+    elif digits.startswith("0") and CONTACT_COUNTRY_CODE.endswith("0"):
+        # Український формат 0XX...: нуль уже входить у код країни 380
+        number = CONTACT_COUNTRY_CODE[:-1] + digits
+    elif digits.startswith("8" + CONTACT_COUNTRY_CODE[-1]):
+        # Старий міжміський формат 80XX...
+        number = CONTACT_COUNTRY_CODE[:-1] + digits[1:]
+    else:
+        number = CONTACT_COUNTRY_CODE + digits
+    return f"+{number}" if 8 <= len(number) <= 15 else None
+
+
+def normalize_contacts(text: str):
+    """Витягує з поля контактів телефони (E.164) та @ніки Telegram."""
+    # Цифри з посилань (t.me/c/<id>/<пост>) не є телефонами
+    phones = CONTACT_PHONE_RE.findall(CONTACT_LINK_RE.sub(" ", text))
+    contacts = [phone for phone in map(normalize_phone, phones) if phone]
+    contacts += [f"@{handle.lower()}" for handle in CONTACT_HANDLE_RE.findall(text)]
+    return list(dict.fromkeys(contacts))
+
+
+class ContactIndex:
+    """Індекс контакт -> нещодавні заявки в межах вікна ліміту.
+
+    Записи кожного контакту лежать у черзі за часом, тож застарілі знімаються
+    з її початку, а підрахунок коштує O(1) у середньому. Загальна черга order
+    дозволяє прибирати й контакти, які більше не трапляються.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window = window_seconds
+        self.entries: Dict[str, deque] = {}  # контакт -> deque[(час, user_id)]
+        self.order = deque()  # (час, контакт) у порядку додавання
+
+    def _expire(self, contact: str, now: float):
+        items = self.entries.get(contact)
+        if items is None:
+            return ()
+        while items and now - items[0][0] > self.window:
+            items.popleft()
+        if not items:
+            del self.entries[contact]
+        return items
+
+    def recent(self, contact: str, now: float = None):
+        return list(self._expire(contact, time.time() if now is None else now))
+
+    def check_and_add(self, contacts, user_id: int, limit: int, now: float = None):
+        """Враховує заявку для всіх контактів; повертає контакт, що вичерпав ліміт."""
+        now = time.time() if now is None else now
+        for contact in contacts:
+            if len(self._expire(contact, now)) >= limit:
+                return contact
+        for contact in contacts:
+            self.entries.setdefault(contact, deque()).append((now, user_id))
+            self.order.append((now, contact))
+        return None
+
+    def refund(self, contacts, user_id: int):
+        for contact in contacts:
+            items = self.entries.get(contact, ())
+            for index in range(len(items) - 1, -1, -1):
+                if items[index][1] == user_id:
+                    del items[index]
+                    break
+            if contact in self.entries and not items:
+                del self.entries[contact]
+
+    def forget_user(self, user_id: int):
+        for contact, items in list(self.entries.items()):
+            kept = deque(item for item in items if item[1] != user_id)
+            if kept:
+                self.entries[contact] = kept
+            else:
+                del self.entries[contact]
+
+    def prune(self, now: float = None):
+        now = time.time() if now is None else now
+        while self.order and now - self.order[0][0] > self.window:
+            _, contact = self.order.popleft()
+            self._expire(contact, now)
+
+    def clear(self):
+        self.entries.clear()
+        self.order.clear()
+
+
+CONTACT_INDEX = ContactIndex(CONTACT_WINDOW_SECONDS)
+
+
+def check_contact_limit(contacts, user_id: int):
+    """Атомарно перевіряє і враховує ліміт контактів; повертає заблокований контакт."""
+    if not CONTACT_POST_LIMIT or not contacts:
+        return None
+    if SHARED_STORE:
+        return SHARED_STORE.check_and_add_contacts(
+            contacts, user_id, CONTACT_POST_LIMIT, CONTACT_WINDOW_SECONDS
+        )
+    return CONTACT_INDEX.check_and_add(contacts, user_id, CONTACT_POST_LIMIT)
+
+
+def refund_contact_limit(contacts, user_id: int):
+    if SHARED_STORE:
+        SHARED_STORE.refund_contacts(contacts, user_id)
+        return
+    CONTACT_INDEX.refund(contacts, user_id)
+
+
+def recent_contact_posts(contact: str):
+    """Заявки з контактом за вікно ліміту: список (час, user_id)."""
+    if SHARED_STORE:
+        return SHARED_STORE.recent_contact_posts(contact, CONTACT_WINDOW_SECONDS)
+    return CONTACT_INDEX.recent(contact)
+
+
+async def prune_contacts():
+    if SHARED_STORE:
+        await asyncio.to_thread(SHARED_STORE.prune_contacts, CONTACT_WINDOW_SECONDS)
+        return
+    CONTACT_INDEX.prune()
+
+
+def format_shared_contacts(contacts, user_id: int) -> str:
+    """Попередження для модератора, якщо контакт нещодавно подавали інші акаунти."""
+    lines = []
+    for contact in contacts:
+        posts = recent_contact_posts(contact)
+        others = sorted({poster for _, poster in posts if poster != user_id})
+        if others:
+            lines.append(
+                f"👥 Контакт {contact}: {len(posts)} заявок за добу, "
+                f"також з акаунтів {', '.join(map(str, others[:5]))}"
+                + (" …" if len(others) > 5 else "")
+            )
+    return "\n".join(lines)
+
+
+class BlacklistEntry:
+    def __init__(self, user_id: int, end_date: datetime, reason: str):
+        self.user_id = user_id
+        self.end_date = end_date
+        self.reason = reason
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "end_date": self.end_date.isoformat(),
+            "reason": self.reason,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "BlacklistEntry":
+        return BlacklistEntry(
+            user_id=data["user_id"],
+            end_date=datetime.fromisoformat(data["end_date"]),
+            reason=data["reason"],
+        )
+
+
+def load_blacklist() -> Dict[int, BlacklistEntry]:
+    if SHARED_STORE:
+        return {
+            user_id: BlacklistEntry.from_dict(entry_data)
+            for user_id, entry_data in SHARED_STORE.load_blacklist().items()
+        }
+    try:
+        with open(BLACKLIST_FILE, "r", encoding="utf-8") as file:
+            data = json.load(file)
+            return {
+                int(user_id): BlacklistEntry.from_dict(entry_data)
+                for user_id, entry_data in data.items()
+            }
+    except FileNotFoundError:
+        return {}
+
+
+def save_blacklist(blacklist: Dict[int, BlacklistEntry]):
+    """Зберігає чорний список у файл; у режимі шардів див. update_blacklist()."""
+    # Запис у тимчасовий файл і заміна: файл або старий, або новий цілком
+    with open(BLACKLIST_FILE + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(
+            {str(user_id): entry.to_dict() for user_id, entry in blacklist.items()},
+            file,
+            indent=2,
+            ensure_ascii=False,
+        )
+    os.replace(BLACKLIST_FILE + ".tmp", BLACKLIST_FILE)
+
+
+BLACKLIST: Dict[int, BlacklistEntry] = load_blacklist()
+blacklist_version = SHARED_STORE.blacklist_version() if SHARED_STORE else 0
+BLACKLIST_SYNC_SECONDS = 1  # як часто обробка оновлень перевіряє версію
+blacklist_synced_at = time.monotonic()
+
+
+def sync_blacklist():
+    """Підтягує чорний список зі спільного сховища, якщо його змінив інший шард."""
+    global blacklist_version, blacklist_synced_at
+    blacklist_synced_at = time.monotonic()
+    version = SHARED_STORE.blacklist_version()
+    if version != blacklist_version:
+        # Без clear(): цикл подій читає словник паралельно і не має побачити його порожнім
+        blacklist = load_blacklist()
+        for user_id in set(BLACKLIST) - set(blacklist):
+            BLACKLIST.pop(user_id, None)
+        BLACKLIST.update(blacklist)
+        blacklist_version = version
+
+
+def update_blacklist(added: Dict[int, BlacklistEntry] = None, removed=()):
+    """Додає та видаляє окремі записи чорного списку.
+
+    У режимі шардів змінюються лише ці рядки спільного сховища, а пам'ять
+    потім синхронізується з ним, тож бани інших шардів не втрачаються.
+    """
+    added = added or {}
+    if SHARED_STORE:
+        SHARED_STORE.update_blacklist(
+            {user_id: entry.to_dict() for user_id, entry in added.items()}, removed
+        )
+        sync_blacklist()
+        return
+    blacklist = {**BLACKLIST, **added}
+    for user_id in removed:
+        blacklist.pop(user_id, None)
+    # Пам'ять змінюємо лише після успішного збереження
+    save_blacklist(blacklist)
+    BLACKLIST.clear()
+    BLACKLIST.update(blacklist)
+
+
+# Поля форм, що описують зміст оголошення (назва, опис, контакт, категорія)
+FORM_FIELDS = {
+    "buying": {
+        "title": "productName",
+        "description": "buyerDescription",
+        "contact": "buyerContact",
+        "category": "buyingCategory",
+    },
+    "selling": {
+        "title": "itemName",
+        "description": "sellerDescription",
+        "contact": "sellerContact",
+        "category": "sellingCategory",
+    },
+    "announcement": {
+        "title": None,
+        "description": "description",
+        "contact": "contact",
+        "category": "category",
+    },
+    "advertising": {
+        "title": "companyName",
+        "description": "adDescription",
+        "contact": "adContact",
+        "category": None,
+    },
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def get_form_field(data, form_type, field):
+    """Повертає значення поля форми за його логічною назвою."""
+    key = FORM_FIELDS.get(form_type, {}).get(field)
+    if not key:
+        return ""
+    value = data.get(key)
+    return str(value) if value else ""
+
+
+def tokenize(text):
+    """Розбиває текст на нормалізовані токени (нижній регістр, без розділових знаків)."""
+    return TOKEN_RE.findall(text.lower())
+
+
+# Налаштування пошуку дублікатів
+DUPLICATE_WINDOW_HOURS = config.get("DUPLICATE_WINDOW_HOURS", 72)
+DUPLICATE_MAX_DISTANCE = config.get("DUPLICATE_MAX_DISTANCE", 6)
+DUPLICATE_ACTION = config.get("DUPLICATE_ACTION", "flag")  # "flag" або "hold"
+
+
+class DuplicateDetector:
+    """Індекс SimHash-відбитків нещодавніх оголошень для пошуку майже-дублікатів.
+
+    64-бітний відбиток ділиться на смуги по 8 біт. Якщо відстань Хеммінга між
+    відбитками не перевищує кількість смуг мінус один, хоча б одна смуга
+    збігається повністю, тому кандидатів шукаємо словником за смугами.
+    """
+
+    BITS = 64
+    BANDS = 8
+
+    def __init__(self, window: timedelta, max_distance: int = 6):
+        self.configure(window, max_distance)
+        self.band_bits = self.BITS // self.BANDS
+        self.entries = deque()  # (час, id запису, відбиток, user_id)
+        self.bands = defaultdict(set)  # (номер смуги, значення) -> id записів
+        self.fingerprints: Dict[int, tuple] = {}
+        self.next_id = 0
+
+    def configure(self, window: timedelta, max_distance: int):
+        # Більша відстань не гарантує спільної смуги, тому обмежуємо її
+        self.window = window
+        self.max_distance = min(max_distance, self.BANDS - 1)
+
+    @staticmethod
+    def features(data, form_type):
+        """Ознаки оголошення: токени полів та пари сусідніх токенів."""
+        tokens = []
+        for field in ("title", "description", "contact"):
+            tokens.extend(tokenize(get_form_field(data, form_type, field)))
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    @classmethod
+    def fingerprint(cls, data, form_type) -> int:
+        weights = [0] * cls.BITS
+        for feature in cls.features(data, form_type):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            for bit in range(cls.BITS):
+                weights[bit] += 1 if value >> bit & 1 else -1
+        return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+    @staticmethod
+    def distance(a: int, b: int) -> int:
+        return bin(a ^ b).count("1")
+
+    def _band_keys(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        return [
+            (band, fingerprint >> (band * self.band_bits) & mask)
+            for band in range(self.BANDS)
+        ]
+
+    def _expire(self, now: datetime):
+        while self.entries and now - self.entries[0][0] > self.window:
+            _, entry_id, fingerprint, _ = self.entries.popleft()
+            for key in self._band_keys(fingerprint):
+                ids = self.bands[key]
+                ids.discard(entry_id)
+                if not ids:
+                    del self.bands[key]
+            self.fingerprints.pop(entry_id, None)
+
+    def find(self, fingerprint: int, now: datetime = None):
+        """Повертає (user_id, відстань) найближчого дубліката або None."""
+        self._expire(now or datetime.now())
+        best = None
+        candidates = set()
+        for key in self._band_keys(fingerprint):
+            candidates.update(self.bands.get(key, ()))
+        for entry_id in candidates:
+            other, user_id = self.fingerprints[entry_id]
+            dist = self.distance(fingerprint, other)
+            if dist <= self.max_distance and (best is None or dist < best[1]):
+                best = (user_id, dist)
+        return best
+
+    def add(self, fingerprint: int, user_id: int, now: datetime = None):
+        now = now or datetime.now()
+        self._expire(now)
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries.append((now, entry_id, fingerprint, user_id))
+        self.fingerprints[entry_id] = (fingerprint, user_id)
+        for key in self._band_keys(fingerprint):
+            self.bands[key].add(entry_id)
+
+
+DUPLICATE_DETECTOR = DuplicateDetector(
+    timedelta(hours=DUPLICATE_WINDOW_HOURS), DUPLICATE_MAX_DISTANCE
+)
+fingerprint_seq = 0  # останній відбиток спільного сховища, доданий до індексу
+
+
+def sync_fingerprints():
+    """Додає до індексу відбитки, які з часу останньої синхронізації записали шарди."""
+    global fingerprint_seq
+    for seq, at, fingerprint, user_id in SHARED_STORE.fingerprints_since(
+        fingerprint_seq
+    ):
+        DUPLICATE_DETECTOR.add(fingerprint, user_id, datetime.fromtimestamp(at))
+        fingerprint_seq = seq
+
+
+def find_duplicate(fingerprint: int):
+    if SHARED_STORE:
+        sync_fingerprints()
+    return DUPLICATE_DETECTOR.find(fingerprint)
+
+
+def remember_fingerprint(fingerprint: int, user_id: int):
+    # У режимі шардів відбиток іде через спільне сховище, інакше дублікат
+    # від користувача з іншого шарду не знайшовся б
+    if SHARED_STORE:
+        SHARED_STORE.add_fingerprint(fingerprint, user_id)
+        sync_fingerprints()
+    else:
+        DUPLICATE_DETECTOR.add(fingerprint, user_id)
+
+
+def prune_fingerprints():
+    SHARED_STORE.prune_fingerprints(DUPLICATE_WINDOW_HOURS * 3600)
+
+
+def evaluate_duplicate_detector(fixture_path):
+    """Оцінює точність та повноту пошуку дублікатів на розміченому наборі пар."""
+    with open(fixture_path, "r", encoding="utf-8") as file:
+        pairs = json.load(file)
+
+    tp = fp = fn = tn = 0
+    elapsed = 0.0
+    for pair in pairs:
+        detector = DuplicateDetector(timedelta(hours=1), DUPLICATE_MAX_DISTANCE)
+        first, second = pair["a"], pair["b"]
+        detector.add(
+            DuplicateDetector.fingerprint(first, first.get("formType")), user_id=0
+        )
+        started = time.perf_counter()
+        found = detector.find(
+            DuplicateDetector.fingerprint(second, second.get("formType"))
+        )
+        elapsed += time.perf_counter() - started
+        predicted = found is not None
+        if predicted and pair["duplicate"]:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif pair["duplicate"]:
+            fn += 1
+        else:
+            tn += 1
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    print(f"Пар: {len(pairs)}  TP={tp} FP={fp} FN={fn} TN={tn}")
+    print(f"Precision: {precision:.3f}  Recall: {recall:.3f}")
+    print(f"Середній час перевірки: {elapsed / max(len(pairs), 1) * 1e6:.1f} мкс")
+
+
+# Стоп-список заборонених термінів (автомат Ахо–Корасік)
+BLOCKLIST_ACTIONS = ("flag", "reject")
+BLOCKLIST_SNIPPET_CHARS = 30
+# Однаково написані літери латиниці й кирилиці, з урахуванням регістру
+BLOCKLIST_LATIN_LOOKALIKES = "aceopxyiABCEHIKMOPTXY"
+BLOCKLIST_CYRILLIC_LOOKALIKES = "асеорхуіАВСЕНІКМОРТХУ"
+BLOCKLIST_TO_CYRILLIC = str.maketrans(
+    BLOCKLIST_LATIN_LOOKALIKES, BLOCKLIST_CYRILLIC_LOOKALIKES
+)
+BLOCKLIST_TO_LATIN = str.maketrans(
+    BLOCKLIST_CYRILLIC_LOOKALIKES, BLOCKLIST_LATIN_LOOKALIKES
+)
+BLOCKLIST_CYRILLIC_RE = re.compile(r"[а-яєіїґё]", re.IGNORECASE)
+BLOCKLIST_LATIN_RE = re.compile(r"[a-z]", re.IGNORECASE)
+# Слово, в якому є літери обох алфавітів
+BLOCKLIST_MIXED_WORD_RE = re.compile(
+    r"\b(?=\w*[a-z])(?=\w*[а-яєіїґё])\w+", re.IGNORECASE
+)
+
+
+def lower_text(text: str) -> str:
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Окремі символи (наприклад "İ") при lower() розпадаються на два
+        lowered = "".join(char.lower()[:1] for char in text)
+    return lowered
+
+
+def fold_mixed_word(match) -> str:
+    """Зводить слово зі змішаних алфавітів до того, якого в ньому більше."""
+    word = match.group(0)
+    cyrillic = len(BLOCKLIST_CYRILLIC_RE.findall(word))
+    latin = len(BLOCKLIST_LATIN_RE.findall(word))
+    return word.translate(
+        BLOCKLIST_TO_CYRILLIC if cyrillic >= latin else BLOCKLIST_TO_LATIN
+    )
+
+
+def fold_text(text: str) -> str:
+    """Нормалізує текст посимвольно, тож позиції збігів лишаються дійсними.
+
+    Змінюються лише слова зі змішаних алфавітів ("прoдaм" з латинськими o/a
+    стає "продам"), тому звичайні українські й англійські слова не
+    перетворюються одне на одне.
+    """
+    return lower_text(BLOCKLIST_MIXED_WORD_RE.sub(fold_mixed_word, text))
+
+
+class KeywordAutomaton:
+    """Автомат Ахо–Корасік: усі терміни шукаються за один прохід тексту.
+
+    Терміни — основи слів: збіг зараховується, лише якщо починається на
+    початку слова, тож "наркот" знайде "наркотики", але не "ненаркотичний".
+    """
+
+    def __init__(self, terms):
+        # Терміни не згортаються: "top" має лишитися латиницею, а не стати "тор"
+        self.terms = sorted({lower_text(term.strip()) for term in terms if term.strip()})
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] = (term_id,)
+
+        # Посилання невдачі будуються обходом у ширину від кореня
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] += self.output[self.fail[child]]
+
+    def scan(self, text: str):
+        """Повертає (початок, кінець, термін) для кожного збігу в тексті."""
+        goto, fail, output = self.goto, self.fail, self.output
+        matches = []
+        state = 0
+        for index, char in enumerate(fold_text(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term_id in output[state]:
+                term = self.terms[term_id]
+                start = index - len(term) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    matches.append((start, index + 1, term))
+        return matches
+
+    def scan_payload(self, data: Dict[str, Any]):
+        """Перевіряє всі текстові поля форми одним проходом.
+
+        Поля склеюються через символ, якого немає в термінах, а збіги
+        повертаються як (поле, початок, кінець, термін) відносно свого поля.
+        """
+        keys, fields, offsets, position = [], [], [], 0
+        for key, value in data.items():
+            if key == "formType" or not isinstance(value, str):
+                continue
+            keys.append(key)
+            fields.append(value)
+            offsets.append(position)
+            position += len(value) + 1
+        matches = []
+        for start, end, term in self.scan("\0".join(fields)):
+            index = bisect.bisect_right(offsets, start) - 1
+            offset = offsets[index]
+            matches.append((keys[index], start - offset, end - offset, term))
+        return matches
+
+
+def build_blocklist(source_config) -> KeywordAutomaton:
+    automaton = KeywordAutomaton(source_config.get("BLOCKLIST_TERMS", []))
+    if automaton.terms:
+        logging.info("Стоп-список: %d термінів.", len(automaton.terms))
+    return automaton
+
+
+BLOCKLIST = build_blocklist(config)
+BLOCKLIST_ACTION = config.get("BLOCKLIST_ACTION", "flag")  # "flag" або "reject"
+BLOCKLIST_STATS = {"flagged": 0, "rejected": 0}
+
+
+def highlight_blocklist_matches(data: Dict[str, Any], matches) -> str:
+    """Рядок для модератора: кожен збіг виділено жирним у контексті свого поля."""
+    lines = []
+    for key, start, end, _ in matches[:5]:
+        value = data[key]
+        before = value[max(0, start - BLOCKLIST_SNIPPET_CHARS):start]
+        after = value[end:end + BLOCKLIST_SNIPPET_CHARS]
+        lines.append(
+            f"• {key}: …{html.escape(before)}<b>{html.escape(value[start:end])}</b>"
+            f"{html.escape(after)}…"
+        )
+    if len(matches) > 5:
+        lines.append(f"• і ще {len(matches) - 5}")
+    return "🚫 Збіг зі стоп-списком:\n" + "\n".join(lines)
+
+
+def random_terms(count: int, rng: random.Random):
+    alphabet = "абвгдеєжзиіїйклмнопрстуфхцчшщьюя"
+    return [
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(4, 10)))
+        for _ in range(count)
+    ]
+
+
+def benchmark_blocklist(terms="5000", payloads="2000"):
+    """Порівнює автомат Ахо–Корасік з одним регулярним виразом на N термінах."""
+    rng = random.Random(42)
+    terms = random_terms(int(terms), rng)
+    words = random_terms(3000, rng)
+    samples = [
+        {
+            "formType": "selling",
+            "itemName": " ".join(rng.choices(words, k=4)),
+            "sellerDescription": " ".join(rng.choices(words, k=60)),
+            "sellerContact": f"+38067{rng.randrange(10**7):07d}",
+        }
+        for _ in range(int(payloads))
+    ]
+    volume = sum(
+        len(value) for sample in samples for value in sample.values()
+    ) / 1024 / 1024
+
+    started = time.perf_counter()
+    automaton = KeywordAutomaton(terms)
+    build_time = time.perf_counter() - started
+    started = time.perf_counter()
+    found = sum(len(automaton.scan_payload(sample)) for sample in samples)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Ахо–Корасік: {len(automaton.terms)} термінів, {len(automaton.goto)} станів, "
+        f"побудова {build_time * 1000:.0f} мс"
+    )
+    print(
+        f"  {len(samples) / elapsed:8.0f} заявок/с, {volume / elapsed:6.2f} МБ/с, "
+        f"збігів {found}"
+    )
+
+    started = time.perf_counter()
+    pattern = re.compile(
+        r"(?<!\w)(?:" + "|".join(map(re.escape, automaton.terms)) + ")"
+    )
+    build_time = time.perf_counter() - started
+    started = time.perf_counter()
+    found = sum(
+        len(pattern.findall(fold_text(value)))
+        for sample in samples
+        for key, value in sample.items()
+        if key != "formType"
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Регулярний вираз: побудова {build_time * 1000:.0f} мс")
+    print(
+        f"  {len(samples) / elapsed:8.0f} заявок/с, {volume / elapsed:6.2f} МБ/с, "
+        f"збігів {found}"
+    )
+
+
+async def notify_user(bot: Bot, user_id: int, text: str) -> bool:
+    try:
+        await bot.send_message(chat_id=user_id, text=text)
+        return True
+    except Exception as e:
+        logging.error(
+            "Помилка при відправці повідомлення користувачу %d: %s", user_id, e
+        )
+        return False
+
+
+# Надійна черга вихідних повідомлень (outbox)
+OUTBOX_FILE = "outbox.sqlite3" if SHARD_ID is None else f"outbox.{SHARD_ID}.sqlite3"
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BASE_DELAY_SECONDS = 5
+OUTBOX_MAX_DELAY_SECONDS = 3600
+OUTBOX_RETENTION_DAYS = 7
+OUTBOX_METHODS = {"send_message", "send_photo"}
+
+
+class Outbox:
+    """Персистентна черга вихідних повідомлень.
+
+    Кожне повідомлення записується один раз під ключем ідемпотентності, тому
+    повторне додавання того самого повідомлення ігнорується. Доставка йде по
+    черзі для кожного чату; невдалі спроби повторюються з експоненційною
+    затримкою, а після OUTBOX_MAX_ATTEMPTS повідомлення переходить у стан "dead".
+    """
+
+    def __init__(self, file_path: str):
+        self.lock = Lock()
+        self.db = sqlite3.connect(file_path, check_same_thread=False)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT UNIQUE NOT NULL,
+                chat_id INTEGER NOT NULL,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_chat ON outbox (chat_id, status, seq);
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+            """
+        )
+        # Повідомлення, доставку яких перервав перезапуск, надсилаємо повторно
+        self.db.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+        self.db.commit()
+
+    def enqueue(self, key: str, chat_id: int, method: str, **payload) -> bool:
+        """Додає повідомлення; повертає False, якщо ключ уже був у черзі."""
+        if method not in OUTBOX_METHODS:
+            raise ValueError(f"Непідтримуваний метод outbox: {method}")
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO outbox "
+                "(key, chat_id, method, payload, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, chat_id, method, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            self.db.commit()
+        return cursor.rowcount == 1
+
+    def _claim_due(self, limit: int, prefix: str = ""):
+        """Бере перше непередане повідомлення кожного чату, якщо настав його час."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT seq, key, chat_id, method, payload, attempts FROM outbox o "
+                "WHERE status = 'pending' AND next_attempt_at <= ? "
+                "AND substr(key, 1, ?) = ? "
+                "AND NOT EXISTS (SELECT 1 FROM outbox p WHERE p.chat_id = o.chat_id "
+                "AND p.status IN ('pending', 'sending') AND p.seq < o.seq) "
+                "ORDER BY seq LIMIT ?",
+                (time.time(), len(prefix), prefix, limit),
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE outbox SET status = 'sending' WHERE seq = ?",
+                [(row[0],) for row in rows],
+            )
+            self.db.commit()
+        return rows
+
+    def _finish(self, seq: int, status: str, attempts: int, delay=0.0, error=None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "last_error = ? WHERE seq = ?",
+                (status, attempts, time.time() + delay, error, seq),
+            )
+            self.db.commit()
+
+    async def flush(self, bot: Bot, batch_size: int = 30, prefix: str = ""):
+        """Доставляє повідомлення, для яких настав час відправки.
+
+        З prefix доставляються лише повідомлення з ключами, що з нього
+        починаються; решту забере періодичне завдання.
+        """
+        while True:
+            rows = self._claim_due(batch_size, prefix)
+            if not rows:
+                return
+            for seq, key, chat_id, method, payload, attempts in rows:
+                attempts += 1
+                try:
+                    await getattr(bot, method)(chat_id=chat_id, **json.loads(payload))
+                    self._finish(seq, "sent", attempts)
+                    if key.startswith("submission:"):
+                        mark_submission_delivered(key.split(":")[1])
+                except (Forbidden, BadRequest) as e:
+                    self._finish(seq, "dead", attempts, error=str(e))
+                    logging.error("Повідомлення %s не може бути доставлене: %s", key, e)
+                except Exception as e:
+                    if attempts >= OUTBOX_MAX_ATTEMPTS:
+                        self._finish(seq, "dead", attempts, error=str(e))
+                        logging.error(
+                            "Повідомлення %s переведено в dead після %d спроб: %s",
+                            key,
+                            attempts,
+                            e,
+                        )
+                        continue
+                    if isinstance(e, RetryAfter):
+                        delay = float(e.retry_after)
+                    else:
+                        delay = min(
+                            OUTBOX_BASE_DELAY_SECONDS * 2 ** (attempts - 1),
+                            OUTBOX_MAX_DELAY_SECONDS,
+                        )
+                    self._finish(seq, "pending", attempts, delay, str(e))
+                    logging.warning(
+                        "Помилка доставки %s (спроба %d), повтор через %.0f с: %s",
+                        key,
+                        attempts,
+                        delay,
+                        e,
+                    )
+
+    def purge(self):
+        """Видаляє доставлені повідомлення, старші за OUTBOX_RETENTION_DAYS."""
+        with self.lock:
+            self.db.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND created_at < ?",
+                (time.time() - OUTBOX_RETENTION_DAYS * 86400,),
+            )
+            self.db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(
+                self.db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+            )
+
+
+OUTBOX = Outbox(OUTBOX_FILE)
+
+
+def flush_outbox_soon(context: ContextTypes.DEFAULT_TYPE, prefix: str = ""):
+    """Запускає доставку у фоні, щоб обробник відповів користувачу одразу."""
+    context.application.create_task(OUTBOX.flush(context.bot, prefix=prefix))
+
+
+# Обмеження частоти вхідних оновлень від одного користувача
+THROTTLE_RATE_PER_SECOND = config.get("THROTTLE_RATE_PER_SECOND", 1)
+THROTTLE_BURST = config.get("THROTTLE_BURST", 15)  # альбом з 10 фото проходить цілком
+THROTTLE_BAN_DROPS = config.get("THROTTLE_BAN_DROPS", 0)  # 0 — без автоблокування
+THROTTLE_BAN_MINUTES = config.get("THROTTLE_BAN_MINUTES", 60)
+THROTTLE_PRUNE_SECONDS = 300
+
+
+class UserThrottle:
+    """Токен-бакет на користувача: burst оновлень одразу, далі rate за секунду.
+
+    Відкинуті оновлення накопичуються, доки бакет знову не наповниться; якщо
+    їх набирається ban_drops, користувача варто тимчасово заблокувати.
+    """
+
+    def __init__(self, rate: float, burst: int, ban_drops: int):
+        self.rate = rate
+        self.burst = burst
+        self.ban_drops = ban_drops
+        self.buckets: Dict[int, list] = {}  # user_id -> [токени, час, відкинуто]
+        self.dropped = 0
+        self.auto_bans = 0
+
+    def allow(self, user_id: int, now: float) -> bool:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            self.buckets[user_id] = [self.burst - 1, now, 0]
+            return True
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= self.burst:
+            bucket[2] = 0  # користувач заспокоївся, епізод флуду завершено
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        bucket[2] += 1
+        self.dropped += 1
+        return False
+
+    def should_ban(self, user_id: int) -> bool:
+        bucket = self.buckets.get(user_id)
+        return bool(self.ban_drops and bucket and bucket[2] >= self.ban_drops)
+
+    def throttled_users(self, now: float) -> int:
+        return sum(
+            1
+            for tokens, last, dropped in self.buckets.values()
+            if dropped and tokens + (now - last) * self.rate < self.burst
+        )
+
+    def prune(self, now: float):
+        """Прибирає повні бакети: вони нічим не відрізняються від відсутніх."""
+        full = [
+            user_id
+            for user_id, (tokens, last, _) in self.buckets.items()
+            if tokens + (now - last) * self.rate >= self.burst
+        ]
+        for user_id in full:
+            del self.buckets[user_id]
+
+
+THROTTLE = UserThrottle(THROTTLE_RATE_PER_SECOND, THROTTLE_BURST, THROTTLE_BAN_DROPS)
+
+
+async def prune_throttle():
+    THROTTLE.prune(time.monotonic())
+
+
+async def ban_flooder(user_id: int):
+    end_date = datetime.now() + timedelta(minutes=THROTTLE_BAN_MINUTES)
+    entry = BlacklistEntry(user_id, end_date, "Автоматично: надто часті повідомлення")
+    await run_store(update_blacklist, {user_id: entry})
+    THROTTLE.auto_bans += 1
+    # Бакет лишається порожнім, тож відповіді про бан теж обмежуються
+    THROTTLE.buckets[user_id][2] = 0
+    logging.warning(
+        "Користувача %d автоматично заблоковано на %d хв за флуд.",
+        user_id,
+        THROTTLE_BAN_MINUTES,
+    )
+
+
+async def blacklist_middleware(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not update.effective_user:
+        return
+
+    user_id = update.effective_user.id
+    # Надлишкові оновлення мовчки відкидаються ще до ConversationHandler
+    if user_id not in ADMIN_IDS and user_id not in MODERATOR_IDS:
+        if not THROTTLE.allow(user_id, time.monotonic()):
+            if THROTTLE.should_ban(user_id):
+                await ban_flooder(user_id)
+            raise ApplicationHandlerStop()
+
+    if SHARED_STORE and time.monotonic() - blacklist_synced_at >= BLACKLIST_SYNC_SECONDS:
+        await run_store(sync_blacklist)
+
+    if user_id in BLACKLIST:
+        entry = BLACKLIST[user_id]
+        if entry.end_date > datetime.now():
+            remaining_time = entry.end_date - datetime.now()
+            days = remaining_time.days
+            hours = remaining_time.seconds // 3600
+            text = (
+                f"❌ Ви не можете використовувати цього бота.\n"
+                f"⏳ Термін блокування: {days}д {hours}г\n"
+                f"📝 Причина: {entry.reason}"
+            )
+            # Проміжна ланка бачить усі оновлення, а не лише нові повідомлення
+            if update.callback_query:
+                await update.callback_query.answer(text[:200], show_alert=True)
+            elif update.effective_message:
+                await update.effective_message.reply_text(text)
+            raise ApplicationHandlerStop()
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Очищаємо всі дані стану
+    context.user_data.clear()
+
+    await update.message.reply_text(
+        "Оберіть категорію:", reply_markup=get_main_keyboard()
+    )
+    return CHOOSING_ACTION
+
+
+async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Очищаємо всі попередні дані
+    context.user_data.clear()
+    start_draft(context.user_data, "report")
+
+    keyboard = ReplyKeyboardMarkup([["Надіслати", "Повернутися"]], resize_keyboard=True)
+    await update.message.reply_text(
+        "Сформулюйте своє звернення одним повідомленням, "
+        "та адміністратор зв'яжеться з вами найближчим часом.",
+        reply_markup=keyboard,
+    )
+    return AWAITING_REPORT
+
+
+# Чернетки форм та звернень, покинуті користувачами
+DRAFT_TIMEOUT_MINUTES = config.get(
+    "DRAFT_TIMEOUT_MINUTES", {"photos": 60, "report": 30}
+)
+DRAFT_REFUND_QUOTA = config.get("DRAFT_REFUND_QUOTA", True)
+DRAFT_NOTIFY_USER = config.get("DRAFT_NOTIFY_USER", True)
+DRAFT_SWEEP_SECONDS = 60
+DRAFT_STATS = {"live": {"photos": 0, "report": 0}, "expired": 0}
+
+
+def start_draft(user_data, state: str):
+    user_data["draft"] = {"state": state, "updated_at": time.time()}
+
+
+def touch_draft(user_data) -> bool:
+    """Оновлює час активності чернетки; False, якщо її вже прибрано."""
+    draft = user_data.get("draft")
+    if not draft:
+        return False
+    draft["updated_at"] = time.time()
+    return True
+
+
+async def reply_draft_expired(update: Update):
+    await update.message.reply_text(
+        "⌛️ Чернетку закрито через тривалу неактивність. Оберіть категорію:",
+        reply_markup=get_main_keyboard(),
+    )
+    return CHOOSING_ACTION
+
+
+async def sweep_abandoned_drafts(application):
+    """Звільняє дані чернеток, неактивних довше за тайм-аут свого стану.
+
+    Стан ConversationHandler при цьому не змінюється: наступне повідомлення
+    користувача побачить відсутність чернетки і поверне його в головне меню.
+    """
+    now = time.time()
+    live = {state: 0 for state in DRAFT_TIMEOUT_MINUTES}
+    expired = []
+    for user_id, user_data in application.user_data.items():
+        draft = user_data.get("draft")
+        if not draft:
+            continue
+        state = draft["state"]
+        if now - draft["updated_at"] > DRAFT_TIMEOUT_MINUTES.get(state, 60) * 60:
+            expired.append((user_id, state, user_data.get("contacts", [])))
+            user_data.clear()
+        else:
+            live[state] = live.get(state, 0) + 1
+
+    DRAFT_STATS["live"] = live
+    DRAFT_STATS["expired"] += len(expired)
+
+    for user_id, state, contacts in expired:
+        text = "⌛️ Вашу незавершену заявку закрито через неактивність."
+        if state == "photos" and DRAFT_REFUND_QUOTA:
+            await run_store(refund_limit, user_id, "post")
+            await run_store(refund_contact_limit, contacts, user_id)
+            text += "\nЛіміт оголошень на сьогодні повернуто."
+        logging.info("Чернетку %s користувача %d закрито за тайм-аутом", state, user_id)
+        if not DRAFT_NOTIFY_USER:
+            continue
+        try:
+            await application.bot.send_message(
+                chat_id=user_id, text=text, reply_markup=get_main_keyboard()
+            )
+        except Exception as e:
+            logging.error(
+                "Помилка при відправці повідомлення користувачу %d: %s", user_id, e
+            )
+
+
+async def search_listings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для пошуку опублікованих оголошень за категорією та ключовими словами."""
+    query = " ".join(context.args)
+    LISTING_INDEX.refresh(LISTINGS_FILE)
+    results = LISTING_INDEX.search(query)
+    if not results:
+        await update.message.reply_text("🔍 За вашим запитом нічого не знайдено.")
+        return
+
+    await update.message.reply_text(
+        f"🔍 Результати пошуку «{query}»:\n\n"
+        + "\n\n".join(format_search_result(listing) for listing in results)
+    )
+
+
+async def handle_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not touch_draft(context.user_data):
+        return await reply_draft_expired(update)
+
+    message_text = update.message.text
+
+    if message_text == "Повернутися":
+        context.user_data.clear()
+        return await start(update, context)
+
+    if message_text == "Надіслати":
+        if not context.user_data.get("report_message"):
+            await update.message.reply_text(
+                "Будь ласка, спочатку напишіть ваше звернення."
+            )
+            return AWAITING_REPORT
+
+        if not await run_store(check_and_update_limits, update.effective_user.id, "report"):
+            await update.message.reply_text(
+                "На сьогодні ліміт запитів адміністраторам вичерпано, "
+                "зверніться будь ласка завтра.",
+                reply_markup=get_main_keyboard(),
+            )
+            context.user_data.clear()
+            return CHOOSING_ACTION
+
+        report_message = context.user_data["report_message"]
+        user = update.effective_user
+        user_name = f"{user.first_name} {user.last_name if user.last_name else ''}".strip()
+        ticket, created = TICKETS.open_ticket(user.id, user_name, report_message)
+        if not created:
+            # Повтор уже відкритого звернення не витрачає ліміт і не турбує адмінів
+            await run_store(refund_limit, user.id, "report")
+            await update.message.reply_text(
+                f"Ваше звернення #{ticket['id']} вже в роботі, адміністратори "
+                "відповідять на нього найближчим часом.",
+                reply_markup=get_main_keyboard(),
+            )
+            context.user_data.clear()
+            return CHOOSING_ACTION
+
+        admin_message = f"""
+Нове звернення #{ticket['id']}!
+ID: {user.id}
+Ім'я: {user_name}
+Username: @{user.username if user.username else 'немає'}
+Звернення: {report_message}
+
+Відповісти: /ans {ticket['id']} <текст>
+"""
+        chat_id = REPORTS_CHAT_ID or ticket["assigned_to"]
+        if chat_id:
+            OUTBOX.enqueue(
+                f"ticket:{ticket['id']}:{chat_id}",
+                chat_id,
+                "send_message",
+                text=admin_message,
+            )
+            flush_outbox_soon(context, f"ticket:{ticket['id']}:")
+        else:
+            # Тікет лишається в /tickets, навіть якщо сповістити нікого
+            logging.error(
+                "Звернення #%d нікому надіслати: немає REPORTS_CHAT_ID і ADMIN_IDS.",
+                ticket["id"],
+            )
+
+        await update.message.reply_text(
+            f"Дякуємо за Ваше звернення #{ticket['id']}, "
+            "адміністратори вже опрацьовують його",
+            reply_markup=get_main_keyboard(),
+        )
+        context.user_data.clear()
+        return CHOOSING_ACTION
+    else:
+        context.user_data["report_message"] = message_text
+        await update.message.reply_text(
+            "Повідомлення збережено. Натисніть 'Надіслати' для відправки або 'Повернутися' для скасування."
+        )
+        return AWAITING_REPORT
+
+
+async def handle_webapp_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        context.user_data.clear()
+        user = update.effective_user
+
+        data = json.loads(update.effective_message.web_app_data.data)
+        form_type = data.get("formType", "невідомий тип")
+
+        matches = BLOCKLIST.scan_payload(data)
+        if matches and BLOCKLIST_ACTION == "reject":
+            BLOCKLIST_STATS["rejected"] += 1
+            logging.info(
+                "Заявку користувача %d автоматично відхилено за стоп-списком: %s",
+                user.id,
+                ", ".join(sorted({match[3] for match in matches})),
+            )
+            await update.message.reply_text(
+                "❌ Оголошення містить заборонений вміст і не може бути опубліковане.\n"
+                f"Ознайомтеся з правилами: {RULES_LINK}",
+                reply_markup=get_main_keyboard(),
+            )
+            return CHOOSING_ACTION
+
+        fingerprint = DuplicateDetector.fingerprint(data, form_type)
+        duplicate = await run_store(find_duplicate, fingerprint)
+        if duplicate and DUPLICATE_ACTION == "hold":
+            logging.info(
+                "Заявку користувача %d затримано як дублікат (схожа на заявку %d)",
+                user.id,
+                duplicate[0],
+            )
+            await update.message.reply_text(
+                "Схоже, таке оголошення вже надсилалося нещодавно і зараз на модерації. "
+                "Повторно надсилати його не потрібно.",
+                reply_markup=get_main_keyboard(),
+            )
+            return CHOOSING_ACTION
+
+        # Відхилені та затримані заявки не витрачають ліміт і не потрапляють у статистику
+        if not await run_store(check_and_update_limits, user.id, "post"):
+            await update.message.reply_text(
+                "Ви досягли ліміту оголошень на сьогодні. "
+                "Для розміщення додаткових оголошень зверніться до адміністрації через команду /report",
+                reply_markup=get_main_keyboard(),
+            )
+            return CHOOSING_ACTION
+
+        contacts = normalize_contacts(get_form_field(data, form_type, "contact"))
+        blocked_contact = await run_store(check_contact_limit, contacts, user.id)
+        if blocked_contact:
+            await run_store(refund_limit, user.id, "post")
+            logging.info(
+                "Заявку користувача %d відхилено: ліміт контакту %s",
+                user.id,
+                blocked_contact,
+            )
+            await update.message.reply_text(
+                f"Контакт {blocked_contact} уже використано в {CONTACT_POST_LIMIT} "
+                "оголошеннях за останню добу. Спробуйте пізніше або зверніться до "
+                "адміністрації через команду /report",
+                reply_markup=get_main_keyboard(),
+            )
+            return CHOOSING_ACTION
+
+        # Оновлюємо статистику
+        if form_type in daily_stats:
+            await run_store(increment_daily_stat, form_type)
+            logging.info("Додано новий запит типу %s", form_type)
+
+        formatted_message = format_message(data, form_type, user)
+        shared_contacts = await run_store(format_shared_contacts, contacts, user.id)
+        if shared_contacts:
+            formatted_message = f"{shared_contacts}\n{formatted_message}"
+        if duplicate:
+            formatted_message = (
+                f"⚠️ Можливий дублікат заявки користувача {duplicate[0]} "
+                f"(відстань {duplicate[1]})\n{formatted_message}"
+            )
+        if matches:
+            BLOCKLIST_STATS["flagged"] += 1
+            formatted_message = (
+                f"{highlight_blocklist_matches(data, matches)}\n{formatted_message}"
+            )
+
+        context.user_data["form_data"] = data
+        context.user_data["form_type"] = form_type
+        context.user_data["user"] = user
+        context.user_data["fingerprint"] = fingerprint
+        context.user_data["contacts"] = contacts
+        context.user_data["formatted_message"] = formatted_message
+        start_draft(context.user_data, "photos")
+
+        await update.message.reply_text(
+            "Тепер ви можете додати фотографії до вашого оголошення (максимум 10 фото).\n"
+            "Надішліть фотографії одну за одною.\n"
+            "Коли закінчите, натисніть 'Завершити' ⬇️",
+            reply_markup=ReplyKeyboardMarkup([["Завершити"]], resize_keyboard=True),
+        )
+
+        return AWAITING_PHOTOS
+
+    except Exception as e:
+        logging.error("Помилка обробки даних форми: %s", e)
+        context.user_data.clear()
+        await update.message.reply_text(
+            "Вибачте, сталася помилка при обробці форми. Спробуйте ще раз пізніше.",
+            reply_markup=get_main_keyboard(),
+        )
+        return CHOOSING_ACTION
+
+
+def can_add_photo(user_data):
+    """Перевіряє, чи можна додати ще одну фотографію."""
+    if "photos" not in user_data:
+        user_data["photos"] = []
+    return len(user_data["photos"]) < 10
+
+
+async def add_photo(user_data, photo_file_id):
+    """Додає фото до списку, якщо це можливо."""
+    if can_add_photo(user_data):
+        user_data["photos"].append(photo_file_id)
+        return True
+    return False
+
+
+async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not touch_draft(context.user_data):
+        return await reply_draft_expired(update)
+
+    if "photos" not in context.user_data:
+        context.user_data["photos"] = []
+
+    if update.message.text == "Завершити":
+        return await finish_with_photos(update, context)
+
+    if not can_add_photo(context.user_data):
+        await update.message.reply_text(
+            "Ви вже додали максимальну кількість фотографій (10).\n"
+            "Натисніть 'Завершити', щоб опублікувати оголошення."
+        )
+        return AWAITING_PHOTOS
+
+    try:
+        photo_file_id = update.message.photo[-1].file_id
+        if await add_photo(context.user_data, photo_file_id):
+            await update.message.reply_text(
+                f"Фото додано! ({len(context.user_data['photos'])}/10)\n"
+                "Ви можете додати ще фото або натиснути 'Завершити'."
+            )
+        else:
+            await update.message.reply_text(
+                "Не вдалося додати фото. Перевірте кількість фото."
+            )
+    except Exception as e:
+        logging.error("Помилка додавання фото: %s", e)
+        await update.message.reply_text(
+            "Сталася помилка при додаванні фото. Спробуйте ще раз."
+        )
+
+    return AWAITING_PHOTOS
+
+
+async def finish_with_photos(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        if not context.user_data.get("formatted_message"):
+            await update.message.reply_text(
+                "Виникла помилка. Будь ласка, почніть спочатку з команди /start",
+                reply_markup=get_main_keyboard(),
+            )
+            context.user_data.clear()
+            return CHOOSING_ACTION
+
+        formatted_message = context.user_data["formatted_message"]
+        photos = context.user_data.get("photos", [])
+        user = context.user_data["user"]
+
+        if "fingerprint" in context.user_data:
+            await run_store(remember_fingerprint, context.user_data["fingerprint"], user.id)
+
+        caption = f"Фото від: {user.first_name} {user.last_name if user.last_name else ''} (@{user.username if user.username else 'немає'})"
+        # Текст і підпис зберігаються в заявці, щоб її можна було передати іншому модератору
+        submission = await run_store(
+            add_pending_submission,
+            user,
+            context.user_data["form_type"],
+            context.user_data["form_data"],
+            photos,
+            moderator_text=formatted_message,
+            photo_caption=caption,
+        )
+        await run_store(dispatch_submission, submission)
+        flush_outbox_soon(context, f"submission:{submission['id']}:")
+
+        await update.message.reply_text(
+            "Дякуємо! Ваше оголошення прийнято та буде опубліковано після модерації.",
+            reply_markup=get_main_keyboard(),
+        )
+
+        context.user_data.clear()
+        return CHOOSING_ACTION
+
+    except Exception as e:
+        logging.error("Помилка при завершенні обробки форми: %s", e)
+        context.user_data.clear()
+        await update.message.reply_text(
+            "Вибачте, сталася помилка при обробці даних. Спробуйте ще раз пізніше.",
+            reply_markup=get_main_keyboard(),
+        )
+        return CHOOSING_ACTION
+
+
+# Шаблони повідомлень в окремих константах
+MESSAGE_TEMPLATES = {
+    "user_info": {
+        "default": """👤 Користувач: {first_name} {last_name}
+🔗 Username: @{username}
+🆔 User ID: {user_id}""",
+        "with_paid": """👤 Користувач: {first_name} {last_name}
+🔗 Username: @{username}
+🆔 User ID: {user_id}
+💳 Paid: {is_pinned}""",
+        "advertising": """👤 Користувач: {first_name} {last_name}
+🔗 Username: @{username}
+🆔 User ID: {user_id}
+📝 Type: {ad_type}
+💰 Price: {price} грн
+⏱ Period: {duration}""",
+    },
+    "content": {
+        "advertising": """<pre>📢 Реклама
+
+🏷️ Назва: {company_name}
+📝 Опис: {description}
+📞 Контакти: {contact}
+
+✏️️ Подати оголошення:
+@slavuta_ads_bot</pre>
+""",
+        "buying": """<pre>🛒 Купівля
+
+🏷️ Назва: {product_name}
+📝 Опис: {description}
+💰 Вартість до: {max_price} {currency}
+📞 Контакти: {contact}
+
+🔍Схожі запити:
+#{category}
+
+✏️ Подати оголошення:
+@slavuta_ads_bot</pre>
+""",
+        "selling": """<pre>🛒 Продаж
+
+🏷️ Назва: {item_name}
+💰 Вартість: {price_info} {negotiable}
+📦 Стан: {condition}
+📝 Опис: {description}
+📞 Контакти: {contact}
+
+🔍 Схожі товари:
+#{category}
+
+✏️ Подати оголошення:
+@slavuta_ads_bot</pre>
+""",
+        "announcement": """<pre>📰 Оголошення
+
+📝 Опис: {description}
+📞 Контакти: {contact}
+
+🔍 Схожі оголошення:
+#{category}
+
+✏️ Подати оголошення:
+@slavuta_ads_bot</pre>
+""",
+    },
+}
+
+
+def get_price_info(data):
+    """Допоміжна функція для формування інформації про ціну"""
+    if data.get("isFree"):
+        return "Віддам даром"
+    if data.get("priceType") == "negotiablePrice":
+        return "Договірна"
+    return f"{data.get('price', 'Не вказано')} {data.get('priceCurrency', 'грн')}"
+
+
+def format_user_info(user, form_type, data):
+    """Форматує інформацію про користувача"""
+    user_data = {
+        "first_name": user.first_name,
+        "last_name": user.last_name if user.last_name else "",
+        "username": user.username if user.username else "немає",
+        "user_id": user.id,
+    }
+
+    if form_type == "advertising":
+        return MESSAGE_TEMPLATES["user_info"]["advertising"].format(
+            **user_data,
+            ad_type=data.get("adType", "Не вказано"),
+            price=data.get("finalPrice", "0"),
+            duration=data.get("duration", "Не вказано"),
+        )
+    elif form_type in ["buying", "selling", "announcement"]:
+        return MESSAGE_TEMPLATES["user_info"]["with_paid"].format(
+            **user_data, is_pinned="Так" if data.get("isPinned") else "Ні"
+        )
+    else:
+        return MESSAGE_TEMPLATES["user_info"]["default"].format(**user_data)
+
+
+def format_content(data, form_type):
+    """Форматує текст оголошення (без інформації про користувача)"""
+    if form_type == "advertising":
+        content = MESSAGE_TEMPLATES["content"]["advertising"].format(
+            company_name=data.get("companyName", "Не вказано"),
+            description=data.get("adDescription", "Не вказано"),
+            contact=data.get("adContact", "Не вказано"),
+        )
+    elif form_type == "buying":
+        content = MESSAGE_TEMPLATES["content"]["buying"].format(
+            product_name=data.get("productName", "Не вказано"),
+            description=data.get("buyerDescription", "Не вказано"),
+            max_price=data.get("maxPrice", "Не вказано"),
+            currency=data.get("maxPriceCurrency", "грн"),
+            contact=data.get("buyerContact", "Не вказано"),
+            category=data.get("buyingCategory", "").lower(),
+        )
+    elif form_type == "selling":
+        content = MESSAGE_TEMPLATES["content"]["selling"].format(
+            item_name=data.get("itemName", "Не вказано"),
+            price_info=get_price_info(data),
+            negotiable="(Торг)" if data.get("isNegotiable") else "",
+            condition=data.get("condition", "Не вказано"),
+            description=data.get("sellerDescription", "Не вказано"),
+            contact=data.get("sellerContact", "Не вказано"),
+            category=data.get("sellingCategory", "").lower(),
+        )
+    else:  # announcement
+        content = MESSAGE_TEMPLATES["content"]["announcement"].format(
+            description=data.get("description", "Не вказано"),
+            contact=data.get("contact", "Не вказано"),
+            category=data.get("category", "").lower(),
+        )
+
+    return content
+
+
+def format_message(data, form_type, user):
+    """Форматує повне повідомлення залежно від типу форми"""
+    user_info = format_user_info(user, form_type, data)
+    content = format_content(data, form_type)
+    return f"{user_info}\n{content}"
+
+
+# Заявки на модерації та опубліковані оголошення
+PENDING_FILE = "pending.json"
+LISTINGS_FILE = "listings.jsonl"
+
+
+def load_pending() -> Dict[int, list]:
+    try:
+        with open(PENDING_FILE, "r", encoding="utf-8") as file:
+            return {int(user_id): items for user_id, items in json.load(file).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def save_pending(pending: Dict[int, list]):
+    with open(PENDING_FILE, "w", encoding="utf-8") as file:
+        json.dump(
+            {str(user_id): items for user_id, items in pending.items() if items},
+            file,
+            ensure_ascii=False,
+        )
+
+
+PENDING_SUBMISSIONS: Dict[int, list] = load_pending()
+
+
+def add_pending_submission(
+    user, form_type, data, photos, **extra
+) -> Dict[str, Any]:
+    """Зберігає заявку, надіслану модераторам, до їхнього рішення."""
+    submission = {
+        "id": uuid.uuid4().hex[:12],
+        "user_id": user.id,
+        "form_type": form_type,
+        "data": data,
+        "photos": list(photos),
+        "submitted_at": datetime.now().isoformat(),
+        **extra,
+    }
+    if SHARED_STORE:
+        SHARED_STORE.add_pending(submission)
+        return submission
+    PENDING_SUBMISSIONS.setdefault(user.id, []).append(submission)
+    save_pending(PENDING_SUBMISSIONS)
+    return submission
+
+
+def pop_pending_submission(user_id: int, form_type: str):
+    """Забирає найстарішу заявку користувача вказаного типу, якщо вона є."""
+    if SHARED_STORE:
+        return SHARED_STORE.pop_pending(user_id, form_type)
+    items = PENDING_SUBMISSIONS.get(user_id, [])
+    for index, submission in enumerate(items):
+        if submission["form_type"] == form_type:
+            del items[index]
+            if not items:
+                del PENDING_SUBMISSIONS[user_id]
+            save_pending(PENDING_SUBMISSIONS)
+            return submission
+    return None
+
+
+def mark_submission_delivered(submission_id: str):
+    """Фіксує час першої доставки заявки модераторам."""
+    delivered_at = datetime.now().isoformat()
+    if SHARED_STORE:
+        SHARED_STORE.mark_delivered(submission_id, delivered_at)
+        return
+    for items in PENDING_SUBMISSIONS.values():
+        for submission in items:
+            if submission["id"] == submission_id:
+                if "delivered_at" not in submission:
+                    submission["delivered_at"] = delivered_at
+                    save_pending(PENDING_SUBMISSIONS)
+                return
+
+
+def decide_submission(
+    user_id: int, form_type: str, moderator_id: int, decision: str
+):
+    """Знімає заявку з модерації та враховує час очікування рішення в SLA."""
+    submission = pop_pending_submission(user_id, form_type)
+    if not submission:
+        return None
+    submission.update(
+        decided_at=datetime.now().isoformat(),
+        decided_by=moderator_id,
+        decision=decision,
+    )
+    MODERATION_SLA.record(submission)
+    return submission
+
+
+def iter_pending_submissions():
+    """Усі заявки на модерації; словники в пам'яті копіюються перед обходом."""
+    if SHARED_STORE:
+        yield from SHARED_STORE.iter_pending(EXPORT_BATCH_SIZE)
+        return
+    for items in list(PENDING_SUBMISSIONS.values()):
+        yield from list(items)
+
+
+def find_pending_submission(submission_id: str):
+    return next(
+        (s for s in iter_pending_submissions() if s["id"] == submission_id), None
+    )
+
+
+def update_pending_submission(submission_id: str, **fields):
+    """Оновлює поля заявки на модерації; повертає оновлену заявку або None."""
+    if SHARED_STORE:
+        return SHARED_STORE.update_pending(submission_id, fields)
+    for items in PENDING_SUBMISSIONS.values():
+        for submission in items:
+            if submission["id"] == submission_id:
+                submission.update(fields)
+                save_pending(PENDING_SUBMISSIONS)
+                return submission
+    return None
+
+
+# Розподіл заявок між модераторами
+MODERATION_ASSIGNMENT = config.get("MODERATION_ASSIGNMENT", "broadcast")
+ASSIGNMENT_MODES = ("broadcast", "round_robin", "least_loaded")
+ASSIGNMENT_CLAIM_MINUTES = config.get("ASSIGNMENT_CLAIM_MINUTES", 15)
+ASSIGNMENT_CHECK_SECONDS = 60
+MODERATORS_AWAY_FILE = "moderators_away.json"
+assignment_cursor = 0
+
+
+def load_away_moderators() -> set:
+    try:
+        with open(MODERATORS_AWAY_FILE, "r", encoding="utf-8") as file:
+            return set(json.load(file))
+    except FileNotFoundError:
+        return set()
+
+
+def save_away_moderators(moderator_ids: set):
+    with open(MODERATORS_AWAY_FILE, "w", encoding="utf-8") as file:
+        json.dump(sorted(moderator_ids), file)
+
+
+def moderator_load() -> Dict[int, int]:
+    load = defaultdict(int)
+    for submission in iter_pending_submissions():
+        if submission.get("assigned_to"):
+            load[submission["assigned_to"]] += 1
+    return load
+
+
+def choose_moderator(exclude=(), away=None, load=None):
+    """Обирає модератора для заявки: по колу або найменш завантаженого.
+
+    Відсутні модератори пропускаються; якщо відсутні всі, заявка однаково
+    дістанеться комусь, щоб не загубитись. Без модераторів повертає None.
+    Для кількох призначень поспіль away і load варто передати готовими,
+    інакше кожен виклик перечитує файл і обходить усі заявки.
+    """
+    global assignment_cursor
+    if away is None:
+        away = load_away_moderators()
+    candidates = (
+        sorted(MODERATOR_IDS - away - set(exclude))
+        or sorted(MODERATOR_IDS - away)
+        or sorted(MODERATOR_IDS)
+    )
+    if not candidates:
+        return None
+    if MODERATION_ASSIGNMENT == "least_loaded":
+        if load is None:
+            load = moderator_load()
+        return min(candidates, key=lambda moderator_id: load[moderator_id])
+    assignment_cursor += 1
+    return candidates[assignment_cursor % len(candidates)]
+
+
+def enqueue_submission(submission: Dict[str, Any], moderator_id: int, claim: bool):
+    """Ставить текст і фото заявки в outbox для одного модератора."""
+    key = f"submission:{submission['id']}:{moderator_id}"
+    extra = {}
+    if claim:
+        extra["reply_markup"] = {
+            "inline_keyboard": [
+                [
+                    {
+                        "text": "✋ Беру в роботу",
+                        "callback_data": f"claim:{submission['id']}",
+                    }
+                ]
+            ]
+        }
+    OUTBOX.enqueue(
+        f"{key}:text",
+        moderator_id,
+        "send_message",
+        text=submission["moderator_text"],
+        parse_mode="HTML",
+        **extra,
+    )
+    for index, photo_id in enumerate(submission["photos"]):
+        OUTBOX.enqueue(
+            f"{key}:photo:{index}",
+            moderator_id,
+            "send_photo",
+            photo=photo_id,
+            caption=submission["photo_caption"],
+        )
+
+
+def dispatch_submission(submission: Dict[str, Any]):
+    """Надсилає заявку всім модераторам або, в режимі призначення, одному."""
+    if MODERATION_ASSIGNMENT == "broadcast":
+        for moderator_id in MODERATOR_IDS:
+            enqueue_submission(submission, moderator_id, claim=False)
+        return
+
+    moderator_id = choose_moderator()
+    if moderator_id is None:
+        # Конфігурацію без модераторів з призначенням validate_config не пропускає
+        logging.error(
+            "Заявку %s нікому призначити: список модераторів порожній.", submission["id"]
+        )
+        return
+    submission = update_pending_submission(
+        submission["id"],
+        assigned_to=moderator_id,
+        assigned_at=datetime.now().isoformat(),
+    ) or submission
+    enqueue_submission(submission, moderator_id, claim=True)
+    logging.info(
+        "Заявку %s призначено модератору %d.", submission["id"], moderator_id
+    )
+
+
+def reassign_unclaimed(moderator_id=None) -> int:
+    """Передає іншому модератору заявки, які не взяли в роботу вчасно.
+
+    Якщо вказано moderator_id, передаються всі його невзяті заявки одразу
+    (модератор пішов у відсутність).
+    """
+    if MODERATION_ASSIGNMENT == "broadcast":
+        return 0
+    deadline = datetime.now() - timedelta(minutes=ASSIGNMENT_CLAIM_MINUTES)
+    reassigned = 0
+    # Відсутність і навантаження читаються раз на прохід і далі ведуться в пам'яті
+    away = load_away_moderators()
+    load = moderator_load() if MODERATION_ASSIGNMENT == "least_loaded" else None
+    for submission in iter_pending_submissions():
+        previous = submission.get("assigned_to")
+        if not previous or submission.get("claimed_at"):
+            continue
+        if moderator_id is not None:
+            if previous != moderator_id:
+                continue
+        elif datetime.fromisoformat(submission["assigned_at"]) > deadline:
+            continue
+        new_moderator = choose_moderator(exclude=[previous], away=away, load=load)
+        if new_moderator is None or new_moderator == previous:
+            continue
+        submission = update_pending_submission(
+            submission["id"],
+            assigned_to=new_moderator,
+            assigned_at=datetime.now().isoformat(),
+        )
+        if submission:
+            if load is not None:
+                load[previous] -= 1
+                load[new_moderator] += 1
+            enqueue_submission(submission, new_moderator, claim=True)
+            reassigned += 1
+            logging.info(
+                "Заявку %s передано від модератора %d модератору %d.",
+                submission["id"],
+                previous,
+                new_moderator,
+            )
+    return reassigned
+
+
+async def check_unclaimed_submissions(bot: Bot):
+    if reassign_unclaimed():
+        await OUTBOX.flush(bot)
+
+
+async def handle_claim(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обробник кнопки "Беру в роботу" під заявкою."""
+    query = update.callback_query
+    moderator_id = update.effective_user.id
+    if moderator_id not in MODERATOR_IDS:
+        await query.answer("⚠️ Доступно лише модераторам.")
+        return
+
+    submission_id = query.data.split(":", 1)[1]
+    submission = await run_store(find_pending_submission, submission_id)
+    if submission is None:
+        await query.answer("Заявку вже розглянуто.")
+        return
+    if submission.get("assigned_to") != moderator_id:
+        await query.answer("Заявку вже передано іншому модератору.")
+        return
+    if submission.get("claimed_at"):
+        await query.answer("Заявка вже у вас у роботі.")
+        return
+
+    await run_store(
+        update_pending_submission, submission_id, claimed_at=datetime.now().isoformat()
+    )
+    await query.answer("Заявка ваша.")
+    await query.edit_message_reply_markup(
+        InlineKeyboardMarkup(
+            [[InlineKeyboardButton("✅ Взято в роботу", callback_data=query.data)]]
+        )
+    )
+    logging.info("Модератор %d взяв заявку %s.", moderator_id, submission_id)
+
+
+async def set_away(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для позначення модератора відсутнім: нові заявки йому не надходять."""
+    moderator_id = update.effective_user.id
+    save_away_moderators(load_away_moderators() | {moderator_id})
+    reassigned = reassign_unclaimed(moderator_id)
+    if reassigned:
+        flush_outbox_soon(context)
+    await update.message.reply_text(
+        "🌙 Вас позначено відсутнім, нові заявки надходитимуть іншим модераторам.\n"
+        f"🔁 Передано невзятих заявок: {reassigned}"
+    )
+    logging.info("Модератор %d позначив себе відсутнім.", moderator_id)
+
+
+async def set_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для повернення модератора до розподілу заявок."""
+    moderator_id = update.effective_user.id
+    save_away_moderators(load_away_moderators() - {moderator_id})
+    await update.message.reply_text("☀️ З поверненням! Заявки знову надходитимуть вам.")
+    logging.info("Модератор %d повернувся до роботи.", moderator_id)
+
+
+async def view_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду нещодавніх заявок з телефоном або @ніком."""
+    contacts = normalize_contacts(" ".join(context.args))
+    if not contacts:
+        await update.message.reply_text(
+            "❗Не вдалося розпізнати телефон або @нік.\n"
+            "❗Використовуйте: /contact <контакт>"
+        )
+        return
+    contact = contacts[0]
+    posts = recent_contact_posts(contact)
+    if not posts:
+        await update.message.reply_text(f"📇 {contact}: заявок за добу немає.")
+        return
+    lines = [
+        f"📇 {contact}: {len(posts)}/{CONTACT_POST_LIMIT or '∞'} заявок за добу, "
+        f"акаунтів {len({poster for _, poster in posts})}"
+    ]
+    lines += [
+        f"{datetime.fromtimestamp(at):%d.%m %H:%M} — користувач {poster}"
+        for at, poster in posts
+    ]
+    await update.message.reply_text("\n".join(lines)[:PAGE_LIMIT])
+    logging.info(
+        "Модератор %d переглянув заявки з контактом %s.",
+        update.effective_user.id,
+        contact,
+    )
+
+
+def format_assignment_metrics() -> str:
+    if MODERATION_ASSIGNMENT == "broadcast":
+        return "👮 Розподіл заявок: усім модераторам"
+    load = moderator_load()
+    away = load_away_moderators()
+    per_moderator = ", ".join(
+        f"{moderator_id}{' 🌙' if moderator_id in away else ''}: {load[moderator_id]}"
+        for moderator_id in sorted(MODERATOR_IDS)
+    )
+    return f"👮 Розподіл заявок ({MODERATION_ASSIGNMENT}): {per_moderator}"
+
+
+# Аналітика часу модерації (SLA)
+SLA_FILE = "sla.json"
+SLA_SKETCH_ACCURACY = 0.02
+SLA_MIN_SECONDS = 1
+SLA_MAX_SECONDS = 30 * 86400
+SLA_FORM_NAMES = {
+    "buying": "🛒 Купівля",
+    "selling": "💰 Продаж",
+    "announcement": "📢 Оголошення",
+    "advertising": "🎯 Реклама",
+}
+
+
+class QuantileSketch:
+    """Потоковий скетч квантилів з відносною похибкою (як DDSketch).
+
+    Значення розкладаються по логарифмічних кошиках, тому пам'ять залежить
+    від діапазону значень, а не від їх кількості: для 1 с..30 діб при похибці
+    2% це до ~370 кошиків.
+    """
+
+    def __init__(self, buckets=None, count: int = 0):
+        gamma = (1 + SLA_SKETCH_ACCURACY) / (1 - SLA_SKETCH_ACCURACY)
+        self.log_gamma = math.log(gamma)
+        self.buckets = defaultdict(int, {int(k): v for k, v in (buckets or {}).items()})
+        self.count = count
+
+    def add(self, value: float):
+        value = min(max(value, SLA_MIN_SECONDS), SLA_MAX_SECONDS)
+        self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+        self.count += 1
+
+    def quantile(self, fraction: float):
+        if not self.count:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+        # Середина кошика дає відносну похибку не більше SLA_SKETCH_ACCURACY
+        gamma = math.exp(self.log_gamma)
+        return 2 * gamma**index / (gamma + 1)
+
+    def to_dict(self):
+        return {"buckets": dict(self.buckets), "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["buckets"], data["count"])
+
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "—"
+    if seconds < 60:
+        return f"{seconds:.0f} с"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} хв"
+    return f"{seconds / 3600:.1f} год"
+
+
+class ModerationSla:
+    """Щоденні скетчі часу від подачі заявки до рішення модератора."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.lock = Lock()
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = {}
+        self.delivery = QuantileSketch.from_dict(
+            data.get("delivery", {"buckets": {}, "count": 0})
+        )
+        self.by_form = {
+            key: QuantileSketch.from_dict(value)
+            for key, value in data.get("by_form", {}).items()
+        }
+        self.by_moderator = {
+            int(key): QuantileSketch.from_dict(value)
+            for key, value in data.get("by_moderator", {}).items()
+        }
+
+    def save(self):
+        with open(self.file_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "delivery": self.delivery.to_dict(),
+                    "by_form": {k: v.to_dict() for k, v in self.by_form.items()},
+                    "by_moderator": {
+                        str(k): v.to_dict() for k, v in self.by_moderator.items()
+                    },
+                },
+                file,
+            )
+
+    def record(self, submission: Dict[str, Any]):
+        submitted_at = datetime.fromisoformat(submission["submitted_at"])
+        decided_at = datetime.fromisoformat(submission["decided_at"])
+        waited = (decided_at - submitted_at).total_seconds()
+        with self.lock:
+            if submission.get("delivered_at"):
+                delivered_at = datetime.fromisoformat(submission["delivered_at"])
+                self.delivery.add((delivered_at - submitted_at).total_seconds())
+            form_type, moderator_id = submission["form_type"], submission["decided_by"]
+            self.by_form.setdefault(form_type, QuantileSketch()).add(waited)
+            self.by_moderator.setdefault(moderator_id, QuantileSketch()).add(waited)
+            self.save()
+
+    def reset(self):
+        with self.lock:
+            self.delivery = QuantileSketch()
+            self.by_form, self.by_moderator = {}, {}
+            self.save()
+
+    @staticmethod
+    def format_line(label: str, sketch: QuantileSketch) -> str:
+        p50, p90, p99 = (sketch.quantile(q) for q in (0.5, 0.9, 0.99))
+        return (
+            f"{label} ({sketch.count}): p50 {format_duration(p50)}, "
+            f"p90 {format_duration(p90)}, p99 {format_duration(p99)}"
+        )
+
+    def summary(self) -> str:
+        with self.lock:
+            if not self.by_form:
+                return "⏱ Рішень модераторів сьогодні ще не було."
+            lines = ["⏱ Час до рішення модератора:"]
+            for form_type, sketch in self.by_form.items():
+                label = SLA_FORM_NAMES.get(form_type, form_type)
+                lines.append(self.format_line(label, sketch))
+            for moderator_id, sketch in sorted(self.by_moderator.items()):
+                lines.append(self.format_line(f"👮 {moderator_id}", sketch))
+            if self.delivery.count:
+                lines.append(
+                    self.format_line("📬 До першої доставки модераторам", self.delivery)
+                )
+            return "\n".join(lines)
+
+
+MODERATION_SLA = ModerationSla(SLA_FILE)
+
+
+class ListingIndex:
+    """Інвертований індекс опублікованих оголошень за категорією, назвою та описом."""
+
+    FIELD_WEIGHTS = {"category": 3.0, "title": 2.0, "description": 1.0}
+
+    def __init__(self):
+        self.listings: Dict[str, Dict[str, Any]] = {}
+        self.postings = defaultdict(dict)  # токен -> {id оголошення: вага}
+        self.offset = 0  # скільки байтів файлу оголошень уже проіндексовано
+
+    def refresh(self, file_path: str):
+        """Дочитує нові рядки з файлу оголошень (їх могли дописати інші шарди)."""
+        try:
+            if os.path.getsize(file_path) <= self.offset:
+                return
+            with open(file_path, "rb") as file:
+                file.seek(self.offset)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # рядок ще дописується
+                    self.offset += len(line)
+                    if line.strip():
+                        self.add(json.loads(line))
+        except FileNotFoundError:
+            pass
+
+    def add(self, listing: Dict[str, Any]):
+        listing_id = listing["id"]
+        self.listings[listing_id] = listing
+        data, form_type = listing["data"], listing["form_type"]
+        for field, weight in self.FIELD_WEIGHTS.items():
+            for token in tokenize(get_form_field(data, form_type, field)):
+                postings = self.postings[token]
+                postings[listing_id] = postings.get(listing_id, 0.0) + weight
+
+    def search(self, query: str, limit: int = 5):
+        """Повертає оголошення, впорядковані за сумою ваг токенів з урахуванням IDF."""
+        scores = defaultdict(float)
+        total = len(self.listings) or 1
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for listing_id, weight in postings.items():
+                scores[listing_id] += weight * idf
+        best = heapq.nlargest(
+            limit,
+            scores.items(),
+            key=lambda item: (item[1], self.listings[item[0]]["accepted_at"]),
+        )
+        return [self.listings[listing_id] for listing_id, _ in best]
+
+
+def load_listing_index() -> ListingIndex:
+    index = ListingIndex()
+    index.refresh(LISTINGS_FILE)
+    logging.info("Індекс оголошень побудовано: %d записів", len(index.listings))
+    return index
+
+
+LISTING_INDEX = load_listing_index()
+
+
+def record_accepted_listing(user_id: int, form_type: str, moderator_id: int):
+    """Переносить заявку з черги модерації до опублікованих та індексує її."""
+    ensure_primary_shard("Публікація оголошення")
+    submission = decide_submission(user_id, form_type, moderator_id, "accepted")
+    if not submission:
+        logging.warning(
+            "Не знайдено заявку типу %s від користувача %d для індексації",
+            form_type,
+            user_id,
+        )
+        return None
+
+    listing = dict(submission, accepted_at=datetime.now().isoformat())
+    with open(LISTINGS_FILE, "a", encoding="utf-8") as file:
+        file.write(json.dumps(listing, ensure_ascii=False) + "\n")
+    LISTING_INDEX.refresh(LISTINGS_FILE)
+    PUBLISH_QUEUE.push(listing)
+    return listing
+
+
+# Черга публікації схвалених оголошень у канал
+PUBLISH_QUEUE_FILE = "publish_queue.json"
+PUBLISH_FAILED_FILE = "publish_failed.json"  # оголошення, що вичерпали спроби
+PUBLISH_CHANNEL = config.get("PUBLISH_CHANNEL", "@slavuta_ads")
+PUBLISH_INTERVAL_SECONDS = config.get("PUBLISH_INTERVAL_SECONDS", 300)
+PUBLISH_PEAK_INTERVAL_SECONDS = config.get("PUBLISH_PEAK_INTERVAL_SECONDS", 600)
+PUBLISH_PEAK_HOURS = config.get("PUBLISH_PEAK_HOURS", [18, 22])  # [з, до) за Києвом
+PUBLISH_MAX_ATTEMPTS = 5
+
+
+def is_paid_listing(listing: Dict[str, Any]) -> bool:
+    return (
+        listing["form_type"] == "advertising"
+        or listing.get("service_id") is not None
+        or bool(listing["data"].get("isPinned"))
+    )
+
+
+class PublishQueue:
+    """Пріоритетна черга публікацій: платні оголошення йдуть першими, далі за часом.
+
+    Оголошення лишається в черзі (і у файлі), доки його не опубліковано, тож
+    перезапуск посеред публікації його не губить. Після PUBLISH_MAX_ATTEMPTS
+    невдалих спроб воно переходить до списку failed, звідки адміністратор
+    може повернути його командою /publish_retry.
+    """
+
+    def __init__(self, file_path: str, failed_file_path: str):
+        self.file_path = file_path
+        self.failed_file_path = failed_file_path
+        self.heap = []  # [пріоритет, порядковий номер, оголошення]
+        self.failed = []  # оголошення з failed_at та last_error
+        self.next_post_at = datetime.now()
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                self.heap = [list(item) for item in json.load(file)]
+            heapq.heapify(self.heap)
+        except FileNotFoundError:
+            pass
+        try:
+            with open(failed_file_path, "r", encoding="utf-8") as file:
+                self.failed = json.load(file)
+        except FileNotFoundError:
+            pass
+        self.seq = max((item[1] for item in self.heap), default=0) + 1
+
+    def save(self):
+        with open(self.file_path, "w", encoding="utf-8") as file:
+            json.dump(self.heap, file, ensure_ascii=False)
+
+    def save_failed(self):
+        with open(self.failed_file_path, "w", encoding="utf-8") as file:
+            json.dump(self.failed, file, ensure_ascii=False)
+
+    def push(self, listing: Dict[str, Any], priority: int = None):
+        if priority is None:
+            priority = 0 if is_paid_listing(listing) else 1
+        heapq.heappush(self.heap, [priority, self.seq, listing])
+        self.seq += 1
+        self.save()
+
+    def peek(self):
+        """Наступний елемент [пріоритет, номер, оголошення] без вилучення."""
+        return self.heap[0] if self.heap else None
+
+    def remove(self, seq: int):
+        # Поки йшла публікація, на початок черги могло стати платне оголошення,
+        # тому елемент шукається за номером, а не береться з вершини купи
+        for index, item in enumerate(self.heap):
+            if item[1] == seq:
+                self.heap[index] = self.heap[-1]
+                self.heap.pop()
+                heapq.heapify(self.heap)
+                self.save()
+                return item[2]
+        return None
+
+    def fail(self, seq: int, error: str) -> bool:
+        """Враховує невдалу спробу; повертає True, якщо спроби вичерпано."""
+        listing = self.remove(seq)
+        if listing is None:
+            return False
+        attempts = listing.get("publish_attempts", 0) + 1
+        if attempts < PUBLISH_MAX_ATTEMPTS:
+            self.push(dict(listing, publish_attempts=attempts))
+            return False
+        self.failed.append(
+            dict(
+                listing,
+                publish_attempts=attempts,
+                failed_at=datetime.now().isoformat(),
+                last_error=error,
+            )
+        )
+        self.save_failed()
+        return True
+
+    def retry_failed(self, listing_id: str = None) -> int:
+        """Повертає до черги невдалі оголошення (усі або одне); надіслані частини
+        пам'ятаються в listing["sent"] і повторно не публікуються."""
+        retried = [
+            listing
+            for listing in self.failed
+            if listing_id is None or listing["id"] == listing_id
+        ]
+        if not retried:
+            return 0
+        self.failed = [listing for listing in self.failed if listing not in retried]
+        self.save_failed()
+        for listing in retried:
+            listing = {
+                key: value
+                for key, value in listing.items()
+                if key not in ("failed_at", "last_error")
+            }
+            self.push(dict(listing, publish_attempts=0))
+        return len(retried)
+
+    def __len__(self):
+        return len(self.heap)
+
+
+PUBLISH_QUEUE = PublishQueue(PUBLISH_QUEUE_FILE, PUBLISH_FAILED_FILE)
+
+
+def publish_interval(kyiv_now: datetime) -> timedelta:
+    """Інтервал між публікаціями; у вечірні години пік він довший."""
+    start, end = PUBLISH_PEAK_HOURS
+    if start <= kyiv_now.hour < end:
+        return timedelta(seconds=PUBLISH_PEAK_INTERVAL_SECONDS)
+    return timedelta(seconds=PUBLISH_INTERVAL_SECONDS)
+
+
+async def publish_listing(bot: Bot, listing: Dict[str, Any]):
+    """Публікує оголошення в каналі; повертає id надісланих повідомлень.
+
+    Надіслані частини (текст і фото) запам'ятовуються в listing["sent"], тому
+    повторна спроба після помилки не дублює вже опубліковане.
+    """
+    content = format_content(listing["data"], listing["form_type"])
+    photos = listing.get("photos", [])
+    sent = listing.setdefault("sent", {})
+    caption = (
+        content
+        if photos and len(content) <= constants.MessageLimit.CAPTION_LENGTH
+        else None
+    )
+
+    if caption is None and "text" not in sent:
+        message = await bot.send_message(
+            chat_id=PUBLISH_CHANNEL, text=content, parse_mode="HTML"
+        )
+        sent["text"] = [message.message_id]
+
+    if photos and "photos" not in sent:
+        # Медіагрупа в Telegram — від 2 до 10 елементів, одне фото йде окремо
+        if len(photos) == 1:
+            message = await bot.send_photo(
+                chat_id=PUBLISH_CHANNEL,
+                photo=photos[0],
+                caption=caption,
+                parse_mode="HTML",
+            )
+            sent["photos"] = [message.message_id]
+        else:
+            media = [
+                InputMediaPhoto(
+                    photo, caption=caption if i == 0 else None, parse_mode="HTML"
+                )
+                for i, photo in enumerate(photos)
+            ]
+            messages = await bot.send_media_group(chat_id=PUBLISH_CHANNEL, media=media)
+            sent["photos"] = [message.message_id for message in messages]
+
+    return sent.get("text", []) + sent.get("photos", [])
+
+
+async def process_publish_queue(bot: Bot):
+    """Публікує наступне оголошення з черги, якщо минув інтервал."""
+    now = datetime.now()
+    if not PUBLISH_QUEUE or now < PUBLISH_QUEUE.next_post_at:
+        return
+
+    _, seq, listing = PUBLISH_QUEUE.peek()
+    try:
+        message_ids = await publish_listing(bot, listing)
+    except Exception as e:
+        logging.error(
+            "Помилка публікації оголошення %s (спроба %d): %s",
+            listing["id"],
+            listing.get("publish_attempts", 0) + 1,
+            e,
+        )
+        # Зберігає й listing["sent"], щоб після перезапуску не дублювати частини
+        if PUBLISH_QUEUE.fail(seq, str(e)):
+            logging.error(
+                "Оголошення %s не опубліковано після %d спроб, його видно в "
+                "/publish_failed",
+                listing["id"],
+                PUBLISH_MAX_ATTEMPTS,
+            )
+    else:
+        PUBLISH_QUEUE.remove(seq)
+        logging.info(
+            "Оголошення %s користувача %d опубліковано в каналі",
+            listing["id"],
+            listing["user_id"],
+        )
+        try:
+            await start_paid_placements(bot, listing, message_ids)
+        except Exception as e:
+            logging.error(
+                "Помилка реєстрації платного розміщення %s: %s", listing["id"], e
+            )
+
+    PUBLISH_QUEUE.next_post_at = now + publish_interval(
+        datetime.now(timezone("Europe/Kyiv"))
+    )
+
+
+# Платні послуги: опис та тривалість закріплення / розміщення реклами (у годинах)
+PAID_SERVICES = {
+    1: {"description": "закріплення оголошення на 3 доби", "pin_hours": 72},
+    2: {"description": "публікація"},
+    3: {"description": "публікація + розміщення реклами на 12 годин", "ad_hours": 12},
+    5: {"description": "публікація + розміщення реклами на 1 добу", "ad_hours": 24},
+    6: {"description": "публікація + розміщення реклами на 3 доби", "ad_hours": 72},
+    7: {"description": "публікація + розміщення реклами на 7 діб", "ad_hours": 168},
+    8: {
+        "description": "публікація + закріплення + розміщення реклами на 12 годин",
+        "pin_hours": 12,
+        "ad_hours": 12,
+    },
+    9: {
+        "description": "публікація + закріплення + розміщення реклами на 1 добу",
+        "pin_hours": 24,
+        "ad_hours": 24,
+    },
+    10: {
+        "description": "публікація + закріплення + розміщення реклами на 3 доби",
+        "pin_hours": 72,
+        "ad_hours": 72,
+    },
+    11: {
+        "description": "публікація + закріплення + розміщення реклами на 7 діб",
+        "pin_hours": 168,
+        "ad_hours": 168,
+    },
+}
+
+
+def attach_service_to_pending(user_id: int, service_id: int):
+    """Позначає останню заявку користувача на модерації обраною платною послугою."""
+    if SHARED_STORE:
+        SHARED_STORE.attach_service(user_id, service_id)
+        return
+    items = PENDING_SUBMISSIONS.get(user_id)
+    if items:
+        items[-1]["service_id"] = service_id
+        save_pending(PENDING_SUBMISSIONS)
+
+
+# Облік запитів на оплату
+PAYMENTS_FILE = "payments.json"
+PAYMENT_REFERENCE_RE = re.compile(r"№\s*(\d+)")
+STATEMENT_REFERENCE_COLUMNS = ("призначення", "опис", "деталі", "purpose", "description")
+STATEMENT_AMOUNT_COLUMNS = ("сума", "amount")
+
+
+class PaymentRecord:
+    def __init__(
+        self,
+        payment_id: str,
+        user_id: int,
+        service_id: int,
+        amount: float,
+        created_at: datetime,
+        status: str = "open",
+        paid_at: datetime = None,
+    ):
+        self.payment_id = payment_id
+        self.user_id = user_id
+        self.service_id = service_id
+        self.amount = amount
+        self.created_at = created_at
+        self.status = status
+        self.paid_at = paid_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "payment_id": self.payment_id,
+            "user_id": self.user_id,
+            "service_id": self.service_id,
+            "amount": self.amount,
+            "created_at": self.created_at.isoformat(),
+            "status": self.status,
+            "paid_at": self.paid_at.isoformat() if self.paid_at else None,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "PaymentRecord":
+        return PaymentRecord(
+            payment_id=data["payment_id"],
+            user_id=data["user_id"],
+            service_id=data["service_id"],
+            amount=data["amount"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            status=data["status"],
+            paid_at=(
+                datetime.fromisoformat(data["paid_at"]) if data["paid_at"] else None
+            ),
+        )
+
+
+def parse_amount(value: str) -> float:
+    return float(value.replace("\xa0", "").replace(" ", "").replace(",", "."))
+
+
+class PaymentLedger:
+    """Журнал запитів на оплату з індексом відкритих запитів за user_id."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.records: Dict[str, PaymentRecord] = {}
+        self.open_by_user = defaultdict(list)  # user_id -> відкриті записи за часом
+        # Звірка виконується в окремому потоці, тому зміни журналу під блокуванням.
+        # Його тримають лише на час зміни в пам'яті, щоб add з циклу подій не
+        # чекав на всю звірку; запис файлу впорядковує окреме блокування
+        self.lock = Lock()
+        self.save_lock = Lock()
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                for data in json.load(file).values():
+                    self._add(PaymentRecord.from_dict(data))
+        except FileNotFoundError:
+            pass
+
+    def _add(self, record: PaymentRecord):
+        self.records[record.payment_id] = record
+        if record.status == "open":
+            self.open_by_user[record.user_id].append(record)
+
+    def save(self):
+        # Знімок береться під save_lock, тож пізніший запис завжди новіший
+        with self.save_lock:
+            with self.lock:
+                records = list(self.records.values())
+            temp_path = f"{self.file_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(
+                    {record.payment_id: record.to_dict() for record in records},
+                    file,
+                    ensure_ascii=False,
+                )
+            os.replace(temp_path, self.file_path)
+
+    def add(self, user_id: int, service_id: int, amount: float) -> PaymentRecord:
+        record = PaymentRecord(
+            uuid.uuid4().hex[:12], user_id, service_id, amount, datetime.now()
+        )
+        with self.lock:
+            self._add(record)
+        self.save()
+        return record
+
+    def match(self, user_id: int, amount: float):
+        """Позначає оплаченим найстаріший відкритий запит користувача з такою сумою."""
+        records = self.open_by_user.get(user_id)
+        if not records:
+            return None
+        for index, record in enumerate(records):
+            if abs(record.amount - amount) < 0.01:
+                del records[index]
+                if not records:
+                    del self.open_by_user[user_id]
+                record.status = "paid"
+                record.paid_at = datetime.now()
+                return record
+        return None
+
+    def reconcile(self, content: bytes) -> Dict[str, Any]:
+        """Звіряє CSV-виписку з відкритими запитами та зберігає журнал один раз."""
+        started = time.perf_counter()
+        try:
+            text = content.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            text = content.decode("cp1251")
+
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(io.StringIO(text), dialect)
+        header = [column.strip().lower() for column in next(reader, [])]
+
+        def find_column(names):
+            for position, column in enumerate(header):
+                if any(name in column for name in names):
+                    return position
+            raise ValueError(f"не знайдено стовпець ({', '.join(names)})")
+
+        reference_col = find_column(STATEMENT_REFERENCE_COLUMNS)
+        amount_col = find_column(STATEMENT_AMOUNT_COLUMNS)
+
+        return self._reconcile_rows(reader, reference_col, amount_col, started)
+
+    def _reconcile_rows(self, reader, reference_col, amount_col, started):
+        rows = matched = 0
+        for row in reader:
+            if len(row) <= max(reference_col, amount_col):
+                continue
+            rows += 1
+            reference = PAYMENT_REFERENCE_RE.search(row[reference_col])
+            if not reference:
+                continue
+            try:
+                amount = parse_amount(row[amount_col])
+            except ValueError:
+                continue
+            if amount <= 0:
+                continue  # списання та повернення не є оплатою послуг
+            with self.lock:
+                if self.match(int(reference.group(1)), amount):
+                    matched += 1
+
+        if matched:
+            self.save()
+        with self.lock:
+            still_open = sum(len(records) for records in self.open_by_user.values())
+        return {
+            "rows": rows,
+            "matched": matched,
+            "unmatched": rows - matched,
+            "open": still_open,
+            "seconds": time.perf_counter() - started,
+        }
+
+
+PAYMENT_LEDGER = PaymentLedger(PAYMENTS_FILE)
+
+
+def record_payment_request(user_id: int, service_id: int, amount: float):
+    ensure_primary_shard("Облік оплати")
+    record = PAYMENT_LEDGER.add(user_id, service_id, amount)
+    logging.info(
+        "Запит на оплату %s: користувач %d, послуга %d, сума %.2f",
+        record.payment_id,
+        user_id,
+        service_id,
+        amount,
+    )
+
+
+# Облік платних розміщень та їх завершення
+PLACEMENTS_FILE = "placements.json"
+PLACEMENT_TICK_SECONDS = 10
+
+
+class TimerWheel:
+    """Хешоване колесо таймерів: вставка та скасування за O(1), на кожен тік
+    переглядається лише один слот. Таймери, довші за оберт колеса, чекають
+    потрібного оберту у своєму слоті."""
+
+    def __init__(self, tick_seconds: int, slots: int = 4096, start: datetime = None):
+        self.tick_seconds = tick_seconds
+        self.slots = [dict() for _ in range(slots)]
+        self.location: Dict[str, int] = {}  # id таймера -> номер слоту
+        self.current_tick = self.to_tick(start or datetime.now())
+
+    def to_tick(self, moment: datetime) -> int:
+        return int(moment.timestamp()) // self.tick_seconds
+
+    def schedule(self, timer_id: str, expires_at: datetime, payload=None):
+        self.cancel(timer_id)
+        tick = max(self.to_tick(expires_at), self.current_tick)
+        slot = tick % len(self.slots)
+        self.slots[slot][timer_id] = (tick, payload)
+        self.location[timer_id] = slot
+
+    def cancel(self, timer_id: str):
+        slot = self.location.pop(timer_id, None)
+        if slot is not None:
+            self.slots[slot].pop(timer_id, None)
+
+    def advance(self, now: datetime = None):
+        """Прокручує колесо до поточного моменту та повертає таймери, що спрацювали."""
+        target = self.to_tick(now or datetime.now())
+        expired = []
+        while self.current_tick <= target:
+            slot = self.slots[self.current_tick % len(self.slots)]
+            due = [
+                timer_id
+                for timer_id, (tick, _) in slot.items()
+                if tick <= self.current_tick
+            ]
+            for timer_id in due:
+                expired.append((timer_id, slot.pop(timer_id)[1]))
+                del self.location[timer_id]
+            if self.current_tick == target:
+                break
+            self.current_tick += 1
+        return expired
+
+    def __len__(self):
+        return len(self.location)
+
+
+def load_placements() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(PLACEMENTS_FILE, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_placements(placements: Dict[str, Dict[str, Any]]):
+    with open(PLACEMENTS_FILE, "w", encoding="utf-8") as file:
+        json.dump(placements, file, indent=2, ensure_ascii=False)
+
+
+PLACEMENTS: Dict[str, Dict[str, Any]] = load_placements()
+PLACEMENT_WHEEL = TimerWheel(PLACEMENT_TICK_SECONDS)
+for placement_id, placement in PLACEMENTS.items():
+    PLACEMENT_WHEEL.schedule(
+        placement_id, datetime.fromisoformat(placement["expires_at"])
+    )
+
+
+async def start_paid_placements(bot: Bot, listing: Dict[str, Any], message_ids):
+    """Закріплює оплачене оголошення та реєструє терміни завершення послуг."""
+    service = PAID_SERVICES.get(listing.get("service_id"), {})
+    now = datetime.now()
+    for kind in ("pin", "ad"):
+        hours = service.get(f"{kind}_hours")
+        if not hours:
+            continue
+        # Рекламне розміщення стосується лише рекламних постів
+        if kind == "ad" and listing["form_type"] != "advertising":
+            continue
+        if kind == "pin":
+            await bot.pin_chat_message(
+                chat_id=PUBLISH_CHANNEL,
+                message_id=message_ids[0],
+                disable_notification=True,
+            )
+        placement_id = f"{listing['id']}:{kind}"
+        expires_at = now + timedelta(hours=hours)
+        PLACEMENTS[placement_id] = {
+            "listing_id": listing["id"],
+            "user_id": listing["user_id"],
+            "kind": kind,
+            "message_ids": list(message_ids),
+            "expires_at": expires_at.isoformat(),
+        }
+        PLACEMENT_WHEEL.schedule(placement_id, expires_at)
+    save_placements(PLACEMENTS)
+
+
+async def expire_placements(bot: Bot):
+    """Знімає закріплення та видаляє рекламу, термін якої завершився."""
+    expired = PLACEMENT_WHEEL.advance()
+    if not expired:
+        return
+
+    for placement_id, _ in expired:
+        placement = PLACEMENTS.pop(placement_id, None)
+        if not placement:
+            continue
+        try:
+            if placement["kind"] == "pin":
+                await bot.unpin_chat_message(
+                    chat_id=PUBLISH_CHANNEL, message_id=placement["message_ids"][0]
+                )
+            else:
+                for message_id in placement["message_ids"]:
+                    await bot.delete_message(
+                        chat_id=PUBLISH_CHANNEL, message_id=message_id
+                    )
+            logging.info("Розміщення %s завершено", placement_id)
+        except Exception as e:
+            logging.error("Помилка завершення розміщення %s: %s", placement_id, e)
+    save_placements(PLACEMENTS)
+
+
+def format_search_result(listing: Dict[str, Any]) -> str:
+    data, form_type = listing["data"], listing["form_type"]
+    title = get_form_field(data, form_type, "title") or "Без назви"
+    description = get_form_field(data, form_type, "description")
+    if len(description) > 120:
+        description = description[:117] + "..."
+    category = get_form_field(data, form_type, "category").lower()
+    return (
+        f"🏷️ {title}\n"
+        f"📝 {description}\n"
+        f"📞 {get_form_field(data, form_type, 'contact') or 'Не вказано'}\n"
+        f"📅 {datetime.fromisoformat(listing['accepted_at']):%d.%m.%Y}"
+        + (f"  #{category}" if category else "")
+    )
+
+
+# Звернення користувачів як тікети
+TICKETS_FILE = "tickets.sqlite3"
+REPORTS_CHAT_ID = config.get("REPORTS_CHAT_ID")  # None — тікет призначається адміну
+TICKET_STATUS_NAMES = {"open": "🟢 відкрите", "closed": "⚪️ закрите"}
+TICKET_EVENT_NAMES = {
+    "opened": "створено",
+    "repeat": "повторне звернення",
+    "answered": "відповідь і закриття",
+}
+
+
+class TicketStore:
+    """Звернення з номером, статусом та історією подій (SQLite, режим WAL).
+
+    Однакове повторне звернення користувача, поки попереднє відкрите, не
+    створює нового тікета, а лише додає повтор до історії.
+    """
+
+    def __init__(self, file_path: str):
+        self.lock = Lock()
+        self.db = sqlite3.connect(
+            file_path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                user_name TEXT NOT NULL,
+                text TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'open',
+                assigned_to INTEGER,
+                repeats INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tickets_open ON tickets (status, id);
+            CREATE INDEX IF NOT EXISTS tickets_dedup
+                ON tickets (user_id, fingerprint, status);
+            CREATE TABLE IF NOT EXISTS ticket_events (
+                ticket_id INTEGER NOT NULL,
+                at REAL NOT NULL,
+                kind TEXT NOT NULL,
+                actor INTEGER NOT NULL,
+                text TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ticket_events_ticket
+                ON ticket_events (ticket_id, at);
+            """
+        )
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def fingerprint(text: str) -> str:
+        normalized = " ".join(text.lower().split())
+        return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+    def open_ticket(self, user_id: int, user_name: str, text: str):
+        """Створює тікет або додає повтор до відкритого; повертає (тікет, чи новий)."""
+        now = time.time()
+        fingerprint = self.fingerprint(text)
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT id FROM tickets "
+                "WHERE user_id = ? AND fingerprint = ? AND status = 'open'",
+                (user_id, fingerprint),
+            ).fetchone()
+            if row:
+                ticket_id, created = row[0], False
+                db.execute(
+                    "UPDATE tickets SET repeats = repeats + 1, updated_at = ? "
+                    "WHERE id = ?",
+                    (now, ticket_id),
+                )
+                db.execute(
+                    "INSERT INTO ticket_events VALUES (?, ?, 'repeat', ?, NULL)",
+                    (ticket_id, now, user_id),
+                )
+            else:
+                ticket_id = db.execute(
+                    "INSERT INTO tickets (user_id, user_name, text, fingerprint, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, user_name, text, fingerprint, now, now),
+                ).lastrowid
+                created = True
+                admins = sorted(ADMIN_IDS)
+                if not REPORTS_CHAT_ID and admins:
+                    db.execute(
+                        "UPDATE tickets SET assigned_to = ? WHERE id = ?",
+                        (admins[ticket_id % len(admins)], ticket_id),
+                    )
+                db.execute(
+                    "INSERT INTO ticket_events VALUES (?, ?, 'opened', ?, ?)",
+                    (ticket_id, now, user_id, text),
+                )
+        return self.get(ticket_id), created
+
+    def get(self, ticket_id: int):
+        with self.lock:
+            cursor = self.db.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,))
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def history(self, ticket_id: int):
+        with self.lock:
+            return self.db.execute(
+                "SELECT at, kind, actor, text FROM ticket_events "
+                "WHERE ticket_id = ? ORDER BY at",
+                (ticket_id,),
+            ).fetchall()
+
+    def close(self, ticket_id: int, admin_id: int, answer: str) -> bool:
+        now = time.time()
+        with self.transaction() as db:
+            closed = db.execute(
+                "UPDATE tickets SET status = 'closed', updated_at = ? "
+                "WHERE id = ? AND status = 'open'",
+                (now, ticket_id),
+            ).rowcount
+            if closed:
+                db.execute(
+                    "INSERT INTO ticket_events VALUES (?, ?, 'answered', ?, ?)",
+                    (ticket_id, now, admin_id, answer),
+                )
+        return bool(closed)
+
+    def count_open(self) -> int:
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM tickets WHERE status = 'open'"
+            ).fetchone()[0]
+
+    def iter_open(self, batch_size: int = 100):
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT id, user_id, text, assigned_to, repeats, created_at "
+                    "FROM tickets WHERE status = 'open' AND id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+
+TICKETS = TicketStore(TICKETS_FILE)
+
+
+def parse_ticket_id(value: str) -> int:
+    return int(value.lstrip("#"))
+
+
+def open_ticket_entries():
+    for ticket in TICKETS.iter_open():
+        ticket_id, user_id, text, assigned_to, repeats, created_at = ticket
+        details = f"{datetime.fromtimestamp(created_at):%d.%m %H:%M}, від {user_id}"
+        if assigned_to:
+            details += f", адмін {assigned_to}"
+        if repeats:
+            details += f", повторів: {repeats}"
+        preview = text if len(text) <= 200 else text[:200] + "…"
+        yield f"#{ticket_id} ({details})\n{preview}\n\n"
+
+
+async def view_tickets(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду відкритих звернень посторінково."""
+    text, markup = render_page("tickets", 0)
+    if text is None:
+        await update.message.reply_text("🎫 Відкритих звернень немає.")
+        return
+    await update.message.reply_text(text, reply_markup=markup)
+
+
+async def view_ticket(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду звернення та його історії."""
+    ticket_id = parse_ticket_id(context.args[0])
+    ticket = TICKETS.get(ticket_id)
+    if not ticket:
+        await update.message.reply_text(f"❗Звернення #{ticket_id} не знайдено.")
+        return
+
+    lines = [
+        f"🎫 Звернення #{ticket_id} — {TICKET_STATUS_NAMES[ticket['status']]}",
+        f"👤 {ticket['user_name']} (ID: {ticket['user_id']})",
+        f"📝 {ticket['text']}",
+        "",
+        "Історія:",
+    ]
+    for at, kind, actor, text in TICKETS.history(ticket_id):
+        line = (
+            f"{datetime.fromtimestamp(at):%d.%m %H:%M} "
+            f"{TICKET_EVENT_NAMES[kind]} ({actor})"
+        )
+        if kind == "answered":
+            line += f": {text}"
+        lines.append(line)
+    await update.message.reply_text("\n".join(lines)[:PAGE_LIMIT])
+
+
+def check_bot_status():
+    logging.info("Бот працює. Перевірка статусу.")
+
+
+# Посторінковий вивід великих списків
+PAGE_LIMIT = constants.MessageLimit.MAX_TEXT_LENGTH
+
+
+def paginate(header: str, entries, page_limit: int = PAGE_LIMIT):
+    """Ліниво пакує рядки у сторінки, що вміщаються в одне повідомлення."""
+    page, size = [header], len(header)
+    for entry in entries:
+        if len(entry) > page_limit - len(header):
+            entry = entry[: page_limit - len(header) - 1] + "…"
+        if size + len(entry) > page_limit:
+            yield "".join(page)
+            page, size = [header], len(header)
+        page.append(entry)
+        size += len(entry)
+    if len(page) > 1:
+        yield "".join(page)
+
+
+def blacklist_entries():
+    now = datetime.now()
+    for user_id, entry in BLACKLIST.items():
+        remaining_time = entry.end_date - now
+        yield (
+            f"🆔 ID: {user_id}\n"
+            f"⏳ Закінчення бану: {entry.end_date.strftime('%d.%m.%Y %H:%M')}\n"
+            f"⌛️ Залишилось: {remaining_time.days}д {remaining_time.seconds // 3600}г\n"
+            f"📝 Причина: {entry.reason}\n\n"
+        )
+
+
+def counter_user_entries():
+    post_users, report_users = counter_user_ids("post"), counter_user_ids("report")
+    yield f"📢 Оголошення ({len(post_users)} користувачів):\n"
+    for user_id in post_users:
+        yield f"{user_id}\n"
+    yield f"\n📝 Репорти ({len(report_users)} користувачів):\n"
+    for user_id in report_users:
+        yield f"{user_id}\n"
+
+
+# Джерело списку -> (заголовок сторінки, генератор рядків)
+PAGINATED_SOURCES = {
+    "blacklist": ("📋 Чорний список користувачів:\n\n", blacklist_entries),
+    "users": ("📊 Користувачі з активними лічильниками:\n\n", counter_user_entries),
+    "tickets": ("🎫 Відкриті звернення:\n\n", open_ticket_entries),
+}
+
+
+def render_page(source: str, page_number: int):
+    """Повертає текст сторінки та клавіатуру навігації (або None, якщо сторінки немає).
+
+    Сторінки не зберігаються: генератор проходить список заново і тримає в
+    пам'яті лише поточну та наступну сторінку.
+    """
+    header, entries = PAGINATED_SOURCES[source]
+    pages = list(islice(paginate(header, entries()), page_number, page_number + 2))
+    if not pages:
+        return None, None
+
+    buttons = []
+    if page_number > 0:
+        buttons.append(
+            InlineKeyboardButton("⬅️", callback_data=f"page:{source}:{page_number - 1}")
+        )
+    if len(pages) > 1:
+        buttons.append(
+            InlineKeyboardButton("➡️", callback_data=f"page:{source}:{page_number + 1}")
+        )
+    markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    return pages[0], markup
+
+
+async def handle_page_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обробник кнопок навігації посторінкових списків."""
+    query = update.callback_query
+    if update.effective_user.id not in ADMIN_IDS:
+        await query.answer("⚠️ Доступно лише адміністраторам.")
+        return
+
+    _, source, page_number = query.data.split(":")
+    text, markup = render_page(source, int(page_number))
+    if text is None:
+        await query.answer("Сторінка більше не існує.")
+        return
+
+    await query.answer()
+    try:
+        await query.edit_message_text(text, reply_markup=markup)
+    except BadRequest as e:
+        # Повторне натискання поточної сторінки: запит уже підтверджено, міняти нічого
+        if "message is not modified" not in str(e).lower():
+            raise
+
+
+# Вивантаження стану бота у файли
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_BATCH_SIZE = 1000
+
+
+def export_blacklist_rows():
+    # Копія списку пар робиться атомарно, тож цикл подій може змінювати словник
+    for user_id, entry in list(BLACKLIST.items()):
+        yield user_id, entry.end_date.isoformat(), entry.reason
+
+
+def export_counter_rows():
+    if SHARED_STORE:
+        yield from SHARED_STORE.iter_counters(EXPORT_BATCH_SIZE)
+        return
+    for kind, counts in (("post", user_post_counts), ("report", user_report_counts)):
+        for user_id, data in list(counts.items()):
+            yield user_id, kind, data["count"], data["reset_time"].isoformat()
+
+
+def export_stats_rows():
+    try:
+        with open(STATS_HISTORY_FILE, "r", encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                yield (record["date"],) + tuple(
+                    record["stats"].get(key, 0) for key in daily_stats
+                )
+    except FileNotFoundError:
+        return
+
+
+def export_queue_rows():
+    for submission in iter_pending_submissions():
+        yield (
+            submission["id"],
+            submission["user_id"],
+            submission["form_type"],
+            submission["submitted_at"],
+            submission.get("delivered_at"),
+            submission.get("service_id"),
+            submission["data"],
+        )
+
+
+# Джерело вивантаження -> (стовпці, генератор рядків)
+EXPORT_SOURCES = {
+    "blacklist": (("user_id", "end_date", "reason"), export_blacklist_rows),
+    "counters": (("user_id", "kind", "count", "reset_time"), export_counter_rows),
+    "stats": (("date",) + tuple(daily_stats), export_stats_rows),
+    "queue": (
+        (
+            "id",
+            "user_id",
+            "form_type",
+            "submitted_at",
+            "delivered_at",
+            "service_id",
+            "data",
+        ),
+        export_queue_rows,
+    ),
+}
+
+
+def write_export(source: str, export_format: str) -> tuple:
+    """Записує джерело у тимчасовий файл рядок за рядком; повертає (шлях, рядків)."""
+    columns, rows = EXPORT_SOURCES[source]
+    count = 0
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=f".{export_format}", delete=False, encoding="utf-8", newline=""
+    ) as file:
+        if export_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for row in rows():
+                writer.writerow(
+                    json.dumps(value, ensure_ascii=False)
+                    if isinstance(value, (dict, list))
+                    else value
+                    for value in row
+                )
+                count += 1
+        else:
+            for row in rows():
+                file.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                file.write("\n")
+                count += 1
+    return file.name, count
+
+
+async def run_export(bot: Bot, chat_id: int, source: str, export_format: str):
+    path = None
+    try:
+        path, count = await asyncio.to_thread(write_export, source, export_format)
+        with open(path, "rb") as document:
+            await bot.send_document(
+                chat_id,
+                document,
+                filename=f"{source}-{datetime.now():%Y%m%d-%H%M}.{export_format}",
+                caption=f"📦 Вивантаження {source}: {count} рядків",
+            )
+        logging.info(
+            "Вивантаження %s (%d рядків) надіслано в чат %d.", source, count, chat_id
+        )
+    except Exception as e:
+        logging.error("Помилка вивантаження %s: %s", source, e)
+        await bot.send_message(chat_id, f"❌ Помилка вивантаження: {str(e)}")
+    finally:
+        if path:
+            os.remove(path)
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для вивантаження чорного списку, лічильників, статистики або черги."""
+    source = context.args[0].lower()
+    export_format = context.args[1].lower() if len(context.args) > 1 else "csv"
+    if source not in EXPORT_SOURCES or export_format not in EXPORT_FORMATS:
+        await update.message.reply_text(
+            "❗Використовуйте: /export <що> [формат]\n"
+            f"Що: {', '.join(EXPORT_SOURCES)}\n"
+            f"Формат: {', '.join(EXPORT_FORMATS)} (за замовчуванням csv)"
+        )
+        return
+
+    if source == "blacklist" and SHARED_STORE:
+        sync_blacklist()
+    # Файл готується у фоні, щоб обробка інших оновлень не чекала на вивантаження
+    context.application.create_task(
+        run_export(context.bot, update.effective_chat.id, source, export_format)
+    )
+    await update.message.reply_text(
+        "📦 Готую файл, він надійде окремим повідомленням."
+    )
+    logging.info(
+        "Адміністратор %d запустив вивантаження %s (%s).",
+        update.effective_user.id,
+        source,
+        export_format,
+    )
+
+
+# Список команд адміністратора
+
+
+async def adm_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду списку команд адміністратора."""
+    await update.message.reply_text(format_help("admin"))
+    logging.info("Адміністратор %d переглянув список команд.", update.effective_user.id)
+
+
+# Масове блокування: user_id через кому або "file" — список у прикріпленому файлі
+USER_IDS_FROM_FILE = "file"
+USER_IDS_SEPARATORS_RE = re.compile(r"[\s,;]+")
+BULK_MAX_USER_IDS = 5000
+NOTIFY_RATE_PER_SECOND = 25  # нижче загального ліміту Bot API ~30 повідомлень/с
+NOTIFY_CONCURRENCY = 10
+
+
+def parse_user_ids(value: str):
+    if value.lower() == USER_IDS_FROM_FILE:
+        return []
+    return [int(item) for item in USER_IDS_SEPARATORS_RE.split(value) if item]
+
+
+async def collect_user_ids(message, value: str):
+    """Збирає унікальні user_id з аргументу або прикріпленого файлу (txt/csv)."""
+    if value.lower() != USER_IDS_FROM_FILE:
+        user_ids = parse_user_ids(value)
+    else:
+        document = message.document or (
+            message.reply_to_message.document if message.reply_to_message else None
+        )
+        if not document:
+            return []
+        file = await document.get_file()
+        content = bytes(await file.download_as_bytearray()).decode(
+            "utf-8-sig", errors="replace"
+        )
+        if content.lower().startswith("user_id"):
+            # CSV з /export: id у першому стовпці, решта стовпців ігнорується
+            rows = islice(csv.reader(io.StringIO(content)), 1, None)
+            tokens = [row[0] for row in rows if row]
+        else:
+            tokens = USER_IDS_SEPARATORS_RE.split(content)
+        user_ids = [int(token) for token in tokens if token.strip().isdigit()]
+    return list(dict.fromkeys(user_ids))
+
+
+async def notify_many(bot: Bot, user_ids, text: str) -> int:
+    """Паралельно сповіщає користувачів у межах ліміту; повертає кількість доставлених."""
+    semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+
+    async def send(index, user_id):
+        await asyncio.sleep(index / NOTIFY_RATE_PER_SECOND)
+        async with semaphore:
+            return await notify_user(bot, user_id, text)
+
+    results = await asyncio.gather(
+        *(send(index, user_id) for index, user_id in enumerate(user_ids))
+    )
+    return sum(1 for delivered in results if delivered)
+
+
+async def notify_and_report(bot: Bot, message, user_ids, text: str):
+    """Сповіщає користувачів і окремим повідомленням звітує адміністратору про доставку."""
+    delivered = await notify_many(bot, user_ids, text)
+    if delivered < len(user_ids):
+        report = f"⚠️ Сповіщено лише {delivered} з {len(user_ids)} користувачів."
+    else:
+        report = f"📨 Сповіщено всіх користувачів: {delivered}."
+    await message.reply_text(report)
+
+
+async def ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для додавання користувачів до чорного списку з вказанням терміну та причини."""
+    try:
+        days = int(context.args[1])
+        reason = " ".join(context.args[2:])
+
+        if days <= 0:
+            await update.message.reply_text("❗Кількість днів має бути більше 0.")
+            return
+
+        user_ids = await collect_user_ids(update.message, context.args[0])
+        if not user_ids:
+            await update.message.reply_text(
+                "❗Не знайдено жодного user_id. Вкажіть їх через кому або "
+                "прикріпіть файл зі списком і використайте file замість user_id."
+            )
+            return
+        if len(user_ids) > BULK_MAX_USER_IDS:
+            await update.message.reply_text(
+                f"❗Не більше {BULK_MAX_USER_IDS} користувачів за одну команду."
+            )
+            return
+
+        end_date = datetime.now() + timedelta(days=days)
+        entries = {
+            user_id: BlacklistEntry(user_id, end_date, reason) for user_id in user_ids
+        }
+        # Уся пачка записується одним збереженням
+        update_blacklist(entries)
+
+        logging.info(
+            "Адміністратор %d забанив %d користувачів на %d днів: %s. Причина: %s",
+            update.effective_user.id,
+            len(user_ids),
+            days,
+            ", ".join(map(str, user_ids)),
+            reason,
+        )
+
+        ban_message = (
+            f"⛔️ Адміністратор заблокував доступ до бота на {days} днів.\n"
+            f"📝 Причина: {reason}"
+        )
+        if len(user_ids) == 1:
+            summary = f"✅ Користувач {user_ids[0]} доданий до чорного списку\n"
+        else:
+            summary = f"✅ До чорного списку додано {len(user_ids)} користувачів\n"
+        summary += (
+            f"⏳ До: {end_date.strftime('%d.%m.%Y %H:%M')}\n"
+            f"📝 Причина: {reason}"
+        )
+        # Зміни вже застосовані; сповіщення йдуть у фоні з окремим звітом про доставку
+        await update.message.reply_text(summary)
+        context.application.create_task(
+            notify_and_report(context.bot, update.message, user_ids, ban_message)
+        )
+
+    except ValueError as e:
+        await update.message.reply_text(
+            "❗Будь ласка, введіть коректні дані:\n"
+            "- user_id мають бути числами через кому або крапку з комою\n"
+            "- кількість днів має бути цілим числом"
+        )
+        logging.error("Помилка при обробці команди ban: %s", str(e))
+    except Exception as e:
+        await update.message.reply_text(
+            "❗Сталася непередбачена помилка. Спробуйте ще раз."
+        )
+        logging.error("Непередбачена помилка в команді ban: %s", str(e))
+
+
+async def unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для видалення користувачів з чорного списку."""
+    try:
+        user_ids = await collect_user_ids(update.message, context.args[0])
+        banned = [user_id for user_id in user_ids if user_id in BLACKLIST]
+        if not banned:
+            await update.message.reply_text(
+                "❗Жоден із вказаних користувачів не знаходиться в чорному списку.",
+            )
+            return
+
+        # Зберігаємо причини бану для логу
+        reasons = {user_id: BLACKLIST[user_id].reason for user_id in banned}
+        update_blacklist(removed=banned)
+
+        for user_id, ban_reason in reasons.items():
+            logging.info(
+                "Адміністратор %d розблокував користувача %d (був заблокований за: %s)",
+                update.effective_user.id,
+                user_id,
+                ban_reason,
+            )
+
+        unban_message = (
+            "✅ Ваші обмеження були зняті адміністратором, можете далі користуватися ботом.\n"
+            "⚠️ Будь ласка, не порушуйте правила користування ботом.\n"
+            f"📋 Ознайомитись з правилами можна тут: {RULES_LINK}"
+        )
+        if len(banned) == 1:
+            summary = f"✅ Користувач {banned[0]} видалений з чорного списку."
+        else:
+            summary = f"✅ З чорного списку видалено {len(banned)} користувачів."
+        if len(banned) < len(user_ids):
+            summary += f"\n❔ Не були в чорному списку: {len(user_ids) - len(banned)}"
+        await update.message.reply_text(summary)
+        context.application.create_task(
+            notify_and_report(context.bot, update.message, banned, unban_message)
+        )
+    except ValueError:
+        await update.message.reply_text(
+            "❗Будь ласка, введіть коректні user_id (числа через кому або крапку з комою)."
+        )
+
+
+async def check_bans(bot: Bot):
+    """Перевірка банів кожну годину."""
+    try:
+        if SHARED_STORE:
+            sync_blacklist()
+        current_time = datetime.now()
+        users_to_unban = [
+            user_id
+            for user_id, entry in BLACKLIST.items()
+            if entry.end_date <= current_time
+        ]
+
+        for user_id in users_to_unban:
+            unban_message = (
+                "✅ Ваші обмеження зняті, можете далі користуватися ботом.\n"
+                "⚠️ Будь ласка, не порушуйте правила користування ботом.\n"
+                f"📋 Ознайомитись з правилами можна тут: {RULES_LINK}"
+            )
+
+            await notify_user(bot, user_id, unban_message)
+
+            update_blacklist(removed=[user_id])
+
+            logging.info("Користувача %d було автоматично розблоковано.", user_id)
+
+    except Exception as e:
+        logging.error("Помилка при перевірці банів: %s", e)
+
+
+async def view_blacklist(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду чорного списку."""
+    if not BLACKLIST:
+        await update.message.reply_text("📋 Чорний список порожній.")
+    else:
+        text, markup = render_page("blacklist", 0)
+        await update.message.reply_text(text, reply_markup=markup)
+
+
+async def answer_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для відповіді на звернення користувача; тікет закривається."""
+    ticket_id = parse_ticket_id(context.args[0])
+    answer_text = " ".join(context.args[1:])
+    ticket = TICKETS.get(ticket_id)
+    if not ticket:
+        await update.message.reply_text(f"❗Звернення #{ticket_id} не знайдено.")
+        return
+    if ticket["status"] != "open":
+        await update.message.reply_text(f"❗Звернення #{ticket_id} вже закрите.")
+        return
+
+    user_id = ticket["user_id"]
+    try:
+        # Надсилаємо відповідь користувачу
+        await context.bot.send_message(
+            chat_id=user_id,
+            text=f"📬 Відповідь від адміністрації на звернення #{ticket_id}:\n\n{answer_text}",
+        )
+    except Exception as e:
+        await update.message.reply_text(f"❌ Помилка при надсиланні відповіді: {str(e)}")
+        logging.error(
+            "Помилка при надсиланні відповіді від адміністратора %d користувачу %d: %s",
+            update.effective_user.id,
+            user_id,
+            str(e),
+        )
+        return
+
+    TICKETS.close(ticket_id, update.effective_user.id, answer_text)
+    # Підтверджуємо адміністратору, що відповідь надіслано
+    await update.message.reply_text(
+        f"✅ Відповідь надіслано користувачу {user_id}, звернення #{ticket_id} закрито."
+    )
+    logging.info(
+        "Адміністратор %d відповів на звернення #%d користувача %d (%s).",
+        update.effective_user.id,
+        ticket_id,
+        user_id,
+        answer_text,
+    )
+
+
+async def check_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду поточної статистики за день."""
+    stats = get_daily_stats()
+    total_requests = sum(stats.values())
+
+    stats_message = (
+        f"📊 Статистика за {datetime.now():%d/%m/%Y}:\n\n"
+        f"📢 Оголошення: {stats['announcement']}\n"
+        f"🎯 Реклама: {stats['advertising']}\n"
+        f"💰 Продажі: {stats['selling']}\n"
+        f"🛒 Купівля: {stats['buying']}\n"
+        f"📈 Всього запитів: {total_requests}\n\n"
+        f"{MODERATION_SLA.summary()}\n\n"
+        f"{format_system_metrics()}"
+    )
+
+    await update.message.reply_text(stats_message)
+    logging.info("Адміністратор %d переглянув статистику.", update.effective_user.id)
+
+
+# Контроль затримок циклу подій
+LOOP_LAG_INTERVAL_SECONDS = 0.1
+LOOP_BLOCK_THRESHOLD_SECONDS = config.get("LOOP_BLOCK_THRESHOLD_MS", 250) / 1000
+LOOP_LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+LOOP_STALLS_KEPT = 5
+
+
+class LoopWatchdog:
+    """Вимірює затримку планування циклу подій і ловить блокуючі виклики.
+
+    Корутина кожні LOOP_LAG_INTERVAL_SECONDS засинає і міряє, наскільки пізніше
+    запланованого прокинулась: цю затримку відчуває кожне оновлення. Окремий
+    потік стежить за її пульсом; якщо пульс зник довше за поріг, цикл зайнятий
+    одним колбеком, і потік знімає стек потоку циклу подій.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = [0] * (len(LOOP_LAG_BUCKETS_MS) + 1)
+        self.max_lag = 0.0
+        self.heartbeat = time.monotonic()
+        self.reported_heartbeat = None
+        self.thread_id = None
+        # Зависання записує потік-сторож, а summary читає цикл подій
+        self.lock = Lock()
+        self.stalls = 0
+        self.locations = defaultdict(int)
+        self.recent = deque(maxlen=LOOP_STALLS_KEPT)
+
+    async def start(self):
+        if self.thread_id is not None:
+            return
+        self.thread_id = get_ident()
+        asyncio.get_running_loop().create_task(self.measure())
+        Thread(target=self.watch, daemon=True).start()
+        logging.info(
+            "Контроль циклу подій запущено (поріг %d мс).", self.threshold * 1000
+        )
+
+    def observe(self, lag: float):
+        self.histogram[bisect.bisect_left(LOOP_LAG_BUCKETS_MS, lag * 1000)] += 1
+        self.max_lag = max(self.max_lag, lag)
+
+    async def measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.heartbeat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.observe(max(0.0, loop.time() - expected))
+
+    def watch(self):
+        while True:
+            time.sleep(self.threshold / 4)
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled >= self.threshold and heartbeat != self.reported_heartbeat:
+                # Про одне зависання повідомляємо лише раз
+                self.reported_heartbeat = heartbeat
+                self.capture(stalled)
+
+    def capture(self, stalled: float):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        # Місце зависання — найглибший кадр нашого коду, інакше найглибший взагалі
+        own = [entry for entry in stack if entry.filename == __file__]
+        culprit = (own or stack)[-1]
+        location = f"{culprit.name} ({os.path.basename(culprit.filename)}:{culprit.lineno})"
+        with self.lock:
+            self.stalls += 1
+            self.locations[location] += 1
+            self.recent.append((datetime.now(), stalled, location))
+        logging.warning(
+            "Цикл подій заблоковано вже %.0f мс у %s:\n%s",
+            stalled * 1000,
+            location,
+            "".join(traceback.format_list(stack[-15:])),
+        )
+
+    def percentile_ms(self, fraction: float) -> str:
+        """Межа кошика гістограми, в який потрапляє заданий перцентиль."""
+        total = sum(self.histogram)
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= fraction * total:
+                break
+        if index < len(LOOP_LAG_BUCKETS_MS):
+            return f"≤{LOOP_LAG_BUCKETS_MS[index]}"
+        return f">{LOOP_LAG_BUCKETS_MS[-1]}"
+
+    def summary(self) -> str:
+        with self.lock:
+            stalls, locations, recent = self.stalls, dict(self.locations), list(self.recent)
+        text = (
+            f"🐢 Затримка циклу подій: p50 {self.percentile_ms(0.5)} мс, "
+            f"p99 {self.percentile_ms(0.99)} мс, макс {self.max_lag * 1000:.0f} мс\n"
+            f"🧱 Блокувань понад {self.threshold * 1000:.0f} мс: {stalls}"
+        )
+        if locations:
+            location = max(locations, key=locations.get)
+            text += f" (найчастіше: {location} ×{locations[location]})"
+        for moment, stalled, location in reversed(recent):
+            text += f"\n   {moment:%H:%M:%S} {stalled * 1000:.0f} мс — {location}"
+        return text
+
+
+LOOP_WATCHDOG = LoopWatchdog(LOOP_LAG_INTERVAL_SECONDS, LOOP_BLOCK_THRESHOLD_SECONDS)
+
+
+def format_system_metrics():
+    """Службові показники роботи бота для адміністраторів."""
+    outbox = OUTBOX.stats()
+    return (
+        "⚙️ Система:\n"
+        f"🔄 Перезавантажень конфігурації: {CONFIG_RELOAD_STATS['reloads']} "
+        f"(відхилено: {CONFIG_RELOAD_STATS['failures']})\n"
+        f"📤 Outbox: в черзі {outbox.get('pending', 0) + outbox.get('sending', 0)}, "
+        f"недоставлено {outbox.get('dead', 0)}\n"
+        f"📢 Черга публікації: {len(PUBLISH_QUEUE)}, "
+        f"не опубліковано {len(PUBLISH_QUEUE.failed)}\n"
+        f"📝 Чернетки: фото {DRAFT_STATS['live'].get('photos', 0)}, "
+        f"звернення {DRAFT_STATS['live'].get('report', 0)} "
+        f"(закрито за тайм-аутом: {DRAFT_STATS['expired']})\n"
+        f"{format_assignment_metrics()}\n"
+        f"🎫 Відкритих звернень: {TICKETS.count_open()}\n"
+        f"🚦 Флуд: відкинуто оновлень {THROTTLE.dropped}, "
+        f"зараз обмежено {THROTTLE.throttled_users(time.monotonic())}, "
+        f"автоблокувань {THROTTLE.auto_bans}\n"
+        f"🚫 Стоп-список: {len(BLOCKLIST.terms)} термінів, "
+        f"позначено {BLOCKLIST_STATS['flagged']}, "
+        f"відхилено {BLOCKLIST_STATS['rejected']}\n"
+        f"{LOOP_WATCHDOG.summary()}"
+    )
+
+
+async def view_placements(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду найближчих завершень платних розміщень."""
+    if not PLACEMENTS:
+        await update.message.reply_text("📌 Активних платних розміщень немає.")
+        return
+
+    upcoming = heapq.nsmallest(
+        20, PLACEMENTS.items(), key=lambda item: item[1]["expires_at"]
+    )
+    lines = [
+        f"{'📌' if placement['kind'] == 'pin' else '📢'} {placement_id} "
+        f"(користувач {placement['user_id']}) — до "
+        f"{datetime.fromisoformat(placement['expires_at']):%d.%m.%Y %H:%M}"
+        for placement_id, placement in upcoming
+    ]
+    await update.message.reply_text(
+        f"⏳ Найближчі завершення ({len(upcoming)} з {len(PLACEMENTS)}):\n\n"
+        + "\n".join(lines)
+    )
+
+
+async def view_publish_failed(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду оголошень, які не вдалося опублікувати в каналі."""
+    if not PUBLISH_QUEUE.failed:
+        await update.message.reply_text("📢 Неопублікованих оголошень немає.")
+        return
+
+    lines = [
+        f"❗ {listing['id']} (користувач {listing['user_id']}, "
+        f"{datetime.fromisoformat(listing['failed_at']):%d.%m %H:%M}): "
+        f"{listing['last_error'][:100]}"
+        for listing in PUBLISH_QUEUE.failed[-20:]
+    ]
+    await update.message.reply_text(
+        f"📢 Не опубліковано ({len(PUBLISH_QUEUE.failed)}):\n\n"
+        + "\n".join(lines)
+        + "\n\nПовторити: /publish_retry <id> або /publish_retry all"
+    )
+
+
+async def retry_publish(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для повернення неопублікованих оголошень до черги публікації."""
+    listing_id = context.args[0]
+    retried = PUBLISH_QUEUE.retry_failed(None if listing_id == "all" else listing_id)
+    if not retried:
+        await update.message.reply_text(f"❗Оголошення {listing_id} немає серед невдалих.")
+        return
+    await update.message.reply_text(f"🔁 Повернуто до черги публікації: {retried}")
+    logging.info(
+        "Адміністратор %d повернув до черги публікації %d оголошень.",
+        update.effective_user.id,
+        retried,
+    )
+
+
+# Профілювання бота на вимогу
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_MAX_SECONDS = 300
+PROFILE_TOP = 15
+PROFILE_IDLE_FRAMES = ("select (selectors.py", "poll (selectors.py")
+profile_in_progress = False
+
+
+class StackSampler:
+    """Семплювальний профайлер одного потоку.
+
+    Окремий потік періодично знімає стек потоку циклу подій через
+    sys._current_frames(): сам цикл подій не інструментується, а поза сеансом
+    профілювання потоку взагалі немає, тож і накладних витрат теж.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self.samples = 0
+
+    def run(self, seconds: float):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+        return self
+
+    def idle_samples(self) -> int:
+        return sum(
+            count
+            for stack, count in self.stacks.items()
+            if stack[-1].startswith(PROFILE_IDLE_FRAMES)
+        )
+
+    def hot_functions(self, limit: int = PROFILE_TOP):
+        """Функції за власним часом: (функція, власні семпли, семпли разом з викликаними)."""
+        own, total = defaultdict(int), defaultdict(int)
+        for stack, count in self.stacks.items():
+            if stack[-1].startswith(PROFILE_IDLE_FRAMES):
+                continue
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        ranked = sorted(own, key=lambda name: -own[name])[:limit]
+        return [(name, own[name], total[name]) for name in ranked]
+
+    def collapsed(self) -> str:
+        """Стеки у форматі flamegraph.pl / speedscope: "корінь;...;лист кількість"."""
+        return "".join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])
+        )
+
+
+def format_profile(sampler: StackSampler, seconds: int) -> str:
+    samples = sampler.samples or 1
+    idle = sampler.idle_samples()
+    lines = [
+        f"🔬 Профіль за {seconds} с: {sampler.samples} семплів, "
+        f"цикл подій простоював {idle / samples:.0%} часу.",
+        "Найгарячіші функції (власний час / разом з викликаними):",
+    ]
+    for index, (name, own, total) in enumerate(sampler.hot_functions(), start=1):
+        lines.append(f"{index}. {own / samples:.1%} / {total / samples:.1%} {name}")
+    if len(lines) == 2:
+        lines.append("— робочих семплів немає, бот був вільний.")
+    return "\n".join(lines)
+
+
+async def run_profile(bot: Bot, chat_id: int, seconds: int, thread_id: int):
+    global profile_in_progress
+    try:
+        sampler = await asyncio.to_thread(StackSampler(thread_id).run, seconds)
+        document = io.BytesIO(sampler.collapsed().encode("utf-8"))
+        document.name = f"profile-{datetime.now():%Y%m%d-%H%M%S}.collapsed.txt"
+        await bot.send_message(chat_id, format_profile(sampler, seconds)[:PAGE_LIMIT])
+        await bot.send_document(
+            chat_id,
+            document,
+            caption="🔥 Стеки для flamegraph.pl або speedscope.app",
+        )
+    except Exception as e:
+        logging.error("Помилка профілювання: %s", e)
+        await bot.send_message(chat_id, f"❌ Помилка профілювання: {str(e)}")
+    finally:
+        profile_in_progress = False
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для профілювання циклу подій протягом заданої кількості секунд."""
+    global profile_in_progress
+    seconds = int(context.args[0])
+    if not 1 <= seconds <= PROFILE_MAX_SECONDS:
+        await update.message.reply_text(
+            f"❗Тривалість профілювання — від 1 до {PROFILE_MAX_SECONDS} секунд."
+        )
+        return
+    if profile_in_progress:
+        await update.message.reply_text("⏳ Профілювання вже триває, зачекайте.")
+        return
+
+    profile_in_progress = True
+    # Обробник не чекає завершення, інакше бот стояв би весь час профілювання
+    context.application.create_task(
+        run_profile(context.bot, update.effective_chat.id, seconds, get_ident())
+    )
+    await update.message.reply_text(
+        f"🔬 Профілювання запущено на {seconds} с, результат надійде окремим повідомленням."
+    )
+    logging.info(
+        "Адміністратор %d запустив профілювання на %d с.",
+        update.effective_user.id,
+        seconds,
+    )
+
+
+async def send_daily_stats(application):
+    logging.info("Початок відправки щоденної статистики.")
+
+    stats = get_daily_stats()
+    total_requests = sum(stats.values())
+
+    stats_message = (
+        f"📊 Статистика за {datetime.now():%d/%m/%Y}:\n\n"
+        f"📢 Оголошення: {stats['announcement']}\n"
+        f"🎯 Реклама: {stats['advertising']}\n"
+        f"💰 Продажі: {stats['selling']}\n"
+        f"🛒 Купівля: {stats['buying']}\n"
+        f"📈 Всього запитів: {total_requests}\n\n"
+        f"{MODERATION_SLA.summary()}"
+    )
+
+    # Статистика ставиться в outbox; доставляє її періодичне завдання бота
+    for admin_id in ADMIN_IDS:
+        OUTBOX.enqueue(
+            f"stats:{datetime.now():%Y-%m-%d}:{admin_id}",
+            admin_id,
+            "send_message",
+            text=stats_message,
+        )
+        logging.info("Статистику поставлено в чергу для адміна %d", admin_id)
+
+    logging.info("Завершення відправки щоденної статистики.")
+
+
+def increment_daily_stat(form_type):
+    if SHARED_STORE:
+        SHARED_STORE.increment_stat(form_type)
+    else:
+        daily_stats[form_type] += 1
+
+
+def get_daily_stats():
+    """Поточна статистика за день (зі спільного сховища в режимі шардів)."""
+    if SHARED_STORE:
+        return dict(daily_stats, **SHARED_STORE.get_stats())
+    return dict(daily_stats)
+
+
+STATS_HISTORY_FILE = "stats_history.jsonl"
+
+
+def append_stats_history():
+    """Додає підсумок дня, що минає, до історії статистики."""
+    record = {
+        "date": f"{datetime.now() - timedelta(minutes=5):%Y-%m-%d}",
+        "stats": get_daily_stats(),
+    }
+    with open(STATS_HISTORY_FILE, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record) + "\n")
+
+
+def reset_daily_stats():
+    """Скидання щоденної статистики."""
+    append_stats_history()
+    if SHARED_STORE:
+        SHARED_STORE.reset_stats()
+    daily_stats.update({key: 0 for key in daily_stats})
+    MODERATION_SLA.reset()
+    logging.info("Щоденна статистика скинута.")
+
+
+async def reset_counters(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для скидання лічильників оголошень та репортів для вказаного користувача."""
+    args = context.args
+    try:
+        user_id = int(args[0])
+    except ValueError:
+        await update.message.reply_text(
+            "❗Будь ласка, введіть коректний user_id (число)."
+        )
+        logging.warning(
+            "Адміністратор %d ввів некоректний user_id: %s",
+            update.effective_user.id,
+            args[0],
+        )
+        return
+
+    if not delete_user_counters(user_id):
+        await update.message.reply_text("❗Цей користувач не має лічильників.")
+        logging.info(
+            "Адміністратор %d спробував скинути лічильники для користувача %d, але лічильники відсутні.",
+            update.effective_user.id,
+            user_id,
+        )
+        return
+
+    await update.message.reply_text(
+        f"🔄 Лічильники для користувача з ID {user_id} були скинуті."
+    )
+    logging.info(
+        "Користувач %d скинув лічильники для користувача %d.",
+        update.effective_user.id,
+        user_id,
+    )
+
+
+async def view_counters(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду лічильників оголошень та репортів для вказаного користувача."""
+    args = context.args
+    try:
+        user_id = int(args[0])
+    except ValueError:
+        await update.message.reply_text(
+            "❗Будь ласка, введіть коректний user_id (число)."
+        )
+        logging.warning(
+            "Адміністратор %d ввів некоректний user_id: %s",
+            update.effective_user.id,
+            args[0],
+        )
+        return
+
+    post_data = get_user_counter(user_id, "post")
+    report_data = get_user_counter(user_id, "report")
+
+    response = (
+        f"📊 Лічильники для користувача з ID {user_id}:\n"
+        f"📢 Оголошення: {post_data['count']}/{5} (скидається о {post_data['reset_time'] + timedelta(days=1):%Y-%m-%d %H:%M:%S})\n"
+        f"📝 Репорти: {report_data['count']}/{10} (скидається о {report_data['reset_time'] + timedelta(days=1):%Y-%m-%d %H:%M:%S})"
+    )
+
+    await update.message.reply_text(response)
+    logging.info(
+        "Користувач %d переглянув лічильники для користувача %d.",
+        update.effective_user.id,
+        user_id,
+    )
+
+
+async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду списку користувачів з активними лічильниками."""
+    if not counter_user_ids("post") and not counter_user_ids("report"):
+        await update.message.reply_text("❗Немає користувачів з активними лічильниками.")
+    else:
+        text, markup = render_page("users", 0)
+        await update.message.reply_text(text, reply_markup=markup)
+    logging.info(
+        "Адміністратор %d переглянув список користувачів з активними лічильниками.",
+        update.effective_user.id,
+    )
+
+
+def reset_all_counters():
+    """Функція для скидання всіх лічильників."""
+    if SHARED_STORE:
+        SHARED_STORE.reset_all_counters()
+        logging.info("Всі лічильники були скинуті.")
+        return
+
+    current_time = datetime.now()
+    CONTACT_INDEX.clear()
+    for user_id in list(user_post_counts.keys()):
+        user_post_counts[user_id]["count"] = 0
+        user_post_counts[user_id]["reset_time"] = current_time
+
+    for user_id in list(user_report_counts.keys()):
+        user_report_counts[user_id]["count"] = 0
+        user_report_counts[user_id]["reset_time"] = current_time
+
+    logging.info("Всі лічильники були скинуті.")
+
+
+# Список команд модератора
+
+
+async def mod_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для перегляду списку команд модератора."""
+    services = "\n".join(
+        f"{service_id} - {service['description']}"
+        for service_id, service in PAID_SERVICES.items()
+    )
+    await update.message.reply_text(
+        f"{format_help('moderator')}\n\nService ID's:\n{services}"
+    )
+    logging.info("Модератор %d переглянув список команд.", update.effective_user.id)
+
+
+# Команда надсилання реквізитів
+
+
+async def payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для надсилання реквізитів для оплати."""
+    try:
+        user_id = int(context.args[0])
+        id_prod = int(context.args[1])
+        amount = float(context.args[2])
+
+        service = PAID_SERVICES.get(id_prod)
+        if not service:
+            await update.message.reply_text("❗Некоректний service_id.")
+            return
+        service_description = service["description"]
+        # Облік веде лише основний шард; перевіряємо до надсилання реквізитів
+        ensure_primary_shard("Облік оплати")
+        attach_service_to_pending(user_id, id_prod)
+
+        message = (
+            f"💼 Ви надіслали запит на платні послуги, а саме: {service_description}.\n"
+            f"💳 Для публікації - необхідно здійснити оплату на банківську картку: \n"
+            f"`{PAYMENT_CARD}`\n"
+            f"💰 Загальна вартість: `{amount}` грн.\n"
+            f"📝 У призначенні платежу обов'язково вкажіть:\n"
+            f"`Оплата за послуги №{user_id}`\n"
+            "⏳ Після оплати, публікація з'явиться протягом 24-х годин, а ви отримаєте сповіщення.\n"
+            "🙏 Дякуємо, що скористалися нашими послугами!"
+        )
+
+        await context.bot.send_message(
+            chat_id=user_id, text=message, parse_mode=constants.ParseMode.MARKDOWN
+        )
+        # Запит записується лише після доставки, щоб не лишати відкритих записів без реквізитів
+        record_payment_request(user_id, id_prod, amount)
+
+        logging.info(
+            "Модератор %d надіслав реквізити оплати для користувача %d.",
+            update.effective_user.id,
+            user_id,
+        )
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення з реквізитами надіслано користувачу {user_id}."
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректні параметри введення.")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці реквізитів: %s", e)
+
+
+async def reconcile_payments(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для звірки банківської виписки (CSV) з відкритими запитами на оплату."""
+    message = update.message
+    document = message.document or (
+        message.reply_to_message.document if message.reply_to_message else None
+    )
+    if not document:
+        await message.reply_text(
+            "❗Надішліть CSV-виписку з підписом /reconcile "
+            "або дайте відповідь командою /reconcile на повідомлення з файлом."
+        )
+        return
+
+    try:
+        ensure_primary_shard("Звірка виписки")
+        file = await document.get_file()
+        content = bytes(await file.download_as_bytearray())
+        result = await asyncio.to_thread(PAYMENT_LEDGER.reconcile, content)
+    except ValueError as e:
+        await message.reply_text(f"❗Не вдалося розібрати виписку: {e}")
+        return
+    except Exception as e:
+        await message.reply_text(f"❌ Помилка при звірці виписки: {str(e)}")
+        logging.error("Помилка при звірці виписки: %s", e)
+        return
+
+    await message.reply_text(
+        "🧾 Звірку виписки завершено:\n"
+        f"📄 Рядків у виписці: {result['rows']}\n"
+        f"✅ Позначено оплаченими: {result['matched']}\n"
+        f"❔ Без відповідного запиту: {result['unmatched']}\n"
+        f"⏳ Відкритих запитів залишилось: {result['open']}\n"
+        f"⏱ Час обробки: {result['seconds']:.2f} с"
+    )
+    logging.info(
+        "Адміністратор %d звірив виписку: %d з %d рядків зіставлено.",
+        update.effective_user.id,
+        result["matched"],
+        result["rows"],
+    )
+
+
+async def buy_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для прийняття запиту на купівлю."""
+    try:
+        user_id = int(context.args[0])
+
+        message = (
+            "✅ Ваш запит на купівлю успішно пройшов модерацію.\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+
+        record_accepted_listing(user_id, "buying", update.effective_user.id)
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d схвалив запит на купівлю для користувача %d.",
+            update.effective_user.id,
+            user_id,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
+
+
+async def sell_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для прийняття запиту на продаж."""
+    try:
+        user_id = int(context.args[0])
+        message = (
+            "✅ Ваш запит на продаж успішно пройшов модерацію.\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        record_accepted_listing(user_id, "selling", update.effective_user.id)
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d схвалив запит на продаж для користувача %d.",
+            update.effective_user.id,
+            user_id,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
+
+
+async def ad_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для прийняття запиту на оголошення."""
+    # Тут
+
+    try:
+        user_id = int(context.args[0])
+        message = (
+            "✅ Ваш запит на оголошення успішно пройшов модерацію.\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        record_accepted_listing(user_id, "announcement", update.effective_user.id)
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d схвалив запит на оголошення для користувача %d.",
+            update.effective_user.id,
+            user_id,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
+
+
+async def an_accept(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для прийняття запиту на рекламу."""
+    try:
+        user_id = int(context.args[0])
+        message = (
+            "✅ Ваш запит на рекламу успішно пройшов модерацію.\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        record_accepted_listing(user_id, "advertising", update.effective_user.id)
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d схвалив запит на рекламу для користувача %d.",
+            update.effective_user.id,
+            user_id,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про прийняття надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення прийняття: %s", e)
+
+
+# Функції для відхилення запитів
+async def buy_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для відхилення запиту на купівлю."""
+    try:
+        user_id = int(context.args[0])
+        reason = " ".join(context.args[1:])
+        message = (
+            "❌ Ваш запит на купівлю відхилено.\n"
+            f"📝 Причина: {reason}\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        decide_submission(user_id, "buying", update.effective_user.id, "rejected")
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d відхилив запит на купівлю для користувача %d.\n"
+            "Причина: %s",
+            update.effective_user.id,
+            user_id,
+            reason,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про відхилення надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення відхилення: %s", e)
+
+
+async def sell_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для відхилення запиту на продаж."""
+    try:
+        user_id = int(context.args[0])
+        reason = " ".join(context.args[1:])
+        message = (
+            "❌ Ваш запит на продаж відхилено.\n"
+            f"📝 Причина: {reason}\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        decide_submission(user_id, "selling", update.effective_user.id, "rejected")
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d відхилив запит на продаж для користувача %d.\n" "Причина: %s",
+            update.effective_user.id,
+            user_id,
+            reason,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про відхилення надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення відхилення: %s", e)
+
+
+async def ad_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для відхилення запиту на оголошення."""
+    try:
+        user_id = int(context.args[0])
+        reason = " ".join(context.args[1:])
+        message = (
+            "❌ Ваш запит на оголошення відхилено.\n"
+            f"📝 Причина: {reason}\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        decide_submission(user_id, "announcement", update.effective_user.id, "rejected")
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d відхилив запит на оголошення для користувача %d. Причина: %s",
+            update.effective_user.id,
+            user_id,
+            reason,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                f"✅ Повідомлення про відхилення надіслано користувачу {user_id}"
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення відхилення: %s", e)
+
+
+async def an_reject(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Команда для відхилення запиту на рекламу."""
+    try:
+        user_id = int(context.args[0])
+        reason = " ".join(context.args[1:])
+        message = (
+            "❌ Ваш запит на рекламу відхилено.\n"
+            f"📝 Причина: {reason}\n"
+            "🔍 Переглянути всі оголошення можна на нашому каналі:\n"
+            "📢 @slavuta_ads"
+        )
+        decide_submission(user_id, "advertising", update.effective_user.id, "rejected")
+        await context.bot.send_message(chat_id=user_id, text=message)
+
+        logging.info(
+            "Модератор %d відхилив запит на рекламу для користувача %d.\n"
+            "Причина: %s",
+            update.effective_user.id,
+            user_id,
+            reason,
+        )
+
+        if update.message:
+            await update.message.reply_text(
+                "✅ Повідомлення про відхилення надіслано користувачу %d", user_id
+            )
+    except ValueError:
+        if update.message:
+            await update.message.reply_text("❗Некоректний user_id")
+    except Exception as e:
+        if update.message:
+            await update.message.reply_text(
+                f"❌ Помилка при відправці повідомлення: {str(e)}"
+            )
+        logging.error("Помилка при відправці повідомлення відхилення: %s", str(e))
+
+
+# Реєстр команд: назва, роль, схема аргументів та обробник
+ARG_PARSERS = {
+    "int": int,
+    "float": float,
+    "text": str,
+    "ids": parse_user_ids,
+    "ticket": parse_ticket_id,
+}
+ROLE_DENIED = {
+    "admin": ("⚠️ Ця команда доступна лише адміністраторам.", "адміністратором"),
+    "moderator": ("⚠️ Ця команда доступна лише модераторам.", "модератором"),
+}
+
+
+def has_role(user_id: int, role: str) -> bool:
+    if role == "admin":
+        return user_id in ADMIN_IDS
+    if role == "moderator":
+        return user_id in MODERATOR_IDS
+    return True
+
+
+class Command:
+    """Опис команди бота.
+
+    Аргументи задаються рядками "назва:тип"; тип "text" забирає решту
+    повідомлення і може стояти лише останнім.
+    """
+
+    def __init__(
+        self, name, handler, role="user", args=(), icon="", description="", group=0
+    ):
+        self.name = name
+        self.handler = handler
+        self.role = role
+        self.args = [tuple(spec.split(":")) for spec in args]
+        self.icon = icon
+        self.description = description
+        self.group = group
+
+    @property
+    def usage(self) -> str:
+        return " ".join([f"/{self.name}"] + [f"<{name}>" for name, _ in self.args])
+
+    def validate(self, args) -> str:
+        """Повертає текст помилки або порожній рядок, якщо аргументи коректні."""
+        has_text = bool(self.args) and self.args[-1][1] == "text"
+        if len(args) < len(self.args) or (not has_text and len(args) > len(self.args)):
+            return f"❗Використовуйте: {self.usage}"
+        for (name, kind), value in zip(self.args, args):
+            try:
+                ARG_PARSERS[kind](value)
+            except ValueError:
+                return f"❗Некоректне значення <{name}>.\n❗Використовуйте: {self.usage}"
+        return ""
+
+
+COMMANDS: Dict[str, Command] = {
+    command.name: command
+    for command in [
+        Command("search", search_listings, args=["query:text"]),
+        # Команди адміністратора
+        Command(
+            "adm_help", adm_help, "admin", icon="❔", description="Список команд"
+        ),
+        Command(
+            "reset_counters",
+            reset_counters,
+            "admin",
+            ["user_id:int"],
+            "📉",
+            "Скинути лічильник оголошень та звернень",
+        ),
+        Command(
+            "view_counters",
+            view_counters,
+            "admin",
+            ["user_id:int"],
+            "📊",
+            "Переглянути лічильник користувача",
+        ),
+        Command(
+            "list_users",
+            list_users,
+            "admin",
+            icon="👥",
+            description="Переглянути всіх користувачів з лічильником",
+        ),
+        Command(
+            "check_stats",
+            check_stats,
+            "admin",
+            icon="📈",
+            description="Переглянути статистику оголошень",
+        ),
+        Command(
+            "profile",
+            profile_command,
+            "admin",
+            ["seconds:int"],
+            "🔬",
+            "Профілювати бота протягом заданого часу",
+        ),
+        Command(
+            "export",
+            export_command,
+            "admin",
+            ["what:text"],
+            "📦",
+            "Вивантажити blacklist, counters, stats або queue у CSV/JSONL",
+        ),
+        Command(
+            "placements",
+            view_placements,
+            "admin",
+            icon="⏳",
+            description="Найближчі завершення платних розміщень",
+        ),
+        Command(
+            "publish_failed",
+            view_publish_failed,
+            "admin",
+            icon="📢",
+            description="Оголошення, які не вдалося опублікувати",
+        ),
+        Command(
+            "publish_retry",
+            retry_publish,
+            "admin",
+            ["listing:text"],
+            "🔁",
+            "Повторити публікацію (id оголошення або all)",
+        ),
+        Command(
+            "reconcile",
+            reconcile_payments,
+            "admin",
+            icon="🧾",
+            description="Звірити CSV-виписку банку з запитами на оплату",
+        ),
+        Command(
+            "ans",
+            answer_report,
+            "admin",
+            ["ticket:ticket", "text:text"],
+            "🗨️",
+            "Відповісти на звернення та закрити його",
+        ),
+        Command(
+            "tickets",
+            view_tickets,
+            "admin",
+            icon="🎫",
+            description="Відкриті звернення",
+        ),
+        Command(
+            "ticket",
+            view_ticket,
+            "admin",
+            ["ticket:ticket"],
+            "🔎",
+            "Звернення та його історія",
+        ),
+        Command(
+            "ban",
+            ban_user,
+            "admin",
+            ["user_ids:ids", "days:int", "reason:text"],
+            "🚫",
+            "Заблокувати користувачів (id через кому або file з файлом-списком)",
+        ),
+        Command(
+            "unban",
+            unban_user,
+            "admin",
+            ["user_ids:ids"],
+            "🔓",
+            "Розблокувати користувачів (id через кому або file з файлом-списком)",
+        ),
+        Command(
+            "blacklist",
+            view_blacklist,
+            "admin",
+            icon="🗑️",
+            description="Переглянути чорний список",
+        ),
+        # Команди модератора
+        Command(
+            "mod_help", mod_help, "moderator", icon="❔", description="Список команд"
+        ),
+        Command(
+            "buy_accept",
+            buy_accept,
+            "moderator",
+            ["user_id:int"],
+            "✅",
+            "Схвалити запит на купівлю",
+            group=1,
+        ),
+        Command(
+            "sell_accept",
+            sell_accept,
+            "moderator",
+            ["user_id:int"],
+            "✅",
+            "Схвалити запит на продаж",
+            group=1,
+        ),
+        Command(
+            "ad_accept",
+            ad_accept,
+            "moderator",
+            ["user_id:int"],
+            "✅",
+            "Схвалити оголошення",
+            group=1,
+        ),
+        Command(
+            "an_accept",
+            an_accept,
+            "moderator",
+            ["user_id:int"],
+            "✅",
+            "Схвалити запит на рекламу",
+            group=1,
+        ),
+        Command(
+            "buy_reject",
+            buy_reject,
+            "moderator",
+            ["user_id:int", "reason:text"],
+            "❌",
+            "Відхилити запит на купівлю",
+            group=2,
+        ),
+        Command(
+            "sell_reject",
+            sell_reject,
+            "moderator",
+            ["user_id:int", "reason:text"],
+            "❌",
+            "Відхилити запит на продаж",
+            group=2,
+        ),
+        Command(
+            "ad_reject",
+            ad_reject,
+            "moderator",
+            ["user_id:int", "reason:text"],
+            "❌",
+            "Відхилити оголошення",
+            group=2,
+        ),
+        Command(
+            "an_reject",
+            an_reject,
+            "moderator",
+            ["user_id:int", "reason:text"],
+            "❌",
+            "Відхилити запит на рекламу",
+            group=2,
+        ),
+        Command(
+            "payment",
+            payment,
+            "moderator",
+            ["user_id:int", "service_id:int", "sum:float"],
+            "💳",
+            "Надіслати реквізити оплати",
+            group=3,
+        ),
+        Command(
+            "away",
+            set_away,
+            "moderator",
+            icon="🌙",
+            description="Не отримувати нові заявки (відсутній)",
+            group=4,
+        ),
+        Command(
+            "contact",
+            view_contact,
+            "moderator",
+            ["contact:text"],
+            "📇",
+            "Нещодавні заявки з телефоном або @ніком",
+            group=4,
+        ),
+        Command(
+            "back",
+            set_back,
+            "moderator",
+            icon="☀️",
+            description="Знову отримувати заявки",
+            group=4,
+        ),
+    ]
+}
+
+
+def format_help(role: str) -> str:
+    """Формує довідку для ролі з реєстру команд; групи розділяються порожнім рядком."""
+    lines, group = [], None
+    for command in COMMANDS.values():
+        if command.role != role or not command.description:
+            continue
+        if group is not None and command.group != group:
+            lines.append("")
+        group = command.group
+        lines.append(f"{command.icon} {command.usage} - {command.description}")
+    return "\n".join(lines)
+
+
+def parse_command(text: str):
+    """Розбирає "/назва@бот арг1 арг2" на (назва, згадка бота, аргументи)."""
+    parts = text.split()
+    name, _, mention = parts[0][1:].partition("@")
+    return name.lower(), mention, parts[1:]
+
+
+async def dispatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Єдиний обробник команд: пошук у реєстрі, перевірка ролі та аргументів."""
+    message = update.effective_message
+    if not message or not update.effective_user:
+        return
+    text = message.text or message.caption or ""
+    if not text.startswith("/"):
+        return
+
+    name, mention, args = parse_command(text)
+    command = COMMANDS.get(name)
+    if command is None:
+        return
+    if mention and mention.lower() != (context.bot.username or "").lower():
+        return
+
+    user_id = update.effective_user.id
+    if not has_role(user_id, command.role):
+        denied_text, role_name = ROLE_DENIED[command.role]
+        await message.reply_text(denied_text)
+        logging.warning(
+            "Користувач %d намагався використати /%s, але не є %s.",
+            user_id,
+            command.name,
+            role_name,
+        )
+        return
+
+    error = command.validate(args)
+    if error:
+        await message.reply_text(error)
+        return
+
+    context.args = args
+    await command.handler(update, context)
+
+
+def benchmark_dispatch(iterations="200000"):
+    """Порівнює пошук команди в реєстрі з послідовною перевіркою CommandHandler-ів.
+
+    Базовий варіант — колишній список CommandHandler-ів, які PTB перевіряв
+    по черзі через check_update; новий — MessageHandler диспетчера і пошук у
+    COMMANDS. Обидва варіанти далі однаково перевіряють роль і аргументи
+    знайденої команди, тож різниця лише в пошуку обробника.
+    """
+    iterations = int(iterations)
+    bot = Bot(TOKEN, request=ReplayRequest(), get_updates_request=ReplayRequest())
+    asyncio.run(bot.initialize())
+    admin_ids, moderator_ids = list(ADMIN_IDS), list(MODERATOR_IDS)
+    user_id = (admin_ids or moderator_ids or [0])[0]
+    legacy_order = [
+        "ban", "unban", "blacklist", "ans", "reset_counters", "view_counters",
+        "list_users", "check_stats", "placements", "search", "adm_help",
+        "mod_help", "payment", "reconcile", "buy_accept", "sell_accept",
+        "ad_accept", "an_accept", "buy_reject", "sell_reject", "ad_reject",
+        "an_reject",
+    ]  # fmt: skip
+    legacy_handlers = [CommandHandler(name, COMMANDS[name].handler) for name in legacy_order]
+    dispatcher = MessageHandler(
+        filters.COMMAND | (filters.Document.ALL & filters.CaptionRegex(r"^/")),
+        dispatch_command,
+    )
+    updates = []
+    for update_id, name in enumerate(legacy_order, 1):
+        entity = {"type": "bot_command", "offset": 0, "length": len(name) + 1}
+        data = bench_message(
+            update_id, user_id, text=f"/{name} 123456 7 причина", entities=[entity]
+        )
+        updates.append(Update.de_json(data, bot))
+
+    def check(name, args):
+        command = COMMANDS[name]
+        return has_role(user_id, command.role), command.validate(args)
+
+    def legacy(update):
+        for handler in legacy_handlers:
+            matched = handler.check_update(update)
+            if matched:
+                return check(next(iter(handler.commands)), matched[0])
+        return None
+
+    def registry(update):
+        if not dispatcher.check_update(update):
+            return None
+        name, mention, args = parse_command(update.effective_message.text)
+        if name not in COMMANDS or (mention and mention.lower() != bot.username.lower()):
+            return None
+        return check(name, args)
+
+    for label, func in (("CommandHandler-и по черзі", legacy), ("Реєстр", registry)):
+        started = time.perf_counter()
+        for i in range(iterations):
+            func(updates[i % len(updates)])
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {elapsed / iterations * 1e9:.0f} нс на команду")
+
+
+# Запис вхідних оновлень для відтворення навантаження
+RECORD_UPDATES_DIR = config.get("RECORD_UPDATES_DIR")  # None — запис вимкнено
+RECORD_FLUSH_EVERY = 50
+RECORD_ID_KEYS = {"id", "user_id", "chat_id"}
+RECORD_OPAQUE_KEYS = {"id", "file_id", "file_unique_id", "chat_instance", "inline_message_id"}
+RECORD_NAME_PLACEHOLDERS = {"first_name": "Користувач", "title": "Чат"}
+# Телефон, записаний групами: "097 111 22 33", "(097) 111-22-33", "+38 (097) 111-22-33"
+RECORD_PHONE_RE = re.compile(r"[+(]?\d{1,4}\)?(?:[ .\-]{1,2}\(?\d{1,4}\)?){2,}")
+RECORD_NUMBER_RE = re.compile(r"\d{5,}")
+RECORD_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+RECORD_HANDLE_RE = re.compile(r"(?<![\w.])@\w{3,}")
+
+
+class UpdateRecorder:
+    """Записує вхідні оновлення у стиснутий JSONL з мітками часу.
+
+    Ідентифікатори, телефони (зокрема записані групами цифр) та числа з 5+
+    цифр (id у командах) замінюються псевдонімами тієї ж довжини через HMAC з
+    випадковим ключем, який ніде не зберігається: у межах запису псевдонім стабільний, а справжнє значення
+    відновити неможливо. Імена, юзернейми та email також маскуються.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        started = datetime.now()
+        self.path = os.path.join(
+            directory, f"updates-{started:%Y%m%d-%H%M%S}-{os.getpid()}.jsonl.gz"
+        )
+        self.key = secrets.token_bytes(32)
+        self.lock = Lock()
+        self.count = 0
+        self.file = gzip.open(self.path, "at", encoding="utf-8")
+        # Ролі персоналу потрібні відтворенню, тому зберігаємо їхні псевдоніми
+        self._write(
+            {
+                "header": {
+                    "started": started.isoformat(),
+                    "admin_ids": [self.pseudonym(i) for i in ADMIN_IDS],
+                    "moderator_ids": [self.pseudonym(i) for i in MODERATOR_IDS],
+                }
+            }
+        )
+        atexit.register(self.close)
+        logging.info("Запис оновлень увімкнено: %s", self.path)
+
+    def _pseudo_digits(self, digits: str) -> str:
+        digest = hmac.new(self.key, digits.encode(), hashlib.sha256).digest()
+        number = int.from_bytes(digest, "big")
+        # Перша цифра ненульова, щоб довжина та формат числа зберігались
+        first = str(number % 9 + 1)
+        rest = str(number // 9).zfill(len(digits))[-(len(digits) - 1):]
+        return first + rest if len(digits) > 1 else first
+
+    def pseudonym(self, value: int) -> int:
+        sign = -1 if value < 0 else 1
+        return sign * int(self._pseudo_digits(str(abs(value))))
+
+    def _scrub_text(self, text: str) -> str:
+        text = RECORD_EMAIL_RE.sub("user@example.com", text)
+        text = RECORD_HANDLE_RE.sub(
+            lambda m: "@u" + self._pseudo_digits(m.group(0).lower())[:8], text
+        )
+        text = RECORD_PHONE_RE.sub(self._scrub_phone, text)
+        return RECORD_NUMBER_RE.sub(
+            lambda m: self._pseudo_digits(m.group(0)), text
+        )
+
+    def _scrub_phone(self, match) -> str:
+        """Замінює цифри телефону псевдонімом, зберігаючи розділювачі."""
+        digits = re.sub(r"\D", "", match.group(0))
+        if not 9 <= len(digits) <= 15:
+            # Короткі групи цифр (ціни, дати) телефоном не є
+            return match.group(0)
+        pseudo = iter(self._pseudo_digits(digits))
+        return re.sub(r"\d", lambda m: next(pseudo), match.group(0))
+
+    def anonymize(self, value, key=None):
+        if isinstance(value, dict):
+            return {k: self.anonymize(v, k) for k, v in value.items() if k != "last_name"}
+        if isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int) and key in RECORD_ID_KEYS:
+            return self.pseudonym(value)
+        if isinstance(value, str):
+            if key in RECORD_NAME_PLACEHOLDERS:
+                return RECORD_NAME_PLACEHOLDERS[key]
+            if key == "username":
+                return "u" + self._pseudo_digits(value.lower())[:8]
+            if key == "phone_number":
+                return "+" + self._pseudo_digits(re.sub(r"\D", "", value))
+            if key not in RECORD_OPAQUE_KEYS:
+                return self._scrub_text(value)
+        return value
+
+    def _write(self, record: Dict[str, Any]):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, data: Dict[str, Any]):
+        record = {"t": time.time(), "update": self.anonymize(data)}
+        with self.lock:
+            if self.file.closed:
+                return
+            self._write(record)
+            self.count += 1
+            if self.count % RECORD_FLUSH_EVERY == 0:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                logging.info("Запис оновлень завершено: %d оновлень.", self.count)
+
+
+UPDATE_RECORDER = None  # створюється в main(), якщо задано RECORD_UPDATES_DIR
+
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    UPDATE_RECORDER.record(update.to_dict())
+
+
+# Пули з'єднань Bot API: окремо для getUpdates і для надсилання
+BOT_API_POOL_SIZE = config.get("BOT_API_POOL_SIZE", 32)  # розсилки й відповіді
+BOT_API_POLLING_POOL_SIZE = config.get("BOT_API_POLLING_POOL_SIZE", 1)
+BOT_API_CONNECT_TIMEOUT = config.get("BOT_API_CONNECT_TIMEOUT", 5.0)
+BOT_API_READ_TIMEOUT = config.get("BOT_API_READ_TIMEOUT", 10.0)
+BOT_API_WRITE_TIMEOUT = config.get("BOT_API_WRITE_TIMEOUT", 10.0)
+BOT_API_MEDIA_WRITE_TIMEOUT = config.get("BOT_API_MEDIA_WRITE_TIMEOUT", 30.0)
+# Скільки чекати вільного з'єднання; при великих розсилках черга до пулу неминуча
+BOT_API_POOL_TIMEOUT = config.get("BOT_API_POOL_TIMEOUT", 10.0)
+BOT_API_KEEPALIVE_SECONDS = config.get("BOT_API_KEEPALIVE_SECONDS", 60.0)
+BOT_API_HTTP_VERSION = config.get("BOT_API_HTTP_VERSION", "1.1")  # "2" потребує httpx[http2]
+
+
+def make_bot_request(pool_size: int) -> HTTPXRequest:
+    """Створює транспорт Bot API з пулом на pool_size постійних з'єднань."""
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=BOT_API_CONNECT_TIMEOUT,
+        read_timeout=BOT_API_READ_TIMEOUT,
+        write_timeout=BOT_API_WRITE_TIMEOUT,
+        media_write_timeout=BOT_API_MEDIA_WRITE_TIMEOUT,
+        pool_timeout=BOT_API_POOL_TIMEOUT,
+        http_version=BOT_API_HTTP_VERSION,
+        # PTB не дає задати keep-alive напряму, тому ліміти передаються в httpx
+        httpx_kwargs={
+            "limits": httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=BOT_API_KEEPALIVE_SECONDS,
+            ),
+        },
+    )
+
+
+# Паралельна обробка оновлень різних користувачів
+UPDATE_CONCURRENCY = config.get("UPDATE_CONCURRENCY", 32)  # 1 — послідовна обробка
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обробляє оновлення різних користувачів паралельно, одного — по черзі.
+
+    Завдання для оновлень створюються в порядку надходження, а asyncio.Lock
+    віддає замок очікувачам у порядку черги, тому переходи ConversationHandler
+    одного користувача відбуваються в тому ж порядку, що й без паралельності.
+    Слот паралельності береться вже після замка користувача, тож оновлення,
+    що чекають своєї черги, не заважають іншим користувачам.
+    """
+
+    # Базовий клас бере свій семафор ще до do_process_update, тому він лише
+    # захищає від нескінченного накопичення завдань, а не обмежує паралельність
+    PENDING_LIMIT = 100000
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(self.PENDING_LIMIT)
+        self.concurrency = max_concurrent_updates
+        self.running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self.locks: Dict[Any, list] = {}  # ключ -> [замок, кількість оновлень]
+
+    @staticmethod
+    def key_for(update) -> Any:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        return update.effective_chat.id if update.effective_chat else None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.key_for(update)
+        entry = self.locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self.running:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self.locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def build_application(with_updater=True, request=None, concurrency=None):
+    """Створює Application з усіма обробниками та періодичними завданнями."""
+    builder = Application.builder().token(TOKEN)
+    if not with_updater:
+        # Воркер шарду отримує оновлення від фронтенду, а не з getUpdates
+        builder = builder.updater(None)
+    else:
+        # Довге опитування не займає з'єднань, потрібних для надсилання
+        builder = builder.get_updates_request(
+            make_bot_request(BOT_API_POLLING_POOL_SIZE)
+        )
+    if request is None:
+        request = make_bot_request(BOT_API_POOL_SIZE)
+    # Власний транспорт використовується також при відтворенні записів
+    builder = builder.request(request)
+    concurrency = UPDATE_CONCURRENCY if concurrency is None else concurrency
+    if concurrency > 1:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(concurrency))
+    application = builder.build()
+
+    # Головний ConversationHandler для основної логіки бота
+    conv_handler = ConversationHandler(
+        entry_points=[
+            CommandHandler("start", start),
+            CommandHandler("report", report_command),
+        ],
+        states={
+            CHOOSING_ACTION: [
+                MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handle_webapp_data),
+                CommandHandler("report", report_command),
+            ],
+            AWAITING_REPORT: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_report),
+                CommandHandler("start", start),
+            ],
+            AWAITING_PHOTOS: [
+                MessageHandler(
+                    filters.PHOTO | (filters.TEXT & ~filters.COMMAND), handle_photo
+                ),
+                CommandHandler("start", start),
+            ],
+        },
+        fallbacks=[
+            CommandHandler("start", start),
+            CommandHandler("report", report_command),
+        ],
+        per_message=False,
+    )
+
+    # 1. Middleware handlers
+    if UPDATE_RECORDER:
+        application.add_handler(TypeHandler(Update, record_update), group=-2)
+    application.add_handler(TypeHandler(Update, blacklist_middleware), group=-1)
+    application.add_handler(conv_handler)
+
+    # 2. Усі інші команди обробляє один диспетчер за реєстром COMMANDS
+    application.add_handler(
+        MessageHandler(
+            filters.COMMAND | (filters.Document.ALL & filters.CaptionRegex(r"^/")),
+            dispatch_command,
+        )
+    )
+    application.add_handler(
+        CallbackQueryHandler(handle_page_navigation, pattern=r"^page:")
+    )
+    application.add_handler(CallbackQueryHandler(handle_claim, pattern=r"^claim:"))
+
+    # 3. Налаштування періодичних завдань бота
+    application.job_queue.run_once(
+        callback=lambda context: LOOP_WATCHDOG.start(), when=0
+    )
+    application.job_queue.run_repeating(
+        callback=lambda context: reload_config_if_changed(),
+        interval=CONFIG_WATCH_SECONDS,
+        first=CONFIG_WATCH_SECONDS,
+    )
+    application.job_queue.run_repeating(
+        callback=lambda context: sweep_abandoned_drafts(context.application),
+        interval=DRAFT_SWEEP_SECONDS,
+        first=DRAFT_SWEEP_SECONDS,
+    )
+    application.job_queue.run_repeating(
+        callback=lambda context: prune_throttle(),
+        interval=THROTTLE_PRUNE_SECONDS,
+        first=THROTTLE_PRUNE_SECONDS,
+    )
+    application.job_queue.run_repeating(
+        callback=lambda context: prune_contacts(),
+        interval=CONTACT_PRUNE_SECONDS,
+        first=CONTACT_PRUNE_SECONDS,
+    )
+    application.job_queue.run_repeating(
+        callback=lambda context: OUTBOX.flush(context.bot),
+        interval=5,
+        first=5,
+    )
+    application.job_queue.run_repeating(
+        callback=lambda context: asyncio.to_thread(OUTBOX.purge),
+        interval=86400,
+        first=3600,
+    )
+
+    # Завдання зі спільними для всіх шардів наслідками виконує лише основний процес
+    if IS_PRIMARY:
+        application.job_queue.run_repeating(
+            callback=lambda context: check_bans(context.bot),
+            interval=3600,  # кожну годину
+            first=10,  # перший запуск через 10 секунд після старту
+        )
+        application.job_queue.run_repeating(
+            callback=lambda context: process_publish_queue(context.bot),
+            interval=30,
+            first=30,
+        )
+        application.job_queue.run_repeating(
+            callback=lambda context: check_unclaimed_submissions(context.bot),
+            interval=ASSIGNMENT_CHECK_SECONDS,
+            first=ASSIGNMENT_CHECK_SECONDS,
+        )
+        application.job_queue.run_repeating(
+            callback=lambda context: expire_placements(context.bot),
+            interval=PLACEMENT_TICK_SECONDS,
+            first=PLACEMENT_TICK_SECONDS,
+        )
+        if SHARED_STORE:
+            application.job_queue.run_repeating(
+                callback=lambda context: asyncio.to_thread(prune_fingerprints),
+                interval=3600,
+                first=3600,
+            )
+
+    return application
+
+
+def start_scheduler(application):
+    """Запускає планувальник щоденних завдань."""
+    scheduler = BackgroundScheduler()
+
+    # Щоденні завдання
+    daily_jobs = [
+        # Відправка статистики о 23:59
+        {
+            "func": lambda: asyncio.run(send_daily_stats(application)),
+            "trigger": "cron",
+            "hour": 23,
+            "minute": 59,
+        },
+        # Скидання статистики о 00:00
+        {"func": reset_daily_stats, "trigger": "cron", "hour": 0, "minute": 0},
+        # Скидання лічильників користувачів
+        {"func": reset_all_counters, "trigger": "cron", "hour": 0, "minute": 0},
+    ]
+
+    for job in daily_jobs:
+        scheduler.add_job(
+            job["func"],
+            job["trigger"],
+            hour=job["hour"],
+            minute=job["minute"],
+            timezone="Europe/Kyiv",
+        )
+
+    # Періодична перевірка статусу
+    scheduler.add_job(check_bot_status, "interval", minutes=30)
+    scheduler.add_listener(handle_scheduler_error, EVENT_JOB_ERROR)
+
+    scheduler.start()
+    logging.info("Планувальник запущено успішно.")
+
+
+def shard_for_update(data: Dict[str, Any]) -> int:
+    """Шард для оновлення: персонал завжди на основному шарді, решта — за user_id.
+
+    Команди модерації, публікація та платежі працюють з файлами основного
+    шарду, тому всі оновлення адміністраторів і модераторів ідуть туди. Склад
+    персоналу фронтенд бере з тієї ж конфігурації, що й шарди, і так само
+    перезавантажує її при зміні файлу.
+    """
+    for key in ("message", "edited_message", "callback_query", "inline_query"):
+        sender = (data.get(key) or {}).get("from")
+        if sender:
+            user_id = sender["id"]
+            if user_id in ADMIN_IDS or user_id in MODERATOR_IDS:
+                return 0
+            return user_id % SHARD_COUNT
+    return 0
+
+
+def run_shard_worker(shard: int, queue):
+    """Процес-воркер: обробляє оновлення свого шарду в окремому Application."""
+    application = build_application(with_updater=False)
+    if shard == 0:
+        start_scheduler(application)
+
+    async def consume():
+        async with application:
+            await application.start()
+            logging.info("Шард %d запущено (pid %d).", shard, os.getpid())
+            await feed_shard_updates(application, queue)
+            await application.stop()
+
+    asyncio.run(consume())
+
+
+async def feed_shard_updates(application, queue) -> int:
+    """Передає оновлення з черги фронтенду в Application до None; повертає їх кількість."""
+    loop = asyncio.get_running_loop()
+    fed = 0
+    while True:
+        data = await loop.run_in_executor(None, queue.get)
+        if data is None:
+            return fed
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        fed += 1
+
+
+def run_sharded():
+    """Фронтенд: отримує оновлення через getUpdates і розподіляє їх між шардами.
+
+    Кожен користувач завжди потрапляє на той самий шард, а черга шарду FIFO,
+    тому порядок оновлень одного користувача зберігається.
+    """
+    context = multiprocessing.get_context("spawn")
+    queues, workers = [], []
+    for shard in range(SHARD_COUNT):
+        queue = context.Queue()
+        # Номер шарду воркер читає з оточення ще під час імпорту модуля
+        os.environ["BOT_SHARD"] = str(shard)
+        worker = context.Process(
+            target=run_shard_worker, args=(shard, queue), daemon=True
+        )
+        worker.start()
+        queues.append(queue)
+        workers.append(worker)
+    os.environ.pop("BOT_SHARD", None)
+
+    async def watch_config():
+        while True:
+            await asyncio.sleep(CONFIG_WATCH_SECONDS)
+            await reload_config_if_changed()
+
+    async def poll():
+        offset = None
+        # Без перезавантаження новий модератор потрапляв би не на основний шард;
+        # посилання на задачу тримає її живою, поки працює цикл
+        watcher = asyncio.create_task(watch_config())  # noqa: F841
+        bot = Bot(
+            TOKEN, get_updates_request=make_bot_request(BOT_API_POLLING_POOL_SIZE)
+        )
+        async with bot:
+            while True:
+                try:
+                    updates = await bot.get_updates(
+                        offset=offset, timeout=30, allowed_updates=Update.ALL_TYPES
+                    )
+                except Exception as e:
+                    logging.error("Помилка отримання оновлень: %s", e)
+                    await asyncio.sleep(5)
+                    continue
+                for update in updates:
+                    offset = update.update_id + 1
+                    data = update.to_dict()
+                    if UPDATE_RECORDER:
+                        UPDATE_RECORDER.record(data)
+                    queues[shard_for_update(data)].put(data)
+
+    try:
+        asyncio.run(poll())
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for worker in workers:
+            worker.join(timeout=10)
+
+
+def _benchmark_shard_worker(shard: int, queue, results, latency: float):
+    """Воркер бенчмарку: той самий Application і спільне сховище, що й у бойовому
+    шарді, лише Bot API підроблений."""
+    application = build_application(with_updater=False, request=ReplayRequest(latency))
+
+    async def run():
+        processed, fed = 0, None
+        finished = asyncio.Event()
+
+        async def mark_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            nonlocal processed
+            processed += 1
+            if processed == fed:
+                finished.set()
+
+        application.add_handler(TypeHandler(Update, mark_done), group=100)
+        async with application:
+            await application.start()
+            results.put("ready")
+            fed = await feed_shard_updates(application, queue)
+            if processed < fed:
+                await asyncio.wait_for(finished.wait(), timeout=600)
+            await application.stop()
+        return processed
+
+    results.put(asyncio.run(run()))
+
+
+def benchmark_shards(users="2000", max_workers=None, heavy_every="5", api_latency_ms="0"):
+    """Вимірює пропускну здатність режиму шардів на 1..N процесах-воркерах.
+
+    Оновлення (змішане навантаження з bench_updates) розподіляються фронтендом
+    за shard_for_update і проходять повну обробку: обмеження частоти, чорний
+    список, ConversationHandler, ліміти та заявки в спільному сховищі, outbox.
+    Час рахується від першого оновлення до обробки останнього всіма шардами.
+    """
+    global SHARD_COUNT
+    max_workers = int(max_workers or os.cpu_count() or 1)
+    latency = float(api_latency_ms) / 1000
+    updates = [data for _, data in bench_mixed_updates(int(users), int(heavy_every))]
+    context = multiprocessing.get_context("spawn")
+    workdir = tempfile.mkdtemp(prefix="bench-shards-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        workers_count, baseline = 1, None
+        while workers_count <= max_workers:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            # Навіть один воркер працює зі спільним сховищем, інакше порівняння нечесне
+            with open(CONFIG_FILE, "w", encoding="utf-8") as file:
+                json.dump(dict(config, SHARDS=max(workers_count, 2)), file)
+            SHARD_COUNT = workers_count
+
+            queues, processes, results = [], [], context.Queue()
+            for shard in range(workers_count):
+                queue = context.Queue()
+                os.environ["BOT_SHARD"] = str(shard)
+                process = context.Process(
+                    target=_benchmark_shard_worker, args=(shard, queue, results, latency)
+                )
+                process.start()
+                queues.append(queue)
+                processes.append(process)
+            os.environ.pop("BOT_SHARD", None)
+            for _ in processes:
+                results.get()  # чекаємо, поки всі воркери запустять Application
+
+            started = time.perf_counter()
+            for data in updates:
+                queues[shard_for_update(data)].put(data)
+            for queue in queues:
+                queue.put(None)
+            processed = sum(results.get() for _ in processes)
+            elapsed = time.perf_counter() - started
+            for process in processes:
+                process.join()
+
+            throughput = processed / elapsed
+            baseline = baseline or throughput
+            print(
+                f"Шардів: {workers_count:2d}  {throughput:7.0f} оновлень/с  "
+                f"прискорення x{throughput / baseline:.2f}"
+            )
+            workers_count *= 2
+    finally:
+        SHARD_COUNT = config.get("SHARDS", 1)
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Відтворення записаних оновлень на підробленому Bot API
+REPLAY_VOLATILE_RE = re.compile(r"\b[0-9a-f]{12}\b|\d+")
+REPLAY_REPORT_FILE = "replay_report.json"
+
+
+class ReplayRequest(BaseRequest):
+    """Транспорт Bot API без мережі: записує виклики та повертає правдоподібні відповіді."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = []
+        self.message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def fake_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.message_id += 1
+        chat_id = params.get("chat_id")
+        if not isinstance(chat_id, int):
+            chat_id = -1000000000000  # канал, заданий через @username
+        return {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+            "text": params.get("text", ""),
+        }
+
+    def fake_result(self, endpoint: str, params: Dict[str, Any]):
+        if endpoint == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Replay", "username": "replay_bot"}
+        if endpoint == "getFile":
+            return {"file_id": params.get("file_id"), "file_unique_id": "replay", "file_path": "replay"}
+        if endpoint == "sendMediaGroup":
+            return [self.fake_message(params) for _ in params.get("media", [])]
+        if endpoint.startswith("send") or endpoint.startswith("edit"):
+            return self.fake_message(params)
+        if endpoint == "copyMessage":
+            return {"message_id": self.fake_message(params)["message_id"]}
+        return True
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if "/file/bot" in url:
+            return 200, b""
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        if endpoint != "getMe":
+            text = params.get("text") or params.get("caption") or ""
+            self.calls.append(
+                [endpoint, params.get("chat_id"), REPLAY_VOLATILE_RE.sub("#", text)]
+            )
+        payload = {"ok": True, "result": self.fake_result(endpoint, params)}
+        return 200, json.dumps(payload).encode()
+
+
+def load_recording(path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    header = records.pop(0)["header"] if records and "header" in records[0] else {}
+    return header, records
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _replay_worker(path: str, speed, latency: float):
+    """Процес відтворення: працює в тимчасовому каталозі з порожнім станом бота."""
+    header, records = load_recording(path)
+    if header.get("admin_ids"):
+        apply_config(
+            dict(
+                config,
+                ADMIN_IDS=header["admin_ids"],
+                MODERATOR_IDS=header.get("moderator_ids", []),
+            )
+        )
+    request = ReplayRequest(latency)
+    application = build_application(with_updater=False, request=request)
+
+    async def replay():
+        loop = asyncio.get_running_loop()
+        latencies, calls = [], {}
+        async with application:
+            first_at = records[0]["t"] if records else 0
+            started = loop.time()
+            for record in records:
+                due = loop.time() if speed is None else started + (record["t"] - first_at) / speed
+                if due > loop.time():
+                    await asyncio.sleep(due - loop.time())
+                update = Update.de_json(record["update"], application.bot)
+                request.calls = calls.setdefault(str(update.update_id), [])
+                await application.process_update(update)
+                await OUTBOX.flush(application.bot)
+                # Якщо відтворення відстає від запису, очікування в черзі теж рахується
+                latencies.append(loop.time() - due)
+            elapsed = loop.time() - started
+        return {"updates": len(records), "elapsed": elapsed, "latencies": latencies, "calls": calls}
+
+    report = asyncio.run(replay())
+    with open(REPLAY_REPORT_FILE, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False)
+
+
+def replay_updates(path, speed="max", baseline=None, api_latency_ms="0"):
+    """Відтворює запис оновлень на підробленому Bot API і друкує звіт.
+
+    speed — "1", "10" або "max". Відтворення йде в окремому процесі в
+    тимчасовому каталозі з копією config.json, тому робочі файли не змінюються.
+    Якщо файл baseline існує, вихідні виклики порівнюються з ним, інакше поточний
+    результат зберігається туди як еталон.
+    """
+    path = os.path.abspath(path)
+    baseline = os.path.abspath(baseline) if baseline else None
+    speed = None if speed == "max" else float(speed)
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    shutil.copy(CONFIG_FILE, workdir)
+
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        # Дочірній процес імпортує модуль заново, уже з порожнім станом у workdir
+        context = multiprocessing.get_context("spawn")
+        process = context.Process(
+            target=_replay_worker, args=(path, speed, float(api_latency_ms) / 1000)
+        )
+        process.start()
+        process.join()
+        with open(REPLAY_REPORT_FILE, encoding="utf-8") as file:
+            report = json.load(file)
+    except FileNotFoundError:
+        print(f"Відтворення завершилось з помилкою (код {process.exitcode}).")
+        return
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = sorted(report["latencies"])
+    elapsed = report["elapsed"] or 1e-9
+    print(
+        f"Оновлень: {report['updates']} за {elapsed:.2f} с "
+        f"({report['updates'] / elapsed:.0f} оновлень/с)"
+    )
+    print(
+        "Затримка, мс: "
+        + ", ".join(
+            f"p{int(q * 100)} {percentile(latencies, q) * 1000:.1f}"
+            for q in (0.5, 0.9, 0.99)
+        )
+        + f", max {(latencies[-1] if latencies else 0) * 1000:.1f}"
+    )
+    calls = report["calls"]
+    print(f"Вихідних викликів: {sum(len(c) for c in calls.values())}")
+
+    if not baseline:
+        return
+    if not os.path.exists(baseline):
+        with open(baseline, "w", encoding="utf-8") as file:
+            json.dump(calls, file, ensure_ascii=False, indent=1)
+        print(f"Еталон збережено: {baseline}")
+        return
+    with open(baseline, encoding="utf-8") as file:
+        expected = json.load(file)
+    diverged = [
+        update_id
+        for update_id in sorted(set(expected) | set(calls), key=int)
+        if expected.get(update_id) != calls.get(update_id)
+    ]
+    print(f"Розбіжностей з еталоном: {len(diverged)} з {len(expected)} оновлень")
+    for update_id in diverged[:10]:
+        print(f"  оновлення {update_id}:")
+        print(f"    очікувалось: {expected.get(update_id)}")
+        print(f"    отримано:    {calls.get(update_id)}")
+
+
+# Бенчмарк розсилок на локальному підробленому Bot API
+class FakeBotApiServer:
+    """Мінімальний HTTP/1.1-сервер з відповідями Bot API і штучною затримкою."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.server = None
+        self.fake = ReplayRequest()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/bot"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *lines = head.decode("latin-1").split("\r\n")
+                headers = dict(
+                    line.lower().split(": ", 1) for line in lines if ": " in line
+                )
+                await reader.readexactly(int(headers.get("content-length", 0)))
+                await asyncio.sleep(self.latency)
+                endpoint = request_line.split()[1].rsplit("/", 1)[-1]
+                result = self.fake.fake_result(endpoint, {"chat_id": 1})
+                body = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def benchmark_fanout(messages="200", latency_ms="50", pool_sizes="1,4,16,32,64"):
+    """Вимірює, як розмір пулу з'єднань впливає на тривалість розсилки.
+
+    Усі повідомлення відправляються одночасно, як при масовому сповіщенні;
+    сервер відповідає із затримкою latency_ms, імітуючи мережу до Telegram.
+    """
+    messages = int(messages)
+    latency = float(latency_ms) / 1000
+
+    async def run(pool_size: int):
+        server = FakeBotApiServer(latency)
+        base_url = await server.start()
+        bot = Bot(TOKEN, base_url=base_url, request=make_bot_request(pool_size))
+        loop = asyncio.get_running_loop()
+        latencies = []
+
+        async def send(chat_id):
+            started = loop.time()
+            await bot.send_message(chat_id=chat_id, text="Бенчмарк розсилки")
+            latencies.append(loop.time() - started)
+
+        try:
+            async with bot:
+                started = loop.time()
+                await asyncio.gather(*(send(chat_id) for chat_id in range(messages)))
+                elapsed = loop.time() - started
+        finally:
+            await server.stop()
+        latencies.sort()
+        print(
+            f"Пул {pool_size:3d}: {elapsed:6.2f} с, {messages / elapsed:6.0f} повід./с, "
+            f"p50 {percentile(latencies, 0.5) * 1000:6.0f} мс, "
+            f"p95 {percentile(latencies, 0.95) * 1000:6.0f} мс, "
+            f"з'єднань {server.connections}"
+        )
+
+    for pool_size in (int(size) for size in pool_sizes.split(",")):
+        asyncio.run(run(pool_size))
+
+
+BENCH_UPDATES_REPORT_FILE = "bench_updates_report.json"
+BENCH_FLOOD_USER_ID = 999
+
+
+def bench_message(update_id: int, user_id: int, **fields) -> Dict[str, Any]:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+        **fields,
+    }
+    return {"update_id": update_id, "message": message}
+
+
+def bench_mixed_updates(users: int, heavy_every: int):
+    """Змішане навантаження: кожен heavy_every-й користувач подає заявку, решта — /start."""
+    start = {"text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}
+    form = {
+        "formType": "selling",
+        "itemName": "Велосипед",
+        "sellerDescription": "Стан добрий, самовивіз",
+        "sellerContact": "+380671234567",
+        "sellingCategory": "Спорт",
+    }
+    flows = []
+    for user_id in range(1000, 1000 + users):
+        if (user_id - 1000) % heavy_every == 0:
+            flows.append(
+                (
+                    "heavy",
+                    user_id,
+                    [
+                        start,
+                        {"web_app_data": {"data": json.dumps(form), "button_text": "Продаж"}},
+                        {"text": "Завершити"},
+                    ],
+                )
+            )
+        else:
+            flows.append(("light", user_id, [start, start]))
+    # Оновлення користувачів перемежовуються, як у реальному потоці getUpdates
+    updates, update_id = [], 0
+    for step in range(3):
+        for kind, user_id, messages in flows:
+            if step < len(messages):
+                update_id += 1
+                updates.append((kind, bench_message(update_id, user_id, **messages[step])))
+    return updates
+
+
+def bench_flood_updates(users: int, flood: int):
+    """Флудер надсилає flood команд /start одразу, після нього легкі користувачі — по одній."""
+    start = {"text": "/start", "entities": [{"type": "bot_command", "offset": 0, "length": 6}]}
+    updates = [
+        ("flood", bench_message(update_id, BENCH_FLOOD_USER_ID, **start))
+        for update_id in range(1, flood + 1)
+    ]
+    for user_id in range(1000, 1000 + users):
+        updates.append(("light", bench_message(len(updates) + 1, user_id, **start)))
+    return updates
+
+
+def _bench_updates_worker(
+    concurrency: int, users: int, heavy_every: int, latency: float, flood: int = 0
+):
+    """Процес бенчмарку: обробляє пачку оновлень у тимчасовому каталозі."""
+    application = build_application(
+        with_updater=False, request=ReplayRequest(latency), concurrency=concurrency
+    )
+    if flood:
+        updates = bench_flood_updates(users, flood)
+    else:
+        updates = bench_mixed_updates(users, heavy_every)
+    kinds = {data["update_id"]: kind for kind, data in updates}
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+        latencies = {"light": [], "heavy": [], "flood": []}
+
+        async def mark_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            latencies[kinds[update.update_id]].append(loop.time() - started)
+            if sum(map(len, latencies.values())) == len(updates):
+                finished.set()
+
+        application.add_handler(TypeHandler(Update, mark_done), group=100)
+        async with application:
+            await application.start()
+            started = loop.time()
+            for _, data in updates:
+                await application.update_queue.put(Update.de_json(data, application.bot))
+            await asyncio.wait_for(finished.wait(), timeout=600)
+            elapsed = loop.time() - started
+            await application.stop()
+        return {"updates": len(updates), "elapsed": elapsed, "latencies": latencies}
+
+    report = asyncio.run(run())
+    with open(BENCH_UPDATES_REPORT_FILE, "w", encoding="utf-8") as file:
+        json.dump(report, file)
+
+
+def benchmark_updates(
+    users="200", heavy_every="5", api_latency_ms="50", concurrency=None, flood="200"
+):
+    """Порівнює послідовну і паралельну обробку оновлень при змішаному навантаженні.
+
+    Кожен heavy_every-й користувач проходить повну подачу заявки з розсилкою
+    модераторам, решта лише надсилають /start. Другий сценарій — блокування
+    черги: один флудер (модератор, тож обмеження частоти його не зупиняє)
+    надсилає flood команд, а за ним по одній — легкі користувачі. Усі
+    оновлення надходять одночасно; затримка рахується від надходження до
+    завершення обробки.
+    """
+    concurrency = int(concurrency or max(UPDATE_CONCURRENCY, 2))
+    latency = float(api_latency_ms) / 1000
+    workdir = tempfile.mkdtemp(prefix="bench-updates-")
+    config_path = os.path.join(workdir, os.path.basename(CONFIG_FILE))
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for scenario in (0, int(flood)):
+            print("Змішане навантаження:" if not scenario else f"Флудер ({scenario}) + легкі:")
+            for mode in (1, concurrency):
+                for name in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, name))
+                with open(config_path, "w", encoding="utf-8") as file:
+                    moderators = list(MODERATOR_IDS) + [BENCH_FLOOD_USER_ID] * bool(scenario)
+                    json.dump(dict(config, MODERATOR_IDS=moderators), file)
+                # Кожен режим стартує в новому процесі з порожнім станом бота
+                process = multiprocessing.get_context("spawn").Process(
+                    target=_bench_updates_worker,
+                    args=(mode, int(users), int(heavy_every), latency, scenario),
+                )
+                process.start()
+                process.join()
+                with open(BENCH_UPDATES_REPORT_FILE, encoding="utf-8") as file:
+                    report = json.load(file)
+                light = sorted(report["latencies"]["light"])
+                other_name, other_kind = ("флудер", "flood") if scenario else ("заявки", "heavy")
+                other = sorted(report["latencies"][other_kind])
+                print(
+                    f"  {'Послідовно' if mode == 1 else f'Паралельно ({mode})':16s} "
+                    f"{report['elapsed']:6.2f} с, "
+                    f"{report['updates'] / report['elapsed']:6.0f} оновлень/с, "
+                    f"/start p50 {percentile(light, 0.5) * 1000:6.0f} мс "
+                    f"p95 {percentile(light, 0.95) * 1000:6.0f} мс, "
+                    f"{other_name} p95 {percentile(other, 0.95) * 1000:6.0f} мс"
+                )
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    global UPDATE_RECORDER
+    check_time()
+    # Перезавантаження відкидає невалідну конфігурацію, а старт з нею не має сенсу
+    validate_config(config)
+
+    if RECORD_UPDATES_DIR:
+        UPDATE_RECORDER = UpdateRecorder(RECORD_UPDATES_DIR)
+
+    # Запуск Flask сервера у окремому потоці
+    Thread(target=run_flask).start()
+
+    if SHARD_COUNT > 1:
+        logging.info("Запуск у режимі шардів: %d процесів.", SHARD_COUNT)
+        run_sharded()
+        return
+
+    # Ініціалізація бота
+    application = build_application()
+    nest_asyncio.apply()
+    start_scheduler(application)
+
+    # Запуск бота
+    application.run_polling()
+
+
+# Допоміжні утиліти командного рядка: python main.py <назва> [аргументи]
+CLI_TOOLS = {
+    "eval_duplicates": evaluate_duplicate_detector,
+    "bench_dispatch": benchmark_dispatch,
+    "bench_shards": benchmark_shards,
+    "replay_updates": replay_updates,
+    "bench_fanout": benchmark_fanout,
+    "bench_updates": benchmark_updates,
+    "bench_blocklist": benchmark_blocklist,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_TOOLS:
+        CLI_TOOLS[sys.argv[1]](*sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,30 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "main (3).py")
+TEST_CONFIG = {
+    "TOKEN": "123456:TEST",
+    "ADMIN_IDS": [1],
+    "MODERATOR_IDS": [2],
+    "PAYMENT_CARD": "0000",
+    "RULES_LINK": "https://example.com/rules",
+    "BASE_URL": "https://example.com/forms/",
+}
+
+
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory):
+    """Модуль бота, імпортований у тимчасовому каталозі з тестовим config.json."""
+    workdir = tmp_path_factory.mktemp("bot")
+    with open(workdir / "config.json", "w", encoding="utf-8") as file:
+        json.dump(TEST_CONFIG, file)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    spec = importlib.util.spec_from_file_location("bot_main", BOT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    os.chdir(previous_dir)
@@ -0,0 +1,45 @@
+import pytest
+
+
+@pytest.mark.parametrize("mode", ["round_robin", "least_loaded"])
+def test_choose_moderator_without_moderators(bot, monkeypatch, mode):
+    monkeypatch.setattr(bot, "MODERATOR_IDS", frozenset())
+    monkeypatch.setattr(bot, "MODERATION_ASSIGNMENT", mode)
+    assert bot.choose_moderator() is None
+
+
+def test_assignment_without_moderators_is_rejected(bot):
+    with pytest.raises(ValueError):
+        bot.validate_config(
+            dict(bot.config, MODERATOR_IDS=[], MODERATION_ASSIGNMENT="round_robin")
+        )
+
+
+def test_ticket_without_admins_stays_unassigned(bot, monkeypatch, tmp_path):
+    monkeypatch.setattr(bot, "ADMIN_IDS", frozenset())
+    monkeypatch.setattr(bot, "REPORTS_CHAT_ID", None)
+    store = bot.TicketStore(str(tmp_path / "tickets.sqlite3"))
+    ticket, created = store.open_ticket(7, "Тест", "Не працює форма")
+    assert created
+    assert ticket["assigned_to"] is None
+
+
+def test_reassign_pass_reads_load_once_and_balances(bot, monkeypatch):
+    monkeypatch.setattr(bot, "MODERATOR_IDS", frozenset({2, 3, 4}))
+    monkeypatch.setattr(bot, "MODERATION_ASSIGNMENT", "least_loaded")
+    stale = (bot.datetime.now() - bot.timedelta(hours=1)).isoformat()
+    submissions = [
+        {"id": f"s{index}", "assigned_to": 2, "assigned_at": stale} for index in range(6)
+    ]
+    monkeypatch.setattr(bot, "PENDING_SUBMISSIONS", {10: submissions})
+    monkeypatch.setattr(bot, "save_pending", lambda pending: None)
+    monkeypatch.setattr(bot, "enqueue_submission", lambda *args, **kwargs: None)
+    calls = []
+    original_load = bot.moderator_load
+    monkeypatch.setattr(bot, "moderator_load", lambda: calls.append("load") or original_load())
+    monkeypatch.setattr(bot, "load_away_moderators", lambda: calls.append("away") or set())
+
+    assert bot.reassign_unclaimed() == 6
+    assert sorted(calls) == ["away", "load"]
+    owners = [submission["assigned_to"] for submission in submissions]
+    assert owners.count(3) == owners.count(4) == 3
@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.fixture
+def automaton(bot):
+    return bot.KeywordAutomaton(["top", "bet", "hot", "he", "продам зброю", "casino"])
+
+
+def test_ordinary_ukrainian_text_is_not_flagged(automaton):
+    payload = {
+        "formType": "selling",
+        "itemName": "Торт на замовлення",
+        "sellerDescription": "Ветеринарні послуги, нотатник, не дорого. Нове ТОРТ",
+        "sellerContact": "+380971112233",
+    }
+    assert automaton.scan_payload(payload) == []
+
+
+def test_latin_terms_match_latin_text(automaton):
+    matches = automaton.scan_payload({"itemName": "Best TOP offer, hot deal"})
+    assert [match[3] for match in matches] == ["top", "hot"]
+
+
+def test_mixed_script_words_are_folded(automaton):
+    # "прoдaм" і "зброю" з латинськими o, a; "саsino" з кириличними с, а
+    text = "Прoдaм зброю, саsino"
+    matches = automaton.scan_payload({"sellerDescription": text})
+    assert [(text[start:end], term) for _, start, end, term in matches] == [
+        ("Прoдaм зброю", "продам зброю"),
+        ("саsino", "casino"),
+    ]
+
+
+def test_match_must_start_a_word(automaton):
+    assert automaton.scan("ushers") == []
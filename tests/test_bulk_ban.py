@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+
+class Message:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def test_parse_user_ids_accepts_file_separators(bot):
+    assert bot.parse_user_ids("1,2;3\n4 ,5") == [1, 2, 3, 4, 5]
+
+
+def test_ban_summary_is_sent_before_notifications(bot, monkeypatch):
+    monkeypatch.setattr(bot, "update_blacklist", lambda entries: None)
+    delivered = []
+
+    async def notify_user(_, user_id, text):
+        delivered.append(user_id)
+        return user_id != 30
+
+    monkeypatch.setattr(bot, "notify_user", notify_user)
+    monkeypatch.setattr(bot, "NOTIFY_RATE_PER_SECOND", 1000)
+    message = Message()
+    tasks = []
+    update = SimpleNamespace(message=message, effective_user=SimpleNamespace(id=1))
+    context = SimpleNamespace(
+        args=["10;20;30", "3", "спам"],
+        bot=None,
+        application=SimpleNamespace(create_task=tasks.append),
+    )
+
+    asyncio.run(bot.ban_user(update, context))
+    assert len(message.replies) == 1 and "3 користувачів" in message.replies[0]
+    assert not delivered
+
+    asyncio.run(tasks[0])
+    assert delivered == [10, 20, 30]
+    assert "2 з 3" in message.replies[1]
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+import pytest
+
+
+def test_reload_applies_duplicate_detector_settings(bot):
+    previous = dict(bot.config)
+    try:
+        bot.apply_config(dict(previous, DUPLICATE_WINDOW_HOURS=1, DUPLICATE_MAX_DISTANCE=3))
+        assert bot.DUPLICATE_DETECTOR.window == timedelta(hours=1)
+        assert bot.DUPLICATE_DETECTOR.max_distance == 3
+    finally:
+        bot.apply_config(previous)
+
+
+def test_invalid_duplicate_window_is_rejected(bot):
+    with pytest.raises(ValueError):
+        bot.validate_config(dict(bot.config, DUPLICATE_WINDOW_HOURS="72"))
+
+
+def test_reload_applies_runtime_limits_and_urls(bot):
+    previous = dict(bot.config)
+    try:
+        bot.apply_config(
+            dict(
+                previous,
+                WEBAPP_PUBLIC_URL="https://forms.example.com/forms/",
+                CONTACT_POST_LIMIT=2,
+                THROTTLE_BURST=3,
+                REPORTS_CHAT_ID=-100,
+                ASSIGNMENT_CLAIM_MINUTES=5,
+            )
+        )
+        assert bot.WEBAPP_PUBLIC_URL == "https://forms.example.com/forms/"
+        assert all(
+            url.startswith("https://forms.example.com/") for url in bot.FORMS_URL.values()
+        )
+        assert bot.CONTACT_POST_LIMIT == 2
+        assert bot.THROTTLE.burst == 3
+        assert bot.REPORTS_CHAT_ID == -100
+        assert bot.ASSIGNMENT_CLAIM_MINUTES == 5
+    finally:
+        bot.apply_config(previous)
+    assert bot.WEBAPP_PUBLIC_URL is None
+    assert bot.THROTTLE.burst == 15
+
+
+def test_reload_warns_about_restart_only_keys(bot, caplog):
+    previous = dict(bot.config)
+    try:
+        bot.apply_config(dict(previous, PUBLISH_CHANNEL="@other", UPDATE_CONCURRENCY=4))
+        assert "PUBLISH_CHANNEL, UPDATE_CONCURRENCY" in caplog.text
+    finally:
+        bot.apply_config(previous)
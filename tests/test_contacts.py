@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "https://t.me/joinchat/AAAAAEk3xyzQwerty",
+        "t.me/+AbCdEfGhIjK12",
+        "https://t.me/c/1234567890/42",
+        "t.me/addstickers/CutePack",
+        "https://t.me/share/url?url=https://example.com",
+    ],
+)
+def test_service_links_are_not_contacts(bot, text):
+    assert bot.normalize_contacts(text) == []
+
+
+def test_username_links_and_handles(bot):
+    text = "Пишіть @Seller_One або https://t.me/seller_two/15, тел. 097 111 22 33"
+    assert bot.normalize_contacts(text) == ["+380971112233", "@seller_one", "@seller_two"]
+
+
+@pytest.mark.parametrize("code", [380, "+380", "", "38000"])
+def test_invalid_country_code_is_rejected(bot, code):
+    with pytest.raises(ValueError):
+        bot.validate_config(dict(bot.config, CONTACT_COUNTRY_CODE=code))
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def reply_text(self, text, **kwargs):
+        self.calls.append(("reply", text))
+
+    async def answer(self, text=None, **kwargs):
+        self.calls.append(("answer", text))
+
+
+@pytest.fixture
+def banned_user(bot, monkeypatch):
+    user_id = 4242
+    entry = bot.BlacklistEntry(user_id, datetime.now() + timedelta(days=1), "спам")
+    monkeypatch.setitem(bot.BLACKLIST, user_id, entry)
+    return SimpleNamespace(id=user_id)
+
+
+def run_middleware(bot, update):
+    with pytest.raises(bot.ApplicationHandlerStop):
+        asyncio.run(bot.blacklist_middleware(update, SimpleNamespace()))
+
+
+def test_banned_edit_is_answered_via_effective_message(bot, banned_user):
+    message = Recorder()
+    update = SimpleNamespace(
+        effective_user=banned_user, message=None, callback_query=None, effective_message=message
+    )
+    run_middleware(bot, update)
+    assert message.calls[0][0] == "reply"
+
+
+def test_banned_callback_query_is_answered(bot, banned_user):
+    query = Recorder()
+    update = SimpleNamespace(
+        effective_user=banned_user, message=None, callback_query=query, effective_message=None
+    )
+    run_middleware(bot, update)
+    assert query.calls[0][0] == "answer"
+
+
+def test_middleware_is_registered_for_all_update_types(bot):
+    application = bot.build_application(with_updater=False)
+    middleware = [
+        handler for handler in application.handlers[-1]
+        if handler.callback is bot.blacklist_middleware
+    ]
+    assert middleware and isinstance(middleware[0], bot.TypeHandler)
@@ -0,0 +1,22 @@
+import asyncio
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def test_flush_with_prefix_delivers_only_that_item(bot, tmp_path):
+    outbox = bot.Outbox(str(tmp_path / "outbox.sqlite3"))
+    outbox.enqueue("ticket:1:10", 10, "send_message", text="перше")
+    outbox.enqueue("ticket:12:11", 11, "send_message", text="чуже")
+    fake = FakeBot()
+
+    asyncio.run(outbox.flush(fake, prefix="ticket:1:"))
+    assert fake.sent == [(10, "перше")]
+
+    asyncio.run(outbox.flush(fake))
+    assert fake.sent == [(10, "перше"), (11, "чуже")]
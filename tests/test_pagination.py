@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+class Query:
+    def __init__(self, bot, error):
+        self.data = "page:blacklist:0"
+        self.answers = 0
+        self.error = bot.BadRequest(error)
+
+    async def answer(self, text=None, **kwargs):
+        self.answers += 1
+
+    async def edit_message_text(self, text, **kwargs):
+        raise self.error
+
+
+def navigate(bot, query):
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1))
+    asyncio.run(bot.handle_page_navigation(update, SimpleNamespace()))
+
+
+def test_same_page_click_is_only_answered(bot, monkeypatch):
+    monkeypatch.setattr(bot, "render_page", lambda source, page: ("Сторінка", None))
+    query = Query(bot, "Message is not modified: specified new message content is the same")
+    navigate(bot, query)
+    assert query.answers == 1
+
+
+def test_other_edit_errors_are_raised(bot, monkeypatch):
+    monkeypatch.setattr(bot, "render_page", lambda source, page: ("Сторінка", None))
+    with pytest.raises(bot.BadRequest):
+        navigate(bot, Query(bot, "Message to edit not found"))
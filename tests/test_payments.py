@@ -0,0 +1,46 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+
+def statement(*rows):
+    lines = ["Дата;Призначення;Сума"] + [f"01.10.2026;{purpose};{amount}" for purpose, amount in rows]
+    return "\n".join(lines).encode("utf-8")
+
+
+def test_negative_rows_do_not_mark_requests_paid(bot, tmp_path):
+    ledger = bot.PaymentLedger(str(tmp_path / "payments.json"))
+    record = ledger.add(user_id=5, service_id=1, amount=150.0)
+
+    result = ledger.reconcile(statement(("Повернення за послуги №5", "-150,00")))
+    assert result["matched"] == 0
+    assert record.status == "open"
+
+    result = ledger.reconcile(statement(("Оплата за послуги №5", "150,00")))
+    assert result["matched"] == 1
+    assert result["open"] == 0
+    with open(tmp_path / "payments.json", encoding="utf-8") as file:
+        assert json.load(file)[record.payment_id]["status"] == "paid"
+
+
+def test_failed_send_leaves_no_open_request(bot, monkeypatch, tmp_path):
+    ledger = bot.PaymentLedger(str(tmp_path / "payments.json"))
+    monkeypatch.setattr(bot, "PAYMENT_LEDGER", ledger)
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    async def send_message(**kwargs):
+        raise bot.Forbidden("Forbidden: bot was blocked by the user")
+
+    service_id = next(iter(bot.PAID_SERVICES))
+    update = SimpleNamespace(
+        message=SimpleNamespace(reply_text=reply_text), effective_user=SimpleNamespace(id=2)
+    )
+    context = SimpleNamespace(
+        args=["5", str(service_id), "150"], bot=SimpleNamespace(send_message=send_message)
+    )
+    asyncio.run(bot.payment(update, context))
+    assert replies and replies[0].startswith("❌")
+    assert not ledger.open_by_user[5]
@@ -0,0 +1,60 @@
+import asyncio
+
+
+class FlakyBot:
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("мережа недоступна")
+        self.sent.append(text)
+        return type("Message", (), {"message_id": len(self.sent)})()
+
+
+def listing(listing_id):
+    return {
+        "id": listing_id,
+        "user_id": 7,
+        "form_type": "buying",
+        "data": {"formType": "buying", "buyingItem": "Велосипед"},
+        "photos": [],
+    }
+
+
+def run_once(bot, fake_bot):
+    bot.PUBLISH_QUEUE.next_post_at = bot.datetime.now()
+    asyncio.run(bot.process_publish_queue(fake_bot))
+
+
+def test_listing_stays_queued_until_published(bot, monkeypatch, tmp_path):
+    queue = bot.PublishQueue(str(tmp_path / "queue.json"), str(tmp_path / "failed.json"))
+    monkeypatch.setattr(bot, "PUBLISH_QUEUE", queue)
+    queue.push(listing("a1"))
+
+    run_once(bot, FlakyBot(failures=1))
+    # Після невдачі оголошення лишається у файлі черги, а не губиться
+    reloaded = bot.PublishQueue(queue.file_path, queue.failed_file_path)
+    assert [item[2]["id"] for item in reloaded.heap] == ["a1"]
+    assert reloaded.heap[0][2]["publish_attempts"] == 1
+
+    run_once(bot, FlakyBot(failures=0))
+    assert len(queue) == 0
+
+
+def test_exhausted_listing_is_kept_for_retry(bot, monkeypatch, tmp_path):
+    queue = bot.PublishQueue(str(tmp_path / "queue.json"), str(tmp_path / "failed.json"))
+    monkeypatch.setattr(bot, "PUBLISH_QUEUE", queue)
+    queue.push(listing("b2"))
+    failing = FlakyBot(failures=bot.PUBLISH_MAX_ATTEMPTS)
+
+    for _ in range(bot.PUBLISH_MAX_ATTEMPTS):
+        run_once(bot, failing)
+
+    assert len(queue) == 0
+    assert [item["id"] for item in queue.failed] == ["b2"]
+    assert queue.retry_failed("b2") == 1
+    assert queue.failed == []
+    assert queue.peek()[2]["publish_attempts"] == 0
@@ -0,0 +1,15 @@
+def test_fingerprints_round_trip_through_shared_store(bot, tmp_path):
+    store = bot.SharedStore(str(tmp_path / "shared.sqlite3"))
+    high_bit = (1 << 63) | 0xABCDEF
+    store.add_fingerprint(high_bit, user_id=7)
+    store.add_fingerprint(42, user_id=8)
+
+    rows = store.fingerprints_since(0)
+    assert [(fingerprint, user_id) for _, _, fingerprint, user_id in rows] == [
+        (high_bit, 7),
+        (42, 8),
+    ]
+    assert store.fingerprints_since(rows[0][0])[0][2] == 42
+
+    store.prune_fingerprints(window=-1)
+    assert store.fingerprints_since(0) == []
@@ -0,0 +1,53 @@
+import asyncio
+
+
+def make_update(bot, update_id, user_id):
+    return bot.Update.de_json(bot.bench_message(update_id, user_id, text="/start"), None)
+
+
+def test_waiting_updates_of_one_user_do_not_block_others(bot):
+    async def scenario():
+        processor = bot.PerUserUpdateProcessor(2)
+        release = asyncio.Event()
+        order = []
+
+        async def flood(index):
+            await release.wait()
+            order.append(("flood", index))
+
+        async def light():
+            order.append(("light", None))
+
+        tasks = [
+            asyncio.create_task(processor.process_update(make_update(bot, i, 7), flood(i)))
+            for i in range(10)
+        ]
+        other = asyncio.create_task(processor.process_update(make_update(bot, 11, 8), light()))
+        await asyncio.wait_for(other, timeout=1)
+        assert order == [("light", None)]
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order[1:] == [("flood", i) for i in range(10)]
+        assert not processor.locks
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limit_applies_to_running_updates(bot):
+    async def scenario():
+        processor = bot.PerUserUpdateProcessor(2)
+        running = peak = 0
+
+        async def handler():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(
+            *(processor.process_update(make_update(bot, i, 100 + i), handler()) for i in range(6))
+        )
+        assert peak == 2
+
+    asyncio.run(scenario())
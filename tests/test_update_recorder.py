@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.fixture
+def recorder(bot, tmp_path):
+    recorder = bot.UpdateRecorder(str(tmp_path))
+    yield recorder
+    recorder.close()
+
+
+@pytest.mark.parametrize(
+    "phone",
+    [
+        "097 111 22 33",
+        "097-111-22-33",
+        "(097) 111-22-33",
+        "+38 (097) 111-22-33",
+        "+380971112233",
+        "0971112233",
+    ],
+)
+def test_phone_formats_are_pseudonymised(recorder, phone):
+    scrubbed = recorder._scrub_text(f'{{"sellerContact": "{phone}"}}')
+    digits = "".join(char for char in phone if char.isdigit())
+    assert digits not in "".join(char for char in scrubbed if char.isdigit())
+    assert len(scrubbed) == len(f'{{"sellerContact": "{phone}"}}')
+
+
+def test_same_phone_gets_same_pseudonym(recorder):
+    assert recorder._scrub_text("097 111 22 33") == recorder._scrub_text(
+        "097 111 22 33"
+    )
+
+
+def test_prices_and_command_arguments_are_kept(recorder):
+    assert recorder._scrub_text("Ціна 1 500 грн, 12.05") == "Ціна 1 500 грн, 12.05"
+    scrubbed = recorder._scrub_text("/ban 123456789 7 спам")
+    assert scrubbed.endswith(" 7 спам")
+    assert "123456789" not in scrubbed
@@ -0,0 +1,70 @@
+import pytest
+
+
+def write_files(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+
+def sources(assets):
+    return {name: asset.variants["identity"].decode() for name, asset in assets.items()}
+
+
+def test_js_imports_and_absolute_references_point_to_hashed_names(bot, tmp_path):
+    write_files(tmp_path, {
+        "index.html": '<script type="module" src="js/app.js"></script>'
+                      '<link rel="stylesheet" href="/forms/css/main.css">',
+        "js/app.js": 'import { helper } from "./util.js";\n'
+                     'const icon = "/forms/img/logo.svg";\n',
+        "js/util.js": 'export const helper = () => 1;\n',
+        "css/main.css": 'body { background: url(../img/logo.svg); }\n',
+        "img/logo.svg": "<svg></svg>",
+    })
+    assets = sources(bot.build_webapp_bundle(str(tmp_path)))
+    names = set(assets)
+    util = next(name for name in names if name.startswith("js/util."))
+    app = next(name for name in names if name.startswith("js/app."))
+    css = next(name for name in names if name.startswith("css/main."))
+    logo = next(name for name in names if name.startswith("img/logo."))
+
+    assert f'from "./{util.split("/")[-1]}"' in assets[app]
+    assert f'"/forms/{logo}"' in assets[app]
+    assert f"url(../{logo})" in assets[css]
+    assert f'src="{app}"' in assets["index.html"]
+    assert f'href="/forms/{css}"' in assets["index.html"]
+    # Хеш модуля враховує вже переписаний import
+    assert app == bot.hashed_name("js/app.js", assets[app].encode())
+
+
+def test_missing_local_reference_fails_the_build(bot, tmp_path):
+    write_files(tmp_path, {"app.js": 'import "./missing.js";\n'})
+    with pytest.raises(ValueError):
+        bot.build_webapp_bundle(str(tmp_path))
+
+
+def test_import_cycle_fails_the_build(bot, tmp_path):
+    write_files(tmp_path, {
+        "a.js": 'import "./b.js";\n',
+        "b.js": 'import "./a.js";\n',
+    })
+    with pytest.raises(ValueError):
+        bot.build_webapp_bundle(str(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, br", "br"),
+        ("br;q=0, gzip", "gzip"),
+        ("br; q=0, gzip", "gzip"),
+        ("br;q=0.0, gzip;q=0.000", "identity"),
+        ("br;q=0.5", "br"),
+        ("GZIP", "gzip"),
+    ],
+)
+def test_choose_encoding_respects_zero_quality(bot, header, expected):
+    asset = bot.StaticAsset(b"const value = 1;\n" * 200, "app.js", "no-cache")
+    assert {"gzip", "br"} <= set(asset.variants)
+    assert asset.choose_encoding(header) == expected
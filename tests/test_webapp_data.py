@@ -0,0 +1,39 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+
+class FakeMessage:
+    def __init__(self, payload):
+        self.web_app_data = SimpleNamespace(data=json.dumps(payload, ensure_ascii=False))
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def submit(bot, user_id, payload):
+    message = FakeMessage(payload)
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, first_name="Тест", last_name=None, username=None),
+        effective_message=message,
+        message=message,
+    )
+    context = SimpleNamespace(user_data={})
+    return asyncio.run(bot.handle_webapp_data(update, context)), message
+
+
+def test_held_duplicate_spends_no_quota_or_stats(bot, monkeypatch):
+    payload = {"formType": "selling", "itemName": "Велосипед Giant", "sellerContact": "@rider"}
+    fingerprint = bot.DuplicateDetector.fingerprint(payload, "selling")
+    monkeypatch.setattr(bot, "DUPLICATE_ACTION", "hold")
+    monkeypatch.setattr(bot, "DUPLICATE_DETECTOR", bot.DuplicateDetector(bot.timedelta(hours=1)))
+    bot.DUPLICATE_DETECTOR.add(fingerprint, user_id=500)
+    stats_before = dict(bot.daily_stats)
+
+    state, message = submit(bot, 501, payload)
+
+    assert state == bot.CHOOSING_ACTION
+    assert "вже надсилалося" in message.replies[-1]
+    assert bot.user_post_counts[501]["count"] == 0
+    assert bot.daily_stats == stats_before